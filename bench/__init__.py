@@ -0,0 +1,4 @@
+"""Benchmarks for the capture/OCR pipeline, task dispatch and task storage.
+
+Run with ``python -m bench``; see ``python -m bench --help``.
+"""
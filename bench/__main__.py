@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from bench import fakes, suites
+
+SUITES = ("pipeline", "dispatch", "storage")
+
+class CountingOcr:
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+
+    def image_to_string(self, img, config=""):
+        self.calls += 1
+        return self.fn(img, config=config)
+
+def higher_is_better(name):
+    return name.endswith("_per_s") or name.endswith("_rate")
+
+def compare(current, baseline, threshold):
+    rows = []
+    regressions = 0
+    for name in sorted(set(current) | set(baseline)):
+        new, old = current.get(name), baseline.get(name)
+        if new is None or old is None:
+            rows.append((name, old, new, None, ""))
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < -threshold if higher_is_better(name) else change > threshold
+        regressions += worse
+        rows.append((name, old, new, change, "REGRESSION" if worse else ""))
+    return rows, regressions
+
+def print_results(results):
+    width = max(len(name) for name in results)
+    for name, value in sorted(results.items()):
+        print(f"{name:<{width}}  {value:>12.3f}")
+
+def print_comparison(rows):
+    width = max(len(row[0]) for row in rows)
+    print(f"{'metric':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for name, old, new, change, flag in rows:
+        fmt = lambda v: f"{v:>12.3f}" if v is not None else f"{'-':>12}"
+        pct = f"{change:>+7.1f}%" if change is not None else f"{'-':>8}"
+        print(f"{name:<{width}}  {fmt(old)}  {fmt(new)}  {pct}  {flag}")
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["metrics"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmark the capture/OCR pipeline, task dispatch and task storage against synthetic fakes.")
+    parser.add_argument("--suite", default=",".join(SUITES), help="comma separated suites to run (default: %(default)s)")
+    parser.add_argument("--sizes", default="10,100,1000", help="event counts for generated tasks (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=200, help="pipeline checks to run (default: %(default)s)")
+    parser.add_argument("--ocr", choices=["stub", "real"], default="stub", help="stubbed OCR or the configured tesseract (default: %(default)s)")
+    parser.add_argument("--ocr-latency", type=float, default=0.02, help="seconds each stubbed OCR call takes (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="save results as a JSON baseline at this path")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression (default: %(default)s)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two saved result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        rows, regressions = compare(load_results(args.compare[1]), load_results(args.compare[0]), args.threshold)
+        print_comparison(rows)
+        return 1 if regressions else 0
+
+    suites.quiet()
+    fakes.install_fake_input()
+    screen = fakes.SyntheticScreen(seed=args.seed)
+    if args.ocr == "stub":
+        ocr = fakes.install_stub_ocr(fakes.StubOcr(latency=args.ocr_latency))
+    else:
+        import main_ocr
+        ocr = CountingOcr(main_ocr.image_to_string)
+        main_ocr.image_to_string = ocr.image_to_string
+    sizes = [int(n) for n in args.sizes.split(",") if n]
+    selected = [name.strip() for name in args.suite.split(",") if name.strip()]
+    results = {}
+    for name in selected:
+        if name not in SUITES:
+            parser.error(f"unknown suite '{name}'")
+        print(f"running {name}...", file=sys.stderr)
+        if name == "pipeline":
+            results.update(suites.bench_pipeline(screen, ocr, args.iterations, stub=ocr if args.ocr == "stub" else None))
+        elif name == "dispatch":
+            results.update(suites.bench_dispatch(screen, sizes))
+        elif name == "storage":
+            results.update(suites.bench_storage(screen, sizes))
+    print_results(results)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                                "platform": platform.platform(), "args": vars(args)},
+                       "metrics": results}, f, indent=2, sort_keys=True)
+        print(f"saved {args.out}", file=sys.stderr)
+    if args.baseline:
+        rows, regressions = compare(results, load_results(args.baseline), args.threshold)
+        print()
+        print_comparison(rows)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+Label = namedtuple("Label", "region text fg bg")
+
+STYLES = (
+    ((20, 20, 20), (235, 235, 235)),     # dark on light
+    ((240, 240, 240), (30, 30, 40)),     # light on dark, needs inverting
+    ((90, 90, 90), (150, 150, 150)),     # low contrast
+    ((200, 40, 40), (250, 250, 210)),    # colored text
+)
+
+class SyntheticScreen:
+    """A fixed RGB canvas with labels and color blocks drawn on it.
+
+    `grab` has the same signature as main_capture.grab_screen, so it can be
+    plugged into a FrameCache in place of the real screen.
+    """
+
+    def __init__(self, width=1920, height=1080, labels=40, blocks=40, font_sizes=(10, 14, 22), seed=1):
+        rng = random.Random(seed)
+        img = Image.new("RGB", (width, height), (128, 128, 128))
+        draw = ImageDraw.Draw(img)
+        self.labels = []
+        self.blocks = []
+        cell_w, cell_h = 160, 48
+        cells = [(x, y) for y in range(0, height - cell_h, cell_h) for x in range(0, width - cell_w, cell_w)]
+        rng.shuffle(cells)
+        for x, y in cells[:labels]:
+            fg, bg = rng.choice(STYLES)
+            text = str(rng.randint(0, 99999)) if rng.random() < 0.5 else rng.choice(["READY", "Start", "HP 100", "Level 12", "OK", "Gold 450"])
+            font = _font(rng.choice(font_sizes))
+            draw.rectangle((x, y, x + cell_w - 1, y + cell_h - 1), fill=bg)
+            draw.text((x + 8, y + 6), text, fill=fg, font=font)
+            self.labels.append(Label((x, y, cell_w, cell_h), text, fg, bg))
+        for x, y in cells[labels:labels + blocks]:
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            draw.rectangle((x, y, x + cell_w - 1, y + cell_h - 1), fill=color)
+            self.blocks.append(((x, y, cell_w, cell_h), color))
+        self.frame = np.asarray(img)
+        self.grabs = 0
+
+    def grab(self, x0, y0, x1, y1):
+        self.grabs += 1
+        return self.frame[y0:y1, x0:x1].copy()
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+class StubOcr:
+    """Stand-in for tesseract that answers from the screen's known labels.
+
+    The caller announces the expected text with `expect()`. Recognition is
+    modelled on tesseract's usual failure modes: too small, light-on-dark
+    or unbinarised input yields "" on the first pass, and the second pass
+    only succeeds for input of reasonable size.
+    """
+
+    def __init__(self, latency=0.02, min_height=20):
+        self.latency = latency
+        self.min_height = min_height
+        self.calls = 0
+        self.first_pass_hits = 0
+        self._local = threading.local()
+
+    def expect(self, text):
+        self._local.text = text
+
+    def image_to_string(self, img, config=""):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = getattr(self._local, "text", "")
+        arr = np.asarray(img.convert("L"))
+        if arr.shape[0] < self.min_height:
+            return ""
+        if config:
+            return text
+        dark_on_light = arr.mean() > 127
+        binary = ((arr > 48) & (arr < 208)).mean() < 0.05
+        if dark_on_light and binary:
+            self.first_pass_hits += 1
+            return text
+        return ""
+
+class FakeInput:
+    """Records pyautogui calls instead of moving the real mouse."""
+
+    PAUSE = 0
+
+    def __init__(self):
+        self.calls = []
+        self._pos = (0, 0)
+
+    def position(self):
+        return self._pos
+
+    def moveTo(self, x, y, duration=0):
+        self._pos = (x, y)
+        self.calls.append(("moveTo", x, y))
+
+    def click(self, *args, **kwargs):
+        self.calls.append(("click",))
+
+    def press(self, key):
+        self.calls.append(("press", key))
+
+    def write(self, text):
+        self.calls.append(("write", text))
+
+def install_fake_input():
+    fake = FakeInput()
+    import event_actions
+    event_actions.pyautogui = fake
+    return fake
+
+def install_stub_ocr(stub):
+    import main_ocr
+    main_ocr.image_to_string = stub.image_to_string
+    return stub
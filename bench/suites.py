@@ -0,0 +1,139 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+
+import main_history
+import main_metrics as metrics
+import main_utils as mau
+from bench.tasks import generate_events, generate_tasks
+from event_model import event_from_dict, load_tasks
+from main_capture import frame_cache
+from main_history import percentile
+from main_store import TaskStore
+
+def latency(prefix, samples):
+    return {
+        f"{prefix}.p50_ms": percentile(samples, 50) * 1000,
+        f"{prefix}.p95_ms": percentile(samples, 95) * 1000,
+        f"{prefix}.p99_ms": percentile(samples, 99) * 1000,
+    }
+
+def clean(text):
+    return re.sub(r"[^A-Za-z0-9. ]", "", text).strip()
+
+def bench_pipeline(screen, ocr, iterations=200, stub=None):
+    """capture -> preprocess -> OCR -> compare, one label at a time.
+
+    The frame cache is invalidated before every capture so each iteration
+    pays for a grab, as the first logic event after an input would.
+    """
+    frame_cache.grabber = screen.grab
+    stages = {"capture": [], "preprocess": [], "ocr": [], "compare": [], "total": []}
+    matched = first_pass = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        label = screen.labels[i % len(screen.labels)]
+        expected = clean(label.text)
+        if stub is not None:
+            stub.expect(label.text)
+        frame_cache.invalidate()
+        t0 = time.perf_counter()
+        view = mau.grab_view(*label.region)
+        t1 = time.perf_counter()
+        proc = mau.preprocess(Image.fromarray(view))
+        t2 = time.perf_counter()
+        calls = ocr.calls
+        text = mau.ocr_image(proc)
+        t3 = time.perf_counter()
+        ok = text == expected
+        t4 = time.perf_counter()
+        matched += ok
+        first_pass += ok and ocr.calls - calls == 1
+        for name, value in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)):
+            stages[name].append(value)
+    elapsed = time.perf_counter() - start
+    results = {"pipeline.checks_per_s": iterations / elapsed,
+               "pipeline.success_rate": matched / iterations}
+    # The stub's first-pass rule is the shape the auto pipeline produces,
+    # so its first-pass rate says nothing; only tesseract's does.
+    if stub is None:
+        results["pipeline.first_pass_rate"] = first_pass / iterations
+    for name, samples in stages.items():
+        results.update(latency(f"pipeline.{name}", samples))
+    return results
+
+def bench_dispatch(screen, sizes=(10, 100, 1000)):
+    """Run chains of color checks through TaskRunner and time the dispatch."""
+    from task_runner import TaskRunner
+
+    class TimedRunner(TaskRunner):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.lags = []
+
+        def start_event(self, node, due=None):
+            self.lags.append(self.scheduler.clock() - due)
+            super().start_event(node, due)
+
+    frame_cache.grabber = screen.grab
+    results = {}
+    for n in sizes:
+        events = [event_from_dict(item) for item in generate_events(n, screen, buttons=0.0, text=0.0)]
+        start = time.perf_counter()
+        runner = TimedRunner(f"bench{n}", events, check_user_activity=False)
+        compiled = time.perf_counter()
+        runner.run()
+        elapsed = time.perf_counter() - compiled
+        results[f"dispatch.{n}.compile_ms"] = (compiled - start) * 1000
+        results[f"dispatch.{n}.events_per_s"] = len(runner.lags) / elapsed if elapsed else 0.0
+        results.update(latency(f"dispatch.{n}.lag", runner.lags))
+    return results
+
+def _timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def bench_storage(screen, sizes=(10, 100, 1000), tasks=10, repeats=5):
+    """Whole-file JSON save/load against the SQLite store's per-task paths."""
+    folder = tempfile.mkdtemp(prefix="tm-bench-")
+    results = {}
+    try:
+        for n in sizes:
+            data = generate_tasks(tasks, n, screen)
+            json_path = os.path.join(folder, f"tm{n}.json")
+            results.update(latency(f"storage.{n}.json_save", _timed(lambda: mau.save_json_file(json_path, {"version": 2, "tasks": data}), repeats)))
+            results.update(latency(f"storage.{n}.json_load", _timed(lambda: load_tasks(mau.load_json_file(json_path)), repeats)))
+            store = TaskStore(os.path.join(folder, f"tm{n}.sqlite3"))
+            store.update_all(data)
+            store.close()
+            edited = [dict(item) for item in data["task000"]]
+
+            def save_one():
+                edited[0]["repeat_delay"] += 1
+                store = TaskStore(os.path.join(folder, f"tm{n}.sqlite3"))
+                store["task000"] = edited
+                store.close()
+
+            def load_one():
+                store = TaskStore(os.path.join(folder, f"tm{n}.sqlite3"))
+                store["task000"]
+                store.close()
+
+            results.update(latency(f"storage.{n}.store_save_edit", _timed(save_one, repeats)))
+            results.update(latency(f"storage.{n}.store_load_task", _timed(load_one, repeats)))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+def quiet():
+    # Keep benchmark runs out of the user's history and metrics files.
+    main_history.enabled = False
+    metrics.enable(False)
@@ -0,0 +1,39 @@
+import random
+
+from event_model import EVENT_BUTTON, EVENT_LOGIC, build_event, event_to_dict
+
+def _hex(color):
+    return "#%02x%02x%02x" % tuple(color)
+
+def generate_events(n, screen, seed=1, buttons=0.3, text=0.5, chain=True):
+    """Build `n` event dicts against `screen`, chained start to finish.
+
+    Logic events check a label's text or a block's color on the synthetic
+    screen and always point to the next event, so a run visits every event
+    exactly once.
+    """
+    rng = random.Random(seed)
+    names = [f"ev{i:04d}" for i in range(n)]
+    events = []
+    for i, name in enumerate(names):
+        nxt = names[i + 1] if chain and i + 1 < n else "None"
+        common = {"run_at_start": i == 0, "repeat": False, "repeat_delay": 0}
+        if rng.random() < buttons:
+            region = rng.choice(screen.labels).region
+            event = build_event(EVENT_BUTTON, name, region, {**common, "next_event": nxt, "next_event_delay": 0})
+        elif rng.random() < text and screen.labels:
+            label = rng.choice(screen.labels)
+            event = build_event(EVENT_LOGIC, name, label.region, {
+                **common, "logic_action": "text_logic", "logic_type": "=", "logic_value": label.text,
+                "next_event_success": nxt, "next_event_fail": nxt})
+        else:
+            region, color = rng.choice(screen.blocks)
+            event = build_event(EVENT_LOGIC, name, region, {
+                **common, "logic_action": "color_logic", "logic_type": "=", "logic_value": _hex(color),
+                "color_mode": rng.choice(["pixel", "mean", "coverage"]), "color_tolerance": 10.0,
+                "next_event_success": nxt, "next_event_fail": nxt})
+        events.append(event_to_dict(event))
+    return events
+
+def generate_tasks(tasks, events_per_task, screen, seed=1):
+    return {f"task{t:03d}": generate_events(events_per_task, screen, seed=seed + t) for t in range(tasks)}
@@ -0,0 +1,186 @@
+import operator as op
+import random
+import time
+from datetime import datetime
+
+import main_metrics as metrics
+import main_utils as mau
+import main_vision as mav
+from event_model import EVENT_BUTTON, EVENT_LOGIC, EVENT_WATCH, WatchState
+from main_capture import frame_cache
+from main_history import run_history
+from main_input import input_monitor
+from main_logger import application_error_handler, get_logger
+from main_scheduler import Cancelled, CancelToken
+
+logger = get_logger("input")
+
+watch_backoff = 1.5
+
+action_pause = 0.1
+
+# pyautogui is imported on the first button press: on Linux it needs a
+# display just to import, and capture-only tasks and the runner's --list and
+# --check must work on machines without one.
+pyautogui = None
+
+def _input():
+    global pyautogui
+    if pyautogui is None:
+        import pyautogui as module
+        # pyautogui's global PAUSE sleeps after every call and cannot be
+        # interrupted, so the same pause is taken through the cancel token.
+        module.PAUSE = 0
+        pyautogui = module
+    return pyautogui
+
+def execute(event, cancel=None, watch=None):
+    if event.event_type == EVENT_BUTTON:
+        return press_button(event, cancel)
+    if event.event_type == EVENT_LOGIC:
+        return check_logic(event)
+    if event.event_type == EVENT_WATCH:
+        return watch_region(event, cancel, watch)
+    raise NotImplementedError(f"No action for event type {event.event_type}")
+
+def press_button(event, cancel=None):
+    with input_monitor.synthetic(), run_history.stage("input"), metrics.timed("input_seconds"):
+        _press_button(event, cancel or CancelToken())
+
+def _type(gui, text, cancel, interval=0.02):
+    for ch in text:
+        gui.write(ch)
+        cancel.sleep(interval)
+
+def _press_button(event, cancel):
+    try:
+        gui = _input()
+        x, y, w, h = event.region
+        entered_text = event.entered_text
+        orig_x, orig_y = gui.position()
+        base_x = x + w // 4
+        base_y = y + h // 4
+        rp = event.random_position
+        click_x = base_x + (random.randint(0, w//2) if rp else w//2)
+        click_y = base_y + (random.randint(0, h//2) if rp else h//2)
+        cancel.check()
+        gui.moveTo(click_x, click_y, duration=0.05)
+        cancel.sleep(action_pause)
+        gui.click()
+        cancel.sleep(action_pause + 0.1)
+        if event.double_click:
+            gui.click(); cancel.sleep(action_pause + 0.1)
+        if event.press_enter:
+            gui.press('enter'); cancel.sleep(action_pause + 0.01)
+        if event.press_backspace:
+            gui.press('backspace'); cancel.sleep(action_pause + 0.01)
+        if event.input_random_int:
+            random_number = random.randint(1, 9)
+            random_input = f"{random_number:01d}"
+            logger.debug(f"random_input ='{random_input}'")
+            _type(gui, random_input, cancel)
+        if entered_text:
+            logger.debug(f"entered_text ='{entered_text}'")
+            _type(gui, entered_text, cancel)
+        if event.move_mouse_back:
+            gui.moveTo(orig_x, orig_y)
+        frame_cache.invalidate()
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        logger.debug(f"Clicked '{event.event_name}' at ({click_x},{click_y}) @ {timestamp}")
+    except Cancelled:
+        frame_cache.invalidate()
+        raise
+    except Exception as e:
+        frame_cache.invalidate()
+        application_error_handler(f"Error in press_button: {e}")
+
+def check_logic(event):
+    action = event.logic_action
+    test_val = event.logic_value
+    operator_str = event.logic_type
+    if action == "text_logic":
+        text = mau.get_text_from_region(*event.region, save_screenshot=False, use_cache=event.ocr_cache,
+                                        pipeline=event.ocr_preprocess, min_height=event.ocr_min_height)
+        if operator_str == "contains" or operator_str == "like":
+            return test_val.lower() in text.lower()
+        if operator_str in ("=", "!="):
+            if operator_str == "=":
+                return text == test_val
+            else:
+                return text != test_val
+        try:
+            num_text = float(text)
+            num_val = float(test_val)
+        except ValueError:
+            return False
+        ops = {">": op.gt,"<": op.lt,">=": op.ge,"<=": op.le,}
+        return ops[operator_str](num_text, num_val)
+    elif action == "color_logic":
+        if event.target_color is None:
+            raise ValueError(f"Invalid color '{test_val}' in {event.event_name}")
+        view = mau.grab_view(*event.region)
+        measured = mav.measure_color(view, event.color_mode, event.target_color, event.color_tolerance)
+        run_history.observe(f"{measured:.1f}%" if event.color_mode == "coverage" else "#%02x%02x%02x" % measured)
+        matched = mav.measured_matches(measured, event.color_mode, event.target_color, event.color_tolerance, event.color_coverage)
+        ops = { "=":op.truth, "!=":op.not_ }
+        return ops[operator_str](matched)
+    elif action == "image_match":
+        template = mav.template_cache.get(test_val)
+        # Keep the raw result; last_match() maps it to screen coordinates
+        # only if something asks for the location.
+        event.match_result = score, loc = mav.match_template(mau.grab_view(*event.region), template)
+        matched = score >= event.match_threshold
+        run_history.observe(f"{score:.3f}")
+        logger.debug(f"ImageMatch: ({event.event_name}) score={score:.3f} at {loc}")
+        ops = { "=":op.truth, "!=":op.not_ }
+        return ops[operator_str](matched)
+    return False
+
+def poll_watch(event, state, now=None):
+    """One cheap look at a watch event's region.
+
+    Returns the seconds until the next poll, or None once the watch has
+    fired (the region changed past its threshold, or the timeout passed).
+    """
+    if state.fired:
+        return None
+    now = time.monotonic() if now is None else now
+    with metrics.timed("watch_poll_seconds"):
+        signature = mav.region_signature(frame_cache.fresh_view(*event.region), event.watch_method)
+    if state.baseline is None:
+        state.baseline = signature
+    if state.started is None:
+        state.started = now
+        state.wait = event.watch_interval
+        return state.wait
+    score = mav.change_score(state.baseline, signature, event.watch_method)
+    if score >= event.watch_threshold:
+        logger.debug(f"WatchChanged: ({event.event_name}) {score:.1f}% after {now - state.started:.2f}s")
+        state.baseline = signature
+        state.fired = "change"
+    elif event.watch_timeout and now - state.started >= event.watch_timeout:
+        logger.debug(f"WatchTimeout: ({event.event_name}) after {event.watch_timeout}s")
+        state.fired = "timeout"
+    else:
+        # Poll at full rate while anything moves, back off while static.
+        wait = event.watch_interval if score else state.wait * watch_backoff
+        state.wait = min(max(wait, event.watch_interval), max(event.watch_max_interval, event.watch_interval))
+        return state.wait
+    metrics.count("watch_fired_total", reason=state.fired)
+    return None
+
+def watch_region(event, cancel=None, state=None):
+    cancel = cancel or CancelToken()
+    state = state or WatchState()
+    while True:
+        wait = poll_watch(event, state)
+        if wait is None:
+            break
+        cancel.sleep(wait)
+    fired, state.fired, state.started = state.fired, None, None
+    if fired == "timeout":
+        return False
+    if event.watch_check_logic:
+        frame_cache.invalidate()
+        return check_logic(event)
+    return True
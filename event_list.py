@@ -0,0 +1,153 @@
+import tkinter as tk
+
+header_height = 30
+expanded_estimate = 260
+row_gap = 4
+overscan = 1.0
+
+class EventListView:
+    """Scrollable list of event editors that only builds rows near the viewport.
+
+    Each event is a one-line header; its settings are built when the row is
+    expanded. Rows further than `overscan` screens from the visible area are
+    destroyed and their Tk variables released, keeping only the measured
+    height so the layout does not jump when they are rebuilt.
+    """
+
+    def __init__(self, canvas, build_header, build_body):
+        self.canvas = canvas
+        self.build_header = build_header
+        self.build_body = build_body
+        self.items = []
+        self.expanded = set()
+        self.heights = {}
+        self.rows = {}
+        self._offsets = {}
+        self._pending = None
+        self._scrollbar_set = None
+        self._scroll_pos = None
+        self._scrollregion = None
+        canvas.bind("<Configure>", lambda e: self.refresh())
+
+    def attach_scrollbar(self, scrollbar):
+        self._scrollbar_set = scrollbar.set
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+
+    def _on_scroll(self, first, last):
+        if self._scrollbar_set:
+            self._scrollbar_set(first, last)
+        # Tk calls this again after every canvas reconfigure, including the
+        # ones _layout makes; only an actual move needs another layout.
+        if (first, last) != self._scroll_pos:
+            self._scroll_pos = (first, last)
+            self.refresh()
+
+    def add(self, ev, expanded=False):
+        self.items.append(ev)
+        if expanded:
+            self.expanded.add(ev)
+        self.refresh()
+
+    def remove(self, ev):
+        self._release(ev)
+        if ev in self.items:
+            self.items.remove(ev)
+        self.expanded.discard(ev)
+        self.heights.pop(ev, None)
+        self.refresh()
+
+    def clear(self):
+        for ev in list(self.rows):
+            self._release(ev)
+        self.items.clear()
+        self.expanded.clear()
+        self.heights.clear()
+        self.refresh()
+
+    def toggle(self, ev):
+        if ev in self.expanded:
+            self.expanded.discard(ev)
+        else:
+            self.expanded.add(ev)
+        self.heights.pop(ev, None)
+        self._release(ev)
+        self.refresh()
+
+    def rebuild(self, ev):
+        if ev in self.rows:
+            self._release(ev)
+            self.refresh()
+
+    def see(self, ev):
+        self._layout()
+        total = self._offsets.get(None, 0)
+        if ev in self._offsets and total:
+            self.canvas.yview_moveto(self._offsets[ev] / total)
+
+    def refresh(self):
+        if self._pending is None:
+            self._pending = self.canvas.after_idle(self._layout)
+
+    def _height(self, ev):
+        if ev in self.heights:
+            return self.heights[ev]
+        return expanded_estimate if ev in self.expanded else header_height
+
+    def _layout(self):
+        if self._pending is not None:
+            self.canvas.after_cancel(self._pending)
+            self._pending = None
+        width = max(self.canvas.winfo_width(), 1)
+        view = max(self.canvas.winfo_height(), 1)
+        top = self.canvas.canvasy(0)
+        lo, hi = top - overscan * view, top + view + overscan * view
+        y = 0
+        remeasured = False
+        self._offsets = {}
+        for ev in self.items:
+            self._offsets[ev] = y
+            h = self._height(ev)
+            if y + h >= lo and y <= hi:
+                row = self.rows.get(ev)
+                if row is None:
+                    row = self._materialize(ev, y, width)
+                    measured = row[1].winfo_reqheight()
+                    if measured != h:
+                        self.heights[ev] = h = measured
+                        remeasured = True
+                else:
+                    self.canvas.coords(row[0], 0, y)
+                    self.canvas.itemconfigure(row[0], width=width)
+            elif ev in self.rows:
+                self._release(ev)
+            y += h + row_gap
+        self._offsets[None] = y
+        if (width, y) != self._scrollregion:
+            self._scrollregion = (width, y)
+            self.canvas.configure(scrollregion=(0, 0, width, y))
+        if remeasured:
+            self.refresh()
+
+    def _materialize(self, ev, y, width):
+        frame = tk.Frame(self.canvas, bd=2, relief="solid")
+        expanded = ev in self.expanded
+        self.build_header(ev, frame, expanded)
+        if expanded:
+            body = tk.Frame(frame)
+            body.pack(fill="x", padx=5, pady=5)
+            ev.bind_vars()
+            self.build_body(ev, body)
+        item = self.canvas.create_window(0, y, window=frame, anchor="nw", width=width)
+        # Registered before update_idletasks: a scroll callback fired from
+        # inside it must see this row as built.
+        row = self.rows[ev] = (item, frame)
+        frame.update_idletasks()
+        return row
+
+    def _release(self, ev):
+        row = self.rows.pop(ev, None)
+        if row is None:
+            return
+        self.canvas.delete(row[0])
+        row[1].destroy()
+        ev.unbind_vars()
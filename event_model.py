@@ -0,0 +1,239 @@
+import re
+from dataclasses import dataclass, field, fields, replace
+from typing import ClassVar
+
+from main_logger import logger
+from main_vision import parse_hex_color
+
+EVENT_BUTTON = 'EVENT_BUTTON'
+EVENT_LOGIC = 'EVENT_LOGIC'
+EVENT_WATCH = 'EVENT_WATCH'
+
+# Event types that run the logic check and branch on its result.
+LOGIC_TYPES = (EVENT_LOGIC, EVENT_WATCH)
+
+SCHEMA_VERSION = 2
+
+# How a repeating event is re-armed. "delay" waits repeat_delay after the
+# run finished; "rate" keeps a fixed period measured from the previous
+# deadline, so slow checks do not stretch the interval. When a fixed-rate
+# run overruns its next tick, "skip" moves on to the next tick still ahead
+# and "catch_up" runs the missed ticks back to back (up to a small limit).
+REPEAT_DELAY = "delay"
+REPEAT_RATE = "rate"
+REPEAT_MODES = [REPEAT_DELAY, REPEAT_RATE]
+OVERRUN_SKIP = "skip"
+OVERRUN_CATCH_UP = "catch_up"
+OVERRUN_POLICIES = [OVERRUN_SKIP, OVERRUN_CATCH_UP]
+
+# Resources an event needs while it executes. Capture can be shared by any
+# number of running checks; pointer and keyboard are held by one event at
+# a time (see main_scheduler.ResourceScheduler).
+POINTER = "pointer"
+KEYBOARD = "keyboard"
+CAPTURE = "capture"
+SHARED_RESOURCES = (CAPTURE,)
+
+def runtime(default=None):
+    return field(default=default, init=False, repr=False, compare=False, metadata={"persist": False})
+
+@dataclass(slots=True)
+class TaskEvent:
+    event_type: ClassVar[str] = None
+    link_fields: ClassVar[tuple] = ()
+    event_name: str = ""
+    region: tuple = (0, 0, 200, 200)
+    run_at_start: bool = False
+    repeat: bool = False
+    repeat_delay: float = 0.0
+    repeat_mode: str = REPEAT_DELAY
+    repeat_jitter: float = 0.0
+    repeat_overrun: str = OVERRUN_SKIP
+    priority: int = 0
+
+    def next_for(self, result):
+        return None, 0
+
+    def resources(self):
+        return frozenset()
+
+@dataclass(slots=True)
+class ButtonEvent(TaskEvent):
+    event_type: ClassVar[str] = EVENT_BUTTON
+    link_fields: ClassVar[tuple] = ("next_event",)
+    next_event: str = "None"
+    next_event_delay: float = 0.0
+    type_text: bool = False
+    entered_text: str = ""
+    input_random_int: bool = False
+    press_enter: bool = False
+    press_backspace: bool = False
+    random_position: bool = True
+    move_mouse_back: bool = True
+    double_click: bool = False
+
+    def next_for(self, result):
+        return self.next_event, self.next_event_delay
+
+    def resources(self):
+        types = self.type_text or self.entered_text or self.input_random_int or self.press_enter or self.press_backspace
+        return frozenset((POINTER, KEYBOARD) if types else (POINTER,))
+
+@dataclass(slots=True)
+class LogicEvent(TaskEvent):
+    event_type: ClassVar[str] = EVENT_LOGIC
+    link_fields: ClassVar[tuple] = ("next_event_success", "next_event_fail")
+    next_event_success: str = "None"
+    next_event_success_delay: float = 0.0
+    logic_type: str = "="
+    next_event_fail: str = "None"
+    next_event_fail_delay: float = 0.0
+    logic_action: str = "text_logic"
+    logic_value: str = ""
+    ocr_cache: bool = True
+    ocr_preprocess: str = "auto"
+    ocr_min_height: int = 32
+    color_mode: str = "pixel"
+    color_tolerance: float = 0.0
+    color_coverage: float = 50.0
+    match_threshold: float = 0.8
+    target_color: tuple = runtime()
+    match_result: tuple = runtime()
+
+    def __post_init__(self):
+        self.target_color = None
+        if self.logic_action == "color_logic":
+            try:
+                self.target_color = parse_hex_color(self.logic_value)
+            except ValueError:
+                pass
+
+    def next_for(self, result):
+        if result:
+            return self.next_event_success, self.next_event_success_delay
+        return self.next_event_fail, self.next_event_fail_delay
+
+    def resources(self):
+        return frozenset((CAPTURE,))
+
+    def last_match(self):
+        """Screen position and score of the last image_match, or None."""
+        if self.match_result is None or self.match_result[1] is None:
+            return None
+        score, (x, y) = self.match_result
+        return self.region[0] + x, self.region[1] + y, score
+
+@dataclass(slots=True)
+class WatchEvent(LogicEvent):
+    """Waits for its region to change, then follows the success edge.
+
+    The region is polled with a cheap signature (see main_vision.WATCH_METHODS)
+    every `watch_interval` seconds, backing off towards `watch_max_interval`
+    while nothing moves; the default cap keeps a change after a quiet spell
+    within about 100 ms plus one grab. With `watch_check_logic` the full logic check runs
+    once a change is seen and decides the branch; a `watch_timeout` without
+    any change takes the fail edge.
+    """
+    event_type: ClassVar[str] = EVENT_WATCH
+    watch_method: str = "diff"
+    watch_threshold: float = 5.0
+    watch_interval: float = 0.05
+    watch_max_interval: float = 0.1
+    watch_timeout: float = 0.0
+    watch_check_logic: bool = False
+
+@dataclass(slots=True)
+class WatchState:
+    """Polling state of one watch event within one run.
+
+    Kept per run (see task_runs.RunContext.watch_state) rather than on the
+    event, so two runs watching the same region each keep their own
+    baseline and each fire on the change.
+    """
+    baseline: object = None
+    started: float = None
+    wait: float = None
+    fired: str = None
+
+EVENT_CLASSES = {
+    EVENT_BUTTON: ButtonEvent,
+    EVENT_LOGIC: LogicEvent,
+    EVENT_WATCH: WatchEvent,
+}
+
+_geometry_re = re.compile(r"^(\d+)x(\d+)([+-]-?\d+)([+-]-?\d+)$")
+
+def parse_geometry(geometry, default=(0, 0, 200, 200)):
+    match = _geometry_re.match(str(geometry or "").strip())
+    if not match:
+        size = str(geometry or "").split("x")
+        if len(size) == 2 and size[0].isdigit() and size[1].isdigit():
+            return default[0], default[1], int(size[0]), int(size[1])
+        return default
+    w, h, x, y = match.groups()
+    return int(x.lstrip("+")), int(y.lstrip("+")), int(w), int(h)
+
+def format_geometry(region):
+    x, y, w, h = region
+    return f"{w}x{h}+{x}+{y}"
+
+_schema_cache = {}
+
+def schema(cls):
+    cached = _schema_cache.get(cls)
+    if cached is None:
+        cached = tuple(f for f in fields(cls) if f.metadata.get("persist", True) and f.name not in ("event_name", "region"))
+        _schema_cache[cls] = cached
+    return cached
+
+def coerce(ftype, value):
+    if ftype is bool:
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+    if ftype is int:
+        return int(float(value)) if value != "" else 0
+    if ftype is float:
+        return float(value) if value != "" else 0.0
+    return ftype(value)
+
+def build_event(event_type, event_name, region, data=None):
+    cls = EVENT_CLASSES.get(event_type)
+    if cls is None:
+        raise ValueError(f"Unknown event type: {event_type}")
+    data = data or {}
+    values = {f.name: coerce(f.type, data[f.name]) for f in schema(cls) if data.get(f.name) is not None}
+    return cls(event_name=event_name, region=tuple(region), **values)
+
+def event_from_dict(item):
+    return build_event(item.get("event_type"), item["event_name"], parse_geometry(item.get("geometry", "200x200")), item)
+
+def event_to_dict(event):
+    data = {
+        "event_type": event.event_type,
+        "event_name": event.event_name,
+        "geometry": format_geometry(event.region),
+    }
+    for f in schema(type(event)):
+        data[f.name] = getattr(event, f.name)
+    return data
+
+def copy_event(event, **changes):
+    return replace(event, **changes)
+
+def load_tasks(data):
+    if isinstance(data, dict) and isinstance(data.get("version"), int) and isinstance(data.get("tasks"), dict):
+        raw_tasks = data["tasks"]
+    else:
+        raw_tasks = data or {}
+    tasks = {}
+    for task_name, items in raw_tasks.items():
+        events = []
+        for item in items:
+            try:
+                events.append(event_to_dict(event_from_dict(item)))
+            except (KeyError, ValueError) as e:
+                logger.debug(f"Skipping event in '{task_name}': {e}")
+        tasks[task_name] = events
+    return tasks
+
+def dump_tasks(tasks):
+    return {"version": SCHEMA_VERSION, "tasks": tasks}
@@ -0,0 +1,64 @@
+NO_EVENT = "None"
+
+ADDED = "added"
+RENAMED = "renamed"
+REMOVED = "removed"
+RESET = "reset"
+
+class EventNameRegistry:
+    """Ordered set of event names that notifies listeners of each change.
+
+    Consumers keep the `version` they last saw and only refresh when it has
+    moved, so adding events one by one does not touch every combobox.
+    """
+
+    def __init__(self, names=()):
+        self._names = list(dict.fromkeys(names))
+        self._choices = None
+        self._listeners = []
+        self.version = 0
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def choices(self):
+        if self._choices is None:
+            self._choices = (NO_EVENT, *self._names)
+        return self._choices
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def add(self, name):
+        if name in self._names:
+            raise ValueError(f"Event '{name}' already exists")
+        self._names.append(name)
+        self._changed(ADDED, name, None)
+
+    def rename(self, old, new):
+        if new in self._names:
+            raise ValueError(f"Event '{new}' already exists")
+        self._names[self._names.index(old)] = new
+        self._changed(RENAMED, old, new)
+
+    def remove(self, name):
+        if name in self._names:
+            self._names.remove(name)
+            self._changed(REMOVED, name, None)
+
+    def reset(self, names=()):
+        self._names = list(dict.fromkeys(names))
+        self._changed(RESET, None, None)
+
+    def _changed(self, kind, name, new_name):
+        self._choices = None
+        self.version += 1
+        for listener in list(self._listeners):
+            listener(kind, name, new_name)
@@ -1,37 +1,32 @@
-import operator as op
-import random
-import time
 import tkinter as tk
-from datetime import datetime
 from tkinter.ttk import Combobox
 
-import pyautogui
+from event_model import EVENT_BUTTON, EVENT_LOGIC, EVENT_WATCH, build_event, coerce, copy_event, event_to_dict, parse_geometry, schema
+from main_logger import logger
 
-import main_globals as mag
-import main_utils as mau
-from main_logger import logger, application_error_handler
-
-EVENT_BUTTON = 'EVENT_BUTTON'
-EVENT_LOGIC = 'EVENT_LOGIC'
 EVENT_BUTTON_COLOR = 'green'
 EVENT_LOGIC_COLOR = 'yellow'
+EVENT_WATCH_COLOR = 'cyan'
+EVENT_COLORS = {EVENT_BUTTON: EVENT_BUTTON_COLOR, EVENT_LOGIC: EVENT_LOGIC_COLOR, EVENT_WATCH: EVENT_WATCH_COLOR}
+
+VAR_TYPES = {bool: tk.BooleanVar, int: tk.IntVar, float: tk.DoubleVar, str: tk.StringVar}
 
 class EventWindow(tk.Toplevel):
     def __init__(self, root, event_type, event_name, event_data=None, delete_callback=None, *args, **kwargs):
         _geometry = kwargs.pop("geometry", "200x200")
-        _run_at_start = False if not event_data else event_data.get("run_at_start", False)
-        _repeat = False if not event_data else event_data.get("repeat", False)
-        _repeat_delay = 0 if not event_data else event_data.get("repeat_delay", 0)
         super().__init__(*args, **kwargs)
         self.root = root
         self.event_type = event_type
         self.event_name = event_name
+        self.event = build_event(event_type, event_name, parse_geometry(_geometry), event_data)
+        self.vars = None
+        self.locked = False
         self.delete_callback = delete_callback
         self.geometry(_geometry)
         self.overrideredirect(True)
         self.attributes("-topmost", True)
         self.attributes("-alpha", 0.3)
-        self.color = EVENT_BUTTON_COLOR if self.event_type == EVENT_BUTTON else EVENT_LOGIC_COLOR if self.event_type == EVENT_LOGIC else 'black'
+        self.color = EVENT_COLORS.get(self.event_type, 'black')
         self.border_color = "black"
         self.border_width = 5
         self.config(bg=self.color, highlightbackground=self.border_color, highlightthickness=self.border_width)
@@ -39,73 +34,54 @@ class EventWindow(tk.Toplevel):
         self.label.place(relx=0.5, rely=0.0, anchor="n")
         self.delete_button = tk.Button(self, text="X", command=self.delete_button, bg="red", fg="white", bd=0, highlightthickness=0)
         self.delete_button.place(relx=1.0, rely=0.0, anchor="ne")
-        self.thread = None
         self.drag_data = {"x": 0, "y": 0}
         self.resize_data = {"x": 0, "y": 0, "width": 0, "height": 0}
         self.resizing = False
         self.moving = False
         self.grip_size = 10
         self.grip = self.create_grip()
-        self.event_data = {
-            "run_at_start": tk.BooleanVar(value=_run_at_start),
-            "repeat": tk.BooleanVar(value=_repeat),
-            "repeat_delay": tk.IntVar(value=int(_repeat_delay))
-        }
 
-    def update_event(self, update_type, update_value):
-        logger.debug(f"UpdateEvent: ({self.event_name}) - {update_type} -> {update_value}")
-        if update_type not in self.event_data:
-            return
-        var = self.event_data[update_type]
-        try:
-            var.set(update_value)
-        except Exception:
-            var.set(type(var.get())(update_value))
+    def bind_vars(self):
+        if self.vars is None:
+            self.vars = {}
+            for f in schema(type(self.event)):
+                var = VAR_TYPES[f.type](master=self, value=getattr(self.event, f.name))
+                var.trace_add("write", lambda *_, key=f.name: self._var_changed(key))
+                self.vars[f.name] = var
+        return self.vars
 
-    def start_event(self):
-        logger.debug(f"StartEvent: ({self.event_name})")
-        if not mag.task_running:
-            return
-        if mau.is_user_active():
-            logger.debug("User active retrying in 5s")
-            self.root.after(5000, self.start_event)
-            return
-        for w in mag.event_windows:
-            w.attributes("-alpha", 0.0)
+    def unbind_vars(self):
+        self.vars = None
+
+    def _var_changed(self, key):
         try:
-            result = self.execute()
-            self.handle_next(result)
-            if self.event_data["repeat"].get():
-                self.schedule_repeat_event()
-        except Exception as e:
-            application_error_handler(f"Error executing {self.event_name}: {e}")
-        for w in mag.event_windows:
-            w.attributes("-alpha", 0.3)
+            value = self.vars[key].get()
+        except (tk.TclError, ValueError):
+            return
+        self.update_event(key, value)
 
-    def stop_event(self):
-        logger.debug(f"StopEvent: ({self.event_name})")
-        mag.task_running = False
-        if self.thread and self.thread.is_alive():
-            self.thread.join()
+    def update_event(self, update_type, update_value):
+        ftype = next((f.type for f in schema(type(self.event)) if f.name == update_type), None)
+        if ftype is None:
+            return
+        value = coerce(ftype, update_value)
+        if getattr(self.event, update_type) != value:
+            logger.debug(f"UpdateEvent: ({self.event_name}) - {update_type} -> {value}")
+            setattr(self.event, update_type, value)
+        if self.vars is not None and self.vars[update_type].get() != value:
+            self.vars[update_type].set(value)
 
-    def execute(self):
-        raise NotImplementedError("execute() must be implemented by subclasses")
+    def rename(self, new_name):
+        self.event_name = new_name
+        self.event.event_name = new_name
+        self.label.config(text=new_name)
 
-    def schedule_repeat_event(self):
-        delay = self.event_data["repeat_delay"].get()
-        logger.debug(f"RepeatEvent: ({self.event_name}) in {delay} seconds")
-        self.root.after(int(delay * 1000), self.start_event)
+    def snapshot(self):
+        region = (self.winfo_x(), self.winfo_y(), self.winfo_width(), self.winfo_height())
+        return copy_event(self.event, region=region)
 
-    def handle_next(self, result):
-        if "next_event" not in self.event_data:
-            return
-        name = self.event_data["next_event"].get()
-        delay = self.event_data["next_event_delay"].get()
-        if name and name != "None":
-            win = next((w for w in mag.event_windows if w.event_name == name), None)
-            if win:
-                logger.debug(f"NextEvent: ({name}) in ({delay}) seconds")
-                self.root.after(int(delay * 1000), win.start_event)
+    def to_dict(self):
+        return event_to_dict(self.snapshot())
 
     def create_grip(self):
         overlay_grip = tk.Frame(self, cursor="size_nw_se", bg=self.border_color, width=self.grip_size, height=self.grip_size)
@@ -119,7 +95,7 @@ class EventWindow(tk.Toplevel):
         self.grip.place(x=0, y=0)
 
     def start_move(self, event):
-        if not self.resizing and not mag.task_running:
+        if not self.resizing and not self.locked:
             self.moving = True
             self.drag_data["x"] = event.x
             self.drag_data["y"] = event.y
@@ -137,7 +113,7 @@ class EventWindow(tk.Toplevel):
             logger.debug(f"Stopped move: {self.event_name} at {self.winfo_x()},{self.winfo_y()}")
 
     def start_resize(self, event):
-        if not mag.task_running:
+        if not self.locked:
             self.resizing = True
             self.resize_data = {"x": event.x,"y": event.y,"width": self.winfo_width(),"height": self.winfo_height(),}
 
@@ -158,7 +134,7 @@ class EventWindow(tk.Toplevel):
             logger.debug(f"Stopped resize: {self.event_name} size {self.winfo_width()}x{self.winfo_height()}")
 
     def delete_button(self):
-        if not mag.task_running:
+        if not self.locked:
             self.delete_callback(self)
             self.destroy()
 
@@ -166,105 +142,15 @@ class EventButton(EventWindow):
     next_event_menu: Combobox
     def __init__(self, root, event_name, event_data=None, delete_callback=None, *args, **kwargs):
         super().__init__(root, EVENT_BUTTON, event_name, event_data, delete_callback, *args, **kwargs)
-        default = event_data or {}
-        self.event_data.update({
-            "next_event": tk.StringVar(value=str(default.get("next_event", "None"))),
-            "next_event_delay": tk.IntVar(value=int(default.get("next_event_delay", 0))),
-            "type_text": tk.BooleanVar(value=bool(default.get("type_text", False))),
-            "entered_text": tk.StringVar(value=str(default.get("entered_text", ""))),
-            "input_random_int": tk.BooleanVar(value=bool(default.get("input_random_int", False))),
-            "press_enter": tk.BooleanVar(value=bool(default.get("press_enter", False))),
-            "press_backspace": tk.BooleanVar(value=bool(default.get("press_backspace", False))),
-            "random_position": tk.BooleanVar(value=bool(default.get("random_position", True))),
-            "move_mouse_back": tk.BooleanVar(value=bool(default.get("move_mouse_back", True))),
-            "double_click": tk.BooleanVar(value=bool(default.get("double_click", False))),
-        })
-
-    def execute(self):
-        try:
-            entered_text = self.event_data["entered_text"].get()
-            orig_x, orig_y = pyautogui.position()
-            w, h = self.winfo_width(), self.winfo_height()
-            base_x = self.winfo_x() + w // 4
-            base_y = self.winfo_y() + h // 4
-            rp = self.event_data["random_position"].get()
-            click_x = base_x + (random.randint(0, w//2) if rp else w//2)
-            click_y = base_y + (random.randint(0, h//2) if rp else h//2)
-            pyautogui.moveTo(click_x, click_y, duration=0.05)
-            pyautogui.click()
-            time.sleep(0.1)
-            if self.event_data["double_click"].get():
-                pyautogui.click(); time.sleep(0.1)
-            if self.event_data["press_enter"].get():
-                pyautogui.press('enter'); time.sleep(0.01)
-            if self.event_data["press_backspace"].get():
-                pyautogui.press('backspace'); time.sleep(0.01)
-            if self.event_data["input_random_int"].get():
-                random_number = random.randint(1, 9)
-                random_input = f"{random_number:01d}"
-                logger.debug(f"random_input ='{random_input}'")
-                pyautogui.write(random_input, interval=0.02)
-            if entered_text:
-                if len(entered_text) > 0:
-                    logger.debug(f"entered_text ='{entered_text}'")
-                    pyautogui.write(entered_text, interval=0.02)
-            if self.event_data["move_mouse_back"].get():
-                pyautogui.moveTo(orig_x, orig_y)
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            logger.debug(f"Clicked '{self.event_name}' at ({click_x},{click_y}) @ {timestamp}")
-        except Exception as e:
-            application_error_handler(f"Error in EventButton.execute: {e}")
 
 class EventLogic(EventWindow):
     next_event_success_menu: Combobox
     next_event_fail_menu: Combobox
     def __init__(self, root, event_name, event_data=None, delete_callback=None, *args, **kwargs):
         super().__init__(root, EVENT_LOGIC, event_name, event_data, delete_callback, *args, **kwargs)
-        default = event_data or {}
-        self.event_data.update({
-            "next_event_success": tk.StringVar(value=str(default.get("next_event_success", "None"))),
-            "next_event_success_delay": tk.IntVar(value=int(default.get("next_event_success_delay", 0))),
-            "logic_type": tk.StringVar(value=str(default.get("logic_type", "="))),
-            "next_event_fail": tk.StringVar(value=str(default.get("next_event_fail", "None"))),
-            "next_event_fail_delay": tk.IntVar(value=int(default.get("next_event_fail_delay", 0))),
-            "logic_action": tk.StringVar(value=str(default.get("logic_action", "text_logic"))),
-            "logic_value": tk.StringVar(value=str(default.get("logic_value", ""))),
-        })
 
-    def execute(self):
-        action = self.event_data["logic_action"].get()
-        test_val = self.event_data["logic_value"].get()
-        operator_str = self.event_data["logic_type"].get()
-        if action == "text_logic":
-            text = mau.get_text_from_view(self, save_screenshot=False)
-            if operator_str == "contains" or operator_str == "like":
-                return test_val.lower() in text.lower()
-            if operator_str in ("=", "!="):
-                if operator_str == "=":
-                    return text == test_val
-                else:
-                    return text != test_val
-            try:
-                num_text = float(text)
-                num_val = float(test_val)
-            except ValueError:
-                return False
-            ops = {">": op.gt,"<": op.lt,">=": op.ge,"<=": op.le,}
-            return ops[operator_str](num_text, num_val)
-        elif action == "color_logic":
-            current_color = mau.get_color_from_view(self)
-            hexv = test_val.lstrip("#")
-            target = tuple(int(hexv[i : i+2], 16) for i in (0, 2, 4))
-            ops = { "=":op.eq, "!=":op.ne }
-            return ops[operator_str](current_color, target)
-        return False
-
-    def handle_next(self, result):
-        key = "next_event_success" if result else "next_event_fail"
-        delay_key = f"{key}_delay"
-        name = self.event_data[key].get()
-        delay = self.event_data[delay_key].get()
-        if name and name != "None":
-            win = next((w for w in mag.event_windows if w.event_name == name), None)
-            if win:
-                self.root.after(int(delay * 1000), win.start_event)
\ No newline at end of file
+class EventWatch(EventWindow):
+    next_event_success_menu: Combobox
+    next_event_fail_menu: Combobox
+    def __init__(self, root, event_name, event_data=None, delete_callback=None, *args, **kwargs):
+        super().__init__(root, EVENT_WATCH, event_name, event_data, delete_callback, *args, **kwargs)
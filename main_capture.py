@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+from PIL import ImageGrab
+
+from main_logger import get_logger
+
+logger = get_logger("capture")
+
+default_ttl = 0.1
+region_idle_timeout = 30.0
+max_union_ratio = 8.0
+
+def grab_screen(x0, y0, x1, y1):
+    img = ImageGrab.grab(bbox=(x0, y0, x1, y1), all_screens=True)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+def union_bbox(regions):
+    x0 = min(x for x, y, w, h in regions)
+    y0 = min(y for x, y, w, h in regions)
+    x1 = max(x + w for x, y, w, h in regions)
+    y1 = max(y + h for x, y, w, h in regions)
+    return x0, y0, x1, y1
+
+class FrameCache:
+    def __init__(self, ttl=default_ttl, grabber=grab_screen, clock=time.monotonic):
+        self.ttl = ttl
+        self.grabber = grabber
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.grabs = 0
+        self._regions = {}
+        self._frame = None
+        self._bbox = None
+        self._stamp = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, regions):
+        now = self.clock()
+        with self._lock:
+            for region in regions:
+                self._regions[tuple(region)] = now
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = None
+
+    def view(self, x, y, w, h):
+        region = (x, y, w, h)
+        with self._lock:
+            now = self.clock()
+            self._regions[region] = now
+            if self._frame is not None and now - self._stamp <= self.ttl and self._covers(region):
+                self.hits += 1
+                frame, (ox, oy, _, _) = self._frame, self._bbox
+            else:
+                self.misses += 1
+                frame, (ox, oy, _, _) = self._grab(region, now)
+        return frame[y - oy:y - oy + h, x - ox:x - ox + w]
+
+    def fresh_view(self, x, y, w, h):
+        """Grab just this region now, bypassing the shared frame."""
+        with self._lock:
+            self.grabs += 1
+        return self.grabber(x, y, x + w, y + h)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "grabs": self.grabs,
+            "grabs_saved": self.hits,
+            "hit_rate": self.hits / total if total else 0.0,
+            "regions": len(self._regions),
+        }
+
+    def _covers(self, region):
+        x, y, w, h = region
+        x0, y0, x1, y1 = self._bbox
+        return x >= x0 and y >= y0 and x + w <= x1 and y + h <= y1
+
+    def _grab(self, region, now):
+        for key, last_used in list(self._regions.items()):
+            if now - last_used > region_idle_timeout:
+                del self._regions[key]
+        regions = list(self._regions)
+        bbox = union_bbox(regions)
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        if area > max_union_ratio * sum(w * h for _, _, w, h in regions):
+            # Regions are too far apart for one grab to pay off.
+            x, y, w, h = region
+            self.grabs += 1
+            return self._publish(self.grabber(x, y, x + w, y + h), (x, y, x + w, y + h), now)
+        self.grabs += 1
+        return self._publish(self.grabber(*bbox), bbox, now)
+
+    def _publish(self, frame, bbox, now):
+        frame.flags.writeable = False
+        self._frame, self._bbox, self._stamp = frame, bbox, now
+        logger.debug(f"FrameGrab: bbox={bbox} regions={len(self._regions)}")
+        return frame, bbox
+
+frame_cache = FrameCache()
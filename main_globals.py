@@ -1,5 +1,6 @@
 import os
 
 taskmanager_file =  os.path.join(os.getcwd() + "/data/","tm.json")
-task_running = False
-event_windows = []
\ No newline at end of file
+taskstore_file = os.path.join(os.getcwd() + "/data/","tm.sqlite3")
+history_file = os.path.join(os.getcwd() + "/data/","history.sqlite3")
+metrics_file = os.path.join(os.getcwd() + "/data/","metrics.prom")
\ No newline at end of file
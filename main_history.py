@@ -0,0 +1,245 @@
+import argparse
+import atexit
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import main_globals as mag
+from main_logger import logger
+
+enabled = True
+flush_every = 64
+flush_interval = 5.0
+max_records = 200000
+compact_ratio = 0.8
+
+STAGES = ("capture", "ocr", "input")
+
+class Record:
+    __slots__ = ("task", "event", "timestamp", "branch", "duration", "capture", "ocr", "input", "observed", "_start")
+
+    def __init__(self, task, event):
+        self.task = task
+        self.event = event
+        self.timestamp = time.time()
+        self.branch = None
+        self.duration = 0.0
+        self.capture = 0.0
+        self.ocr = 0.0
+        self.input = 0.0
+        self.observed = None
+        self._start = time.perf_counter()
+
+    def row(self):
+        return (self.timestamp, self.task, self.event, self.branch, self.duration,
+                self.capture, self.ocr, self.input, self.observed)
+
+class RunHistory:
+    """Append-only log of event outcomes and stage timings in SQLite.
+
+    Records are buffered and written in batches by a background writer
+    thread, so event workers never wait on the disk. Once the table grows
+    past max_records the oldest rows are dropped down to compact_ratio of it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or mag.history_file
+        self._conn = None
+        self._count = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def _connect(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS records (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ts REAL NOT NULL, task TEXT NOT NULL, event TEXT NOT NULL, branch TEXT,
+                        duration REAL, capture REAL, ocr REAL, input REAL, observed TEXT
+                    )""")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS records_task_event_ts ON records (task, event, ts)")
+            # Counted once; afterwards kept up to date as rows are written.
+            self._count = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        return self._conn
+
+    @contextmanager
+    def record(self, task, event):
+        if not enabled:
+            yield None
+            return
+        rec = Record(task, event)
+        self._local.current = rec
+        try:
+            yield rec
+        finally:
+            self._local.current = None
+            rec.duration = time.perf_counter() - rec._start
+            self.append(rec)
+
+    def current(self):
+        return getattr(self._local, "current", None)
+
+    @contextmanager
+    def stage(self, name):
+        rec = getattr(self._local, "current", None)
+        if rec is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(rec, name, getattr(rec, name) + time.perf_counter() - start)
+
+    def observe(self, value):
+        rec = getattr(self._local, "current", None)
+        if rec is not None:
+            rec.observed = None if value is None else str(value)[:200]
+
+    def append(self, rec):
+        with self._lock:
+            self._buffer.append(rec.row())
+            full = len(self._buffer) >= flush_every
+            if self._writer is None:
+                self._stop.clear()
+                self._writer = threading.Thread(target=self._write_loop, name="tm-history", daemon=True)
+                self._writer.start()
+        if full:
+            self._wake.set()
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # The buffer is swapped under the database lock so batches are
+        # written in order; append() only ever waits for the swap.
+        with self._db_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("INSERT INTO records (ts, task, event, branch, duration, capture, ocr, input, observed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._count += len(rows)
+                self._compact(conn)
+            except sqlite3.Error as e:
+                logger.error(f"RunHistory: could not write {len(rows)} records: {e}")
+                return 0
+        return len(rows)
+
+    def _compact(self, conn):
+        if self._count <= max_records:
+            return
+        keep = int(max_records * compact_ratio)
+        with conn:
+            conn.execute("DELETE FROM records WHERE id <= (SELECT id FROM records ORDER BY id DESC LIMIT 1 OFFSET ?)", (keep,))
+        conn.execute("PRAGMA incremental_vacuum")
+        logger.debug(f"RunHistory: compacted {self._count} records to {keep}")
+        self._count = keep
+
+    def query(self, task=None, event=None, since=None):
+        self.flush()
+        sql = "SELECT task, event, branch, duration, capture, ocr, input FROM records WHERE 1 = 1"
+        params = []
+        if task:
+            sql += " AND task = ?"
+            params.append(task)
+        if event:
+            sql += " AND event = ?"
+            params.append(event)
+        if since:
+            sql += " AND ts >= ?"
+            params.append(since)
+        with self._db_lock:
+            return self._connect().execute(sql + " ORDER BY id", params).fetchall()
+
+    def close(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            self._stop.set()
+            self._wake.set()
+            writer.join(flush_interval)
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def aggregate(rows):
+    groups = {}
+    for task, event, branch, *timings in rows:
+        group = groups.setdefault((task, event), {"count": 0, "branches": {}, "timings": [[] for _ in range(4)]})
+        group["count"] += 1
+        group["branches"][branch] = group["branches"].get(branch, 0) + 1
+        for values, value in zip(group["timings"], timings):
+            if value:
+                values.append(value)
+    result = []
+    for (task, event), group in groups.items():
+        stats = {"task": task, "event": event, "count": group["count"], "branches": group["branches"]}
+        for name, values in zip(("duration",) + STAGES, group["timings"]):
+            stats[name] = {"mean": sum(values) / len(values) if values else 0.0,
+                           "p50": percentile(values, 50), "p95": percentile(values, 95)}
+        result.append(stats)
+    return result
+
+def parse_since(value):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected a duration like 30m, 12h or 7d, got '{value}'")
+    return time.time() - float(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main_history", description="Summarise recorded event outcomes and timings.")
+    parser.add_argument("--file", default=mag.history_file, help="history database (default: %(default)s)")
+    parser.add_argument("--task", help="only this task")
+    parser.add_argument("--event", help="only this event")
+    parser.add_argument("--since", type=parse_since, help="only records newer than this, e.g. 30m, 12h, 7d")
+    args = parser.parse_args(argv)
+    history = RunHistory(args.file)
+    stats = aggregate(history.query(args.task, args.event, args.since))
+    history.close()
+    if not stats:
+        print("No records.")
+        return 0
+    print(f"{'task':<16} {'event':<16} {'runs':>6}  {'branches':<28} {'p50 ms':>8} {'p95 ms':>8} {'cap p95':>8} {'ocr p95':>8} {'inp p95':>8}")
+    for s in stats:
+        branches = " ".join(f"{k}={v}" for k, v in sorted(s["branches"].items(), key=lambda kv: str(kv[0])))
+        print(f"{s['task'][:16]:<16} {s['event'][:16]:<16} {s['count']:>6}  {branches[:28]:<28} "
+              f"{s['duration']['p50'] * 1000:>8.1f} {s['duration']['p95'] * 1000:>8.1f} "
+              f"{s['capture']['p95'] * 1000:>8.1f} {s['ocr']['p95'] * 1000:>8.1f} {s['input']['p95'] * 1000:>8.1f}")
+    return 0
+
+run_history = RunHistory()
+atexit.register(run_history.close)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from main_logger import get_logger
+
+logger = get_logger("input")
+
+backend_name = "auto"
+default_idle_threshold = 1.0
+synthetic_grace = 0.2
+
+class NullBackend:
+    name = "none"
+
+    def start(self, report):
+        logger.debug("InputMonitor: no input backend available, user activity is not detected")
+
+    def stop(self):
+        pass
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self):
+        self.report = None
+
+    def start(self, report):
+        self.report = report
+
+    def stop(self):
+        self.report = None
+
+    def feed(self, t=None):
+        if self.report:
+            self.report(t)
+
+class WindowsHookBackend:
+    name = "windows"
+    WH_KEYBOARD_LL = 13
+    WH_MOUSE_LL = 14
+    WM_QUIT = 0x0012
+    LLKHF_INJECTED = 0x10
+    LLMHF_INJECTED = 0x01
+
+    def __init__(self):
+        self._thread = None
+        self._thread_id = None
+        self._procs = None
+
+    @staticmethod
+    def available():
+        return sys.platform == "win32"
+
+    def start(self, report):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(report, ready), name="tm-input-hooks", daemon=True)
+        self._thread.start()
+        ready.wait(2.0)
+
+    def stop(self):
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+            self._thread_id = None
+
+    def _run(self, report, ready):
+        from ctypes import wintypes
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        LRESULT = ctypes.c_ssize_t
+        HOOKPROC = ctypes.WINFUNCTYPE(LRESULT, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+
+        class KBDLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [("vkCode", wintypes.DWORD), ("scanCode", wintypes.DWORD), ("flags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class MSLLHOOKSTRUCT(ctypes.Structure):
+            _fields_ = [("pt", wintypes.POINT), ("mouseData", wintypes.DWORD), ("flags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        user32.CallNextHookEx.argtypes = [wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM]
+        user32.CallNextHookEx.restype = LRESULT
+        user32.SetWindowsHookExW.argtypes = [ctypes.c_int, HOOKPROC, wintypes.HINSTANCE, wintypes.DWORD]
+        user32.SetWindowsHookExW.restype = wintypes.HHOOK
+
+        # Input sent by pyautogui is flagged as injected and must not count as the user.
+        def keyboard_proc(code, wparam, lparam):
+            if code == 0 and not ctypes.cast(lparam, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents.flags & self.LLKHF_INJECTED:
+                report()
+            return user32.CallNextHookEx(None, code, wparam, lparam)
+
+        def mouse_proc(code, wparam, lparam):
+            if code == 0 and not ctypes.cast(lparam, ctypes.POINTER(MSLLHOOKSTRUCT)).contents.flags & self.LLMHF_INJECTED:
+                report()
+            return user32.CallNextHookEx(None, code, wparam, lparam)
+
+        self._procs = (HOOKPROC(keyboard_proc), HOOKPROC(mouse_proc))
+        hooks = [user32.SetWindowsHookExW(self.WH_KEYBOARD_LL, self._procs[0], None, 0),
+                 user32.SetWindowsHookExW(self.WH_MOUSE_LL, self._procs[1], None, 0)]
+        self._thread_id = kernel32.GetCurrentThreadId()
+        ready.set()
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            if hook:
+                user32.UnhookWindowsHookEx(hook)
+
+class EvdevBackend:
+    name = "evdev"
+
+    def __init__(self, paths=None):
+        self.paths = paths or sorted(glob.glob("/dev/input/event*"))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def available(self):
+        return sys.platform.startswith("linux") and any(os.access(p, os.R_OK) for p in self.paths)
+
+    def start(self, report):
+        fds = []
+        for path in self.paths:
+            try:
+                fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                continue
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(fds, report), name="tm-input-evdev", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, fds, report):
+        try:
+            while fds and not self._stop.is_set():
+                readable, _, _ = select.select(fds, [], [], 0.5)
+                for fd in readable:
+                    try:
+                        while os.read(fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        fds.remove(fd)
+                if readable:
+                    report()
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+class X11IdleBackend:
+    name = "x11"
+    poll_interval = 0.1
+
+    class XScreenSaverInfo(ctypes.Structure):
+        _fields_ = [("window", ctypes.c_ulong), ("state", ctypes.c_int), ("kind", ctypes.c_int),
+                    ("til_or_since", ctypes.c_ulong), ("idle", ctypes.c_ulong), ("eventMask", ctypes.c_ulong)]
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def available():
+        return bool(os.environ.get("DISPLAY")) and bool(ctypes.util.find_library("Xss"))
+
+    def start(self, report):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(report,), name="tm-input-x11", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, report):
+        xlib = ctypes.CDLL(ctypes.util.find_library("X11"))
+        xss = ctypes.CDLL(ctypes.util.find_library("Xss"))
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(self.XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(self.XScreenSaverInfo)]
+        display = xlib.XOpenDisplay(None)
+        if not display:
+            logger.debug("InputMonitor: could not open X display")
+            return
+        root = xlib.XDefaultRootWindow(display)
+        info = xss.XScreenSaverAllocInfo()
+        last_idle = None
+        while not self._stop.wait(self.poll_interval):
+            xss.XScreenSaverQueryInfo(display, root, info)
+            idle = info.contents.idle / 1000.0
+            if last_idle is not None and idle < last_idle:
+                report(time.monotonic() - idle)
+            last_idle = idle
+        xlib.XFree(info)
+        xlib.XCloseDisplay(display)
+
+def create_backend(name="auto"):
+    if name == "fake":
+        return FakeBackend()
+    if name == "none":
+        return NullBackend()
+    if name in ("auto", "windows") and WindowsHookBackend.available():
+        return WindowsHookBackend()
+    if name in ("auto", "evdev"):
+        evdev = EvdevBackend()
+        if evdev.available():
+            return evdev
+    if name in ("auto", "x11") and X11IdleBackend.available():
+        return X11IdleBackend()
+    return NullBackend()
+
+class InputMonitor:
+    def __init__(self, backend=None, idle_threshold=default_idle_threshold, clock=time.monotonic):
+        self.backend = backend
+        self.idle_threshold = idle_threshold
+        self.clock = clock
+        self.last_input = float("-inf")
+        self._synthetic_until = float("-inf")
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self.backend is None:
+                self.backend = create_backend(backend_name)
+            self.backend.start(self.report)
+            self._started = True
+        logger.debug(f"InputMonitor started with {self.backend.name} backend, idle after {self.idle_threshold}s")
+
+    def stop(self):
+        with self._lock:
+            if self._started:
+                self.backend.stop()
+                self._started = False
+
+    def use_backend(self, backend):
+        self.stop()
+        self.backend = backend
+        self.last_input = float("-inf")
+
+    def report(self, t=None):
+        t = self.clock() if t is None else t
+        if t <= self._synthetic_until:
+            return
+        if t > self.last_input:
+            self.last_input = t
+
+    @contextmanager
+    def synthetic(self):
+        self._synthetic_until = float("inf")
+        try:
+            yield
+        finally:
+            self._synthetic_until = self.clock() + synthetic_grace
+
+    def idle_in(self):
+        if not self._started:
+            self.start()
+        return max(0.0, self.last_input + self.idle_threshold - self.clock())
+
+    def is_user_active(self):
+        return self.idle_in() > 0
+
+input_monitor = InputMonitor()
@@ -1,64 +1,250 @@
+import atexit
 import inspect
+import json
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import reprlib
 import sys
+import threading
 import time
 import traceback
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timezone
 
 logger_name = 'tm'
 logger_level = 'DEBUG'
+console_level = 'DEBUG'
+
+# Per-subsystem verbosity, overridable with TM_LOG_LEVELS="ocr=INFO,capture=WARNING".
+SUBSYSTEMS = ("capture", "ocr", "input", "scheduler")
+subsystem_levels = {name: logger_level for name in SUBSYSTEMS}
+
+rotation = 'size'
+rotate_max_bytes = 5 * 1024 * 1024
+rotate_backups = 5
+
+# DEBUG lines from the same call site are let through in bursts of
+# sample_burst per sample_window seconds, then one in sample_every.
+sample_burst = 20
+sample_window = 1.0
+sample_every = 50
 
 formatter = logging.Formatter(fmt='"%(asctime)s","%(name)s","%(levelname)s","%(message)s"')
 formatter.converter = time.gmtime
 
-log_filepath = os.path.join(os.getcwd()+"/data/", logger_name + ".log")
-file_handler = logging.FileHandler(log_filepath, mode='a')
-file_handler.setLevel(level=logger_level)
-file_handler.setFormatter(formatter)
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "sampled", 0):
+            entry["sampled"] = record.sampled
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(level=logger_level)
-console_handler.setFormatter(formatter)
+class SamplingFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= sample_window:
+                self._sites[key] = [record.created, 1, 0]
+                return True
+            site[1] += 1
+            if site[1] <= sample_burst or (site[1] - sample_burst) % sample_every == 0:
+                record.sampled, site[2] = site[2], 0
+                return True
+            site[2] += 1
+            return False
+
+def _parse_levels(value):
+    levels = {}
+    for part in (value or "").split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def get_logger(subsystem=None):
+    return logger.getChild(subsystem) if subsystem else logger
+
+def _file_handler():
+    if rotation == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(log_filepath, when='midnight', backupCount=rotate_backups, utc=True, encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(log_filepath, maxBytes=rotate_max_bytes, backupCount=rotate_backups, encoding='utf-8')
+    handler.setLevel(level=logger_level)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+log_filepath = os.path.join(os.getcwd()+"/data/", logger_name + ".jsonl")
 
 logger = logging.getLogger(logger_name)
 logger.setLevel(level=logger_level)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+subsystem_levels.update(_parse_levels(os.environ.get("TM_LOG_LEVELS")))
+for _name, _level in subsystem_levels.items():
+    get_logger(_name).setLevel(_level)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level=console_level)
+console_handler.setFormatter(formatter)
+
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.addFilter(SamplingFilter())
+logger.addHandler(queue_handler)
+
+# OCR worker processes import this module too; only the main process owns the file.
+if multiprocessing.parent_process() is None:
+    os.makedirs(os.path.dirname(log_filepath), exist_ok=True)
+    listener = logging.handlers.QueueListener(log_queue, _file_handler(), console_handler, respect_handler_level=True)
+else:
+    listener = logging.handlers.QueueListener(log_queue, console_handler, respect_handler_level=True)
+listener.start()
+
+def shutdown_logging():
+    global listener
+    _flush_stop.set()
+    flush_error_counts()
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+atexit.register(shutdown_logging)
 
 logger.info("Starting Logger....")
 
+# Errors are fingerprinted by exception type and the site that raised them
+# (or the handler's caller when there is no traceback). The first
+# occurrence gets the full report; repeats are counted and summarised at
+# most once per error_repeat_interval seconds, by the next repeat or by the
+# flush thread, whichever comes first.
+error_repeat_interval = 60.0
+error_max_fingerprints = 512
+error_repr = reprlib.Repr()
+error_repr.maxstring = 200
+error_repr.maxother = 200
+error_repr.maxlevel = 2
+error_max_locals = 30
+
+_errors = OrderedDict()
+_errors_lock = threading.Lock()
+_flush_thread = None
+_flush_stop = threading.Event()
+
+class _LazyLocals:
+    """Formats the caller's locals only if the report is actually written."""
+
+    def __init__(self, f_locals):
+        self.items = list(f_locals.items())[:error_max_locals]
+        self.truncated = len(f_locals) > error_max_locals
+
+    def __str__(self):
+        lines = []
+        for name, value in self.items:
+            try:
+                text = error_repr.repr(value)
+            except Exception as e:
+                text = f"<unprintable {type(value).__name__}: {e}>"
+            lines.append(f"    {name} = {text}")
+        if self.truncated:
+            lines.append("    ...")
+        return "\n".join(lines)
+
+def _error_site(code, lineno):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{lineno}"
+
+def _raise_site(tb):
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    return tb.tb_frame.f_code, tb.tb_lineno
+
+def _start_flush_thread():
+    global _flush_thread
+    if _flush_thread is None:
+        _flush_thread = threading.Thread(target=_flush_loop, name="tm-errors", daemon=True)
+        _flush_thread.start()
+
+def _flush_loop():
+    while not _flush_stop.wait(error_repeat_interval):
+        flush_error_counts(error_repeat_interval)
+
 def application_error_handler(e):
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    exc_type, exc_value, exc_traceback = sys.exc_info()
+    if exc_value is None and isinstance(e, BaseException):
+        exc_type, exc_value, exc_traceback = type(e), e, e.__traceback__
     frame = inspect.currentframe()
     caller_frame = frame.f_back
-    exc_type, exc_value, exc_traceback = sys.exc_info()
-
-    stack_trace = ''.join(traceback.format_tb(exc_traceback))
-    error_details = {
-        'timestamp': current_time,
-        'error_type': exc_type.__name__,
-        'error_message': str(exc_value),
-        'file_name': caller_frame.f_code.co_filename,
-        'function_name': caller_frame.f_code.co_name,
-        'line_number': caller_frame.f_lineno,
-        'stack_trace': stack_trace,
-        'locals': {key: str(value) for key, value in caller_frame.f_locals.items()}
-    }
-
-    logger.error("---------================== Detailed Error Report ==================---------")
-    logger.error(f"Timestamp: {error_details['timestamp']}")
-    logger.error(f"Error Type: {error_details['error_type']}")
-    logger.error(f"Error Message: {error_details['error_message']}")
-    logger.error(f"File Name: {error_details['file_name']}")
-    logger.error(f"Function Name: {error_details['function_name']}")
-    logger.error(f"Line Number: {error_details['line_number']}")
-    logger.error("Stack Trace:")
-    logger.error(error_details['stack_trace'])
-    logger.error("Local Variables:")
-    for var_name, var_value in error_details['locals'].items():
-        logger.error(f"    {var_name} = {var_value}")
-    logger.error("---------================== End Error Report ==================---------")
-    del frame
-    del caller_frame
+    try:
+        type_name = exc_type.__name__ if exc_type is not None else "Error"
+        if exc_traceback is not None:
+            code, lineno = _raise_site(exc_traceback)
+        else:
+            code, lineno = caller_frame.f_code, caller_frame.f_lineno
+        site = _error_site(code, lineno)
+        fingerprint = (type_name, site)
+        now = time.monotonic()
+        with _errors_lock:
+            entry = _errors.get(fingerprint)
+            if entry is None:
+                _errors[fingerprint] = entry = {"count": 1, "reported": now, "pending": 0}
+                if len(_errors) > error_max_fingerprints:
+                    _errors.popitem(last=False)
+                first = True
+            else:
+                _errors.move_to_end(fingerprint)
+                entry["count"] += 1
+                entry["pending"] += 1
+                first = False
+                due = now - entry["reported"] >= error_repeat_interval
+                if due:
+                    pending, entry["pending"], entry["reported"] = entry["pending"], 0, now
+        if not first:
+            if due:
+                logger.error("Error repeated %d more times in the last %.0fs (%d total): %s at %s - %s",
+                             pending, error_repeat_interval, entry["count"], type_name, site, e)
+            else:
+                _start_flush_thread()
+            return
+        if exc_traceback is not None:
+            stack_trace = ''.join(traceback.format_tb(exc_traceback))
+        else:
+            stack_trace = ''.join(traceback.format_stack(caller_frame, limit=8))
+        logger.error(
+            "---------================== Detailed Error Report ==================---------\n"
+            "Timestamp: %s\nError Type: %s\nError Message: %s\nFile Name: %s\nFunction Name: %s\nLine Number: %s\n"
+            "Stack Trace:\n%s\nLocal Variables:\n%s\n"
+            "---------================== End Error Report ==================---------",
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"), type_name, exc_value if exc_value is not None else e,
+            code.co_filename, code.co_name, lineno,
+            stack_trace, _LazyLocals(caller_frame.f_locals))
+    finally:
+        del frame
+        del caller_frame
 
+def flush_error_counts(min_age=0.0):
+    """Write out repeat counts not yet reported, for errors last reported at least min_age seconds ago."""
+    now = time.monotonic()
+    with _errors_lock:
+        pending = [(key, entry["pending"], entry["count"]) for key, entry in _errors.items()
+                   if entry["pending"] and now - entry["reported"] >= min_age]
+        for key, _, _ in pending:
+            _errors[key]["pending"] = 0
+            _errors[key]["reported"] = now
+    for (type_name, site), repeats, total in pending:
+        logger.error("Error repeated %d more times (%d total): %s at %s", repeats, total, type_name, site)
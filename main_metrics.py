@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+
+from main_logger import logger
+
+# Off unless TM_METRICS=1, enable() is called, or an exporter is started.
+# While disabled every entry point returns after a single flag check.
+enabled = os.environ.get("TM_METRICS", "0") == "1"
+export_interval = 10.0
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = 0
+        while value > BUCKETS[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        with self._lock:
+            counts, total, top = list(self.counts), self.count, self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(BUCKETS, counts):
+            if n and seen + n >= rank:
+                upper = min(bound, top)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return top
+
+    def summary(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class Registry:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def _get(self, table, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = table.get(key)
+        if metric is None:
+            with self._lock:
+                metric = table.setdefault(key, cls())
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(self.counters, Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get(self.gauges, Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self._get(self.histograms, Histogram, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+            histograms = list(self.histograms.items())
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": c.value} for (name, labels), c in counters],
+            "gauges": [{"name": name, "labels": dict(labels), "value": g.value} for (name, labels), g in gauges],
+            "histograms": [{"name": name, "labels": dict(labels), **h.summary()} for (name, labels), h in histograms],
+        }
+
+    def to_prometheus(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+        with self._lock:
+            counters = sorted(self.counters.items()) + sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items(), key=lambda kv: kv[0])
+        lines = []
+        for (name, labels), c in counters:
+            lines.append(f"tm_{name} {c.value}" if not labels else f"tm_{name}{fmt(labels)} {c.value}")
+        for (name, labels), h in histograms:
+            with h._lock:
+                counts, total, hsum = list(h.counts), h.count, h.sum
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"tm_{name}_bucket{fmt(labels, [('le', le)])} {cumulative}")
+            lines.append(f"tm_{name}_sum{fmt(labels)} {hsum}")
+            lines.append(f"tm_{name}_count{fmt(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+def timed(name, **labels):
+    if not enabled:
+        return NULL_TIMER
+    return _Timer(registry.histogram(name, **labels))
+
+def observe(name, value, **labels):
+    if enabled:
+        registry.histogram(name, **labels).observe(value)
+
+def count(name, n=1, **labels):
+    if enabled:
+        registry.counter(name, **labels).inc(n)
+
+def gauge(name, value, **labels):
+    if enabled:
+        registry.gauge(name, **labels).set(value)
+
+def event_latencies(task=None):
+    rows = []
+    for (name, labels), h in list(registry.histograms.items()):
+        labels = dict(labels)
+        if name != "event_seconds" or (task is not None and labels.get("task") != task):
+            continue
+        rows.append((labels.get("event", ""), h.summary()))
+    return sorted(rows)
+
+def write_metrics(path):
+    if path.endswith(".json"):
+        data = json.dumps({"time": time.time(), **registry.snapshot()}, indent=2)
+    else:
+        data = registry.to_prometheus()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class MetricsExporter:
+    def __init__(self, path, interval=None):
+        self.path = path
+        self.interval = export_interval if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        enable()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tm-metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1.0)
+        self._export()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._export()
+
+    def _export(self):
+        try:
+            write_metrics(self.path)
+        except OSError as e:
+            logger.error(f"Metrics: could not write {self.path}: {e}")
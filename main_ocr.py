@@ -0,0 +1,193 @@
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+
+from PIL import Image
+
+from main_logger import get_logger
+
+logger = get_logger("ocr")
+
+pool_size = max(1, min(2, (os.cpu_count() or 1) - 1))
+max_queue = 8
+request_timeout = 10.0
+use_pool = True
+
+Word = namedtuple("Word", "text left top width height conf")
+
+class OcrBusy(RuntimeError):
+    pass
+
+class OcrTimeout(TimeoutError):
+    pass
+
+def _psm_from_config(config, default=3):
+    match = re.search(r"--psm\s+(\d+)", config or "")
+    return int(match.group(1)) if match else default
+
+def _pytesseract_words(img, config):
+    from pytesseract import pytesseract
+    data = pytesseract.image_to_data(img, config=config, output_type=pytesseract.Output.DICT)
+    return [(text, left, top, width, height, float(conf))
+            for text, left, top, width, height, conf
+            in zip(data["text"], data["left"], data["top"], data["width"], data["height"], data["conf"])
+            if text.strip() and float(conf) >= 0]
+
+def _load_engine():
+    # tesserocr keeps one initialised engine per process; without it every
+    # request still goes through the tesseract executable.
+    try:
+        import tesserocr
+    except ImportError:
+        from pytesseract import pytesseract
+        return {"string": lambda img, config: pytesseract.image_to_string(img, config=config),
+                "data": _pytesseract_words}
+    api = tesserocr.PyTessBaseAPI()
+    def string(img, config):
+        api.SetPageSegMode(_psm_from_config(config))
+        api.SetImage(img)
+        return api.GetUTF8Text()
+    def words(img, config):
+        api.SetPageSegMode(_psm_from_config(config))
+        api.SetImage(img)
+        api.Recognize()
+        found = []
+        level = tesserocr.RIL.WORD
+        iterator = api.GetIterator()
+        if iterator is None:
+            return found
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if text and text.strip() and box:
+                x0, y0, x1, y1 = box
+                found.append((text, x0, y0, x1 - x0, y1 - y0, word.Confidence(level)))
+        return found
+    return {"string": string, "data": words}
+
+def _worker_main(conn):
+    engine = _load_engine()
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg is None:
+            break
+        op, mode, size, data, config = msg
+        try:
+            img = Image.frombytes(mode, size, data)
+            conn.send((True, engine[op](img, config)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def close(self, timeout=1.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1.0)
+        self.conn.close()
+
+class OcrPool:
+    def __init__(self, size=pool_size, max_queue=max_queue, timeout=request_timeout):
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size + max_queue)
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._ctx = mp.get_context("spawn")
+
+    def start(self):
+        with self._lock:
+            while len(self._workers) < self.size:
+                worker = _Worker(self._ctx)
+                self._workers.append(worker)
+                self._idle.put(worker)
+        logger.debug(f"OcrPool started with {self.size} workers")
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in workers:
+            worker.close()
+
+    def image_to_string(self, img, config="", timeout=None):
+        return self._request("string", img, config, timeout)
+
+    def image_to_data(self, img, config="", timeout=None):
+        return [Word(*word) for word in self._request("data", img, config, timeout)]
+
+    def _request(self, op, img, config, timeout):
+        if not self._slots.acquire(blocking=False):
+            raise OcrBusy("OCR queue is full")
+        try:
+            if not self._workers:
+                self.start()
+            timeout = self.timeout if timeout is None else timeout
+            deadline = time.monotonic() + timeout
+            try:
+                worker = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise OcrTimeout(f"No OCR worker free within {timeout}s")
+            try:
+                worker.conn.send((op, img.mode, img.size, img.tobytes(), config))
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    worker = self._replace(worker)
+                    raise OcrTimeout(f"OCR request exceeded {timeout}s")
+                ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                worker = self._replace(worker)
+                raise
+            finally:
+                self._idle.put(worker)
+            if not ok:
+                raise RuntimeError(value)
+            return value
+        finally:
+            self._slots.release()
+
+    def _replace(self, worker):
+        logger.debug("OcrPool replacing stuck worker")
+        worker.kill()
+        fresh = _Worker(self._ctx)
+        with self._lock:
+            self._workers = [fresh if w is worker else w for w in self._workers]
+        return fresh
+
+ocr_pool = OcrPool()
+atexit.register(ocr_pool.shutdown)
+
+def image_to_string(img, config=""):
+    if use_pool:
+        return ocr_pool.image_to_string(img, config=config)
+    from pytesseract import pytesseract
+    return pytesseract.image_to_string(img, config=config)
+
+def image_to_data(img, config=""):
+    """Word boxes for `img` as a list of `Word` in tesseract reading order."""
+    if use_pool:
+        return ocr_pool.image_to_data(img, config=config)
+    return [Word(*word) for word in _pytesseract_words(img, config)]
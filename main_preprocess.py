@@ -0,0 +1,103 @@
+import numpy as np
+from PIL import Image
+
+from main_vision import to_gray, window_sum
+
+# Each pipeline is a declared list of stage names, run in order over a
+# uint8 grayscale array. Tesseract does best on black glyphs at least
+# ~30 px tall on a white background with some margin, which is what the
+# default pipeline aims to produce on the first pass.
+PIPELINES = {
+    "auto": ("invert", "upscale", "otsu", "denoise", "pad"),
+    "adaptive": ("invert", "upscale", "adaptive", "denoise", "pad"),
+    "gray": ("invert", "upscale", "pad"),
+    "none": (),
+}
+PIPELINE_NAMES = list(PIPELINES)
+
+default_pipeline = "auto"
+default_min_height = 32
+max_upscale = 4.0
+adaptive_window = 15
+adaptive_offset = 10
+pad_pixels = 10
+
+def otsu_level(gray):
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if not total:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    mean_bg = np.cumsum(hist * levels)
+    mean_total = mean_bg[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean_total * weight_bg / total - mean_bg) ** 2 / (weight_bg * weight_fg)
+    between = np.nan_to_num(between)
+    return int(between.argmax())
+
+def background_is_dark(gray):
+    border = np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]])
+    return np.median(border) <= otsu_level(gray)
+
+def glyph_height(gray):
+    """Height of the tallest run of rows that contain dark foreground."""
+    ink = np.concatenate([[False], (gray <= otsu_level(gray)).any(axis=1), [False]])
+    edges = np.flatnonzero(np.diff(ink.astype(np.int8)))
+    return int((edges[1::2] - edges[::2]).max()) if edges.size else 0
+
+def stage_invert(gray, opts):
+    return 255 - gray if background_is_dark(gray) else gray
+
+def stage_upscale(gray, opts):
+    height = glyph_height(gray)
+    if not height or height >= opts["min_height"]:
+        return gray
+    scale = min(max_upscale, opts["min_height"] / height)
+    h, w = gray.shape
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.BICUBIC))
+
+def stage_otsu(gray, opts):
+    return np.where(gray > otsu_level(gray), 255, 0).astype(np.uint8)
+
+def stage_adaptive(gray, opts):
+    k = adaptive_window
+    padded = np.pad(gray.astype(np.float64), k // 2, mode="edge")
+    local_mean = window_sum(padded, k, k) / (k * k)
+    return np.where(gray > local_mean - adaptive_offset, 255, 0).astype(np.uint8)
+
+def stage_denoise(gray, opts):
+    # Drop isolated dark pixels: fewer than 2 dark neighbours in the 3x3 window.
+    ink = gray < 128
+    padded = np.pad(ink, 1).view(np.uint8)
+    h, w = ink.shape
+    neighbours = sum(padded[dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3) if dy or dx)
+    speckle = ink & (neighbours < 2)
+    if not speckle.any():
+        return gray
+    out = gray.copy()
+    out[speckle] = 255
+    return out
+
+def stage_pad(gray, opts):
+    return np.pad(gray, pad_pixels, mode="constant", constant_values=255)
+
+STAGES = {
+    "invert": stage_invert,
+    "upscale": stage_upscale,
+    "otsu": stage_otsu,
+    "adaptive": stage_adaptive,
+    "denoise": stage_denoise,
+    "pad": stage_pad,
+}
+
+def run_pipeline(view, pipeline=default_pipeline, min_height=default_min_height):
+    gray = np.clip(to_gray(view), 0, 255).astype(np.uint8)
+    if min(gray.shape) < 2:
+        return gray
+    opts = {"min_height": min_height}
+    for name in PIPELINES.get(pipeline, PIPELINES[default_pipeline]):
+        gray = STAGES[name](gray, opts)
+    return gray
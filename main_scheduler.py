@@ -0,0 +1,196 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import main_metrics as metrics
+from main_logger import get_logger
+
+logger = get_logger("scheduler")
+
+class DeadlineScheduler:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.clock() + max(0.0, float(delay)), callback, *args)
+
+    def call_at(self, deadline, callback, *args):
+        with self._cond:
+            heapq.heappush(self._queue, (deadline, next(self._seq), callback, args))
+            self._cond.notify()
+        return deadline
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._cond.notify_all()
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def run(self, idle_exit=True):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._queue:
+                        if idle_exit:
+                            return
+                        self._cond.wait()
+                        continue
+                    remaining = self._queue[0][0] - self.clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+                _, _, callback, args = heapq.heappop(self._queue)
+            callback(*args)
+
+class Cancelled(Exception):
+    pass
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, seconds):
+        return self._event.wait(seconds)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def sleep(self, seconds):
+        if seconds > 0 and self._event.wait(seconds):
+            raise Cancelled()
+        self.check()
+
+class ResourceScheduler:
+    """Hands out named resources to waiting callers, highest priority first.
+
+    Shared resources (screen capture) may be held by any number of callers
+    at once; every other resource (pointer, keyboard) by one caller at a
+    time. A waiter also holds back lower-priority callers that need any of
+    the same exclusive resources, so a stream of low-priority clicks
+    cannot starve a high-priority one.
+    """
+
+    def __init__(self, shared=()):
+        self.shared = frozenset(shared)
+        self._held = {}
+        self._owners = {}
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _conflicts(self, a, b):
+        return any(name in b for name in a if name not in self.shared)
+
+    def _may_enter(self, ticket):
+        resources = ticket[2]
+        if any(self._held.get(name) for name in resources if name not in self.shared):
+            return False
+        return not any(other < ticket and self._conflicts(resources, other[2]) for other in self._waiting)
+
+    @contextmanager
+    def acquire(self, resources, priority=0, cancel=None, poll=0.05, owner=None):
+        resources = frozenset(resources)
+        ticket = (-priority, next(self._seq), resources)
+        with self._cond:
+            self._waiting.append(ticket)
+            reported = False
+            try:
+                while not self._may_enter(ticket):
+                    if not reported:
+                        reported = self._report_contention(resources, owner)
+                    if cancel is not None and cancel.cancelled:
+                        raise Cancelled()
+                    self._cond.wait(poll if cancel is not None else None)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            for name in resources:
+                self._held[name] = self._held.get(name, 0) + 1
+                if name not in self.shared:
+                    self._owners[name] = owner
+        try:
+            yield
+        finally:
+            with self._cond:
+                for name in resources:
+                    self._held[name] -= 1
+                self._cond.notify_all()
+
+    def _report_contention(self, resources, owner):
+        # Waiting on another owner (another task run) for an input device
+        # means two runs are competing for it.
+        others = {name: self._owners.get(name) for name in resources
+                  if name not in self.shared and self._held.get(name) and self._owners.get(name) != owner}
+        for name, holder in others.items():
+            metrics.count("resource_contention_total", resource=name)
+            logger.debug(f"ResourceContention: {owner} waiting for {name} held by {holder}")
+        return bool(others)
+
+    def held(self):
+        with self._cond:
+            return {name: count for name, count in self._held.items() if count}
+
+class EventExecutor:
+    def __init__(self, workers=1, name="tm-worker"):
+        self.workers = workers
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+
+    def start(self):
+        for _ in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, callback, *args, priority=0):
+        self._queue.put((-priority, next(self._seq), callback, args))
+
+    def shutdown(self, timeout=None):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._seq), None, ()))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            if thread is threading.current_thread():
+                continue
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        alive = [t for t in self._threads if t.is_alive() and t is not threading.current_thread()]
+        self._threads = []
+        return not alive
+
+    def _work(self):
+        while True:
+            _, _, callback, args = self._queue.get()
+            if callback is None:
+                return
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception(f"Unhandled error in {self.name}")
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import MutableMapping
+
+import main_globals as mag
+import main_utils as mau
+from event_model import dump_tasks, load_tasks
+from main_logger import logger
+
+STORE_VERSION = 1
+
+class TaskStore(MutableMapping):
+    """Task name -> list of event dicts, persisted in SQLite.
+
+    Only the task index is read up front; a task's events are read the first
+    time it is looked up and cached. Assigning a task writes just the event
+    rows that differ from what is stored, in a single transaction.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or mag.taskstore_file
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._events = {}
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS tasks (name TEXT PRIMARY KEY, position INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS events (
+                    task TEXT NOT NULL REFERENCES tasks(name) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    event_name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (task, position)
+                );
+            """)
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?)", (str(STORE_VERSION),))
+            self._index = [name for name, in self._conn.execute("SELECT name FROM tasks ORDER BY position, name")]
+
+    def __getitem__(self, name):
+        with self._lock:
+            events = self._events.get(name)
+            if events is None:
+                if name not in self._index:
+                    raise KeyError(name)
+                rows = [data for data, in self._conn.execute("SELECT data FROM events WHERE task = ? ORDER BY position", (name,))]
+                self._rows[name] = rows
+                events = self._events[name] = [json.loads(data) for data in rows]
+            return events
+
+    def __setitem__(self, name, events):
+        events = list(events)
+        rows = [json.dumps(event, sort_keys=True) for event in events]
+        with self._lock:
+            if name in self._index and name not in self._rows:
+                self[name]
+            old = self._rows.get(name, [])
+            changed = 0
+            with self._conn:
+                if name not in self._index:
+                    self._conn.execute("INSERT INTO tasks (name, position) VALUES (?, ?)", (name, len(self._index)))
+                for position, data in enumerate(rows):
+                    if position < len(old) and old[position] == data:
+                        continue
+                    self._conn.execute("INSERT OR REPLACE INTO events (task, position, event_name, data) VALUES (?, ?, ?, ?)",
+                                       (name, position, events[position].get("event_name", ""), data))
+                    changed += 1
+                if len(old) > len(rows):
+                    self._conn.execute("DELETE FROM events WHERE task = ? AND position >= ?", (name, len(rows)))
+                    changed += len(old) - len(rows)
+            if name not in self._index:
+                self._index.append(name)
+            self._rows[name] = rows
+            self._events[name] = events
+        logger.debug(f"TaskStore: saved '{name}' ({changed} of {len(rows)} rows changed)")
+
+    def __delitem__(self, name):
+        with self._lock:
+            if name not in self._index:
+                raise KeyError(name)
+            with self._conn:
+                self._conn.execute("DELETE FROM tasks WHERE name = ?", (name,))
+            self._index.remove(name)
+            self._rows.pop(name, None)
+            self._events.pop(name, None)
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def loaded(self):
+        return list(self._events)
+
+    def update_all(self, tasks):
+        with self._lock:
+            with self._conn:
+                for name, events in tasks.items():
+                    if name not in self._index:
+                        self._conn.execute("INSERT INTO tasks (name, position) VALUES (?, ?)", (name, len(self._index)))
+                        self._index.append(name)
+                    self._conn.execute("DELETE FROM events WHERE task = ?", (name,))
+                    rows = [json.dumps(event, sort_keys=True) for event in events]
+                    self._conn.executemany("INSERT INTO events (task, position, event_name, data) VALUES (?, ?, ?, ?)",
+                                           [(name, position, event.get("event_name", ""), data) for position, (event, data) in enumerate(zip(events, rows))])
+                    self._rows[name] = rows
+                    self._events[name] = list(events)
+
+    def import_json(self, file_path=None):
+        file_path = file_path or mag.taskmanager_file
+        tasks = load_tasks(mau.load_json_file(file_path))
+        self.update_all(tasks)
+        logger.debug(f"TaskStore: imported {len(tasks)} tasks from {file_path}")
+        return len(tasks)
+
+    def export_json(self, file_path=None):
+        file_path = file_path or mag.taskmanager_file
+        tasks = {name: self[name] for name in self}
+        mau.save_json_file(file_path, dump_tasks(tasks))
+        logger.debug(f"TaskStore: exported {len(tasks)} tasks to {file_path}")
+        return len(tasks)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def open_store(path=None):
+    path = path or mag.taskstore_file
+    if path.endswith(".json"):
+        store = TaskStore(":memory:")
+        store.import_json(path)
+        return store
+    fresh = not os.path.exists(path)
+    store = TaskStore(path)
+    if fresh and os.path.exists(mag.taskmanager_file):
+        store.import_json(mag.taskmanager_file)
+    return store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main_store", description="Move tasks between tm.json and the SQLite task store.")
+    parser.add_argument("command", choices=["import", "export", "list"])
+    parser.add_argument("--db", default=mag.taskstore_file, help="task store database (default: %(default)s)")
+    parser.add_argument("--json", default=mag.taskmanager_file, help="JSON task file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    store = TaskStore(args.db)
+    try:
+        if args.command == "import":
+            print(f"Imported {store.import_json(args.json)} tasks into {args.db}")
+        elif args.command == "export":
+            print(f"Exported {store.export_json(args.json)} tasks to {args.json}")
+        else:
+            for name in store:
+                print(name)
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,50 +1,28 @@
-import ctypes
+import bisect
+import hashlib
 import json
 import os
 import re
+import threading
 import time
 import tkinter as tk
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 from tkinter import ttk
-import pyautogui
-import pytesseract
-from PIL import ImageOps, ImageGrab
-from pytesseract import pytesseract
+from PIL import Image
 
-from main_logger import logger, application_error_handler
+import main_metrics as metrics
+import main_ocr
+import main_preprocess
+from main_capture import frame_cache
+from main_history import run_history
+from main_input import input_monitor
+from main_logger import application_error_handler, get_logger, logger
 
-movement_check_interval = 0.05
+ocr_logger = get_logger("ocr")
 
 def is_user_active():
-    last_position = pyautogui.position()
-    start_time = time.time()
-    while time.time() - start_time < movement_check_interval:
-        current_position = pyautogui.position()
-        if current_position != last_position:
-            return True
-        time.sleep(0.01)
-    if is_key_pressed():
-        return True
-    if is_left_button_down() or is_right_button_down() or is_mouse_scrolled():
-        return True
-    return False
-
-def is_key_pressed():
-    for key_code in range(0x00, 0xFF):
-        if (ctypes.windll.user32.GetAsyncKeyState(key_code) & 0x8000) != 0:
-            return True
-    return False
-
-def is_left_button_down():
-    return (ctypes.windll.user32.GetAsyncKeyState(0x01) & 0x8000) != 0
-
-def is_right_button_down():
-    return (ctypes.windll.user32.GetAsyncKeyState(0x02) & 0x8000) != 0
-
-def is_mouse_scrolled():
-    scroll_up = ctypes.windll.user32.GetAsyncKeyState(0x0800) & 0x8000
-    scroll_down = ctypes.windll.user32.GetAsyncKeyState(0x0400) & 0x8000
-    return scroll_up != 0 or scroll_down != 0
+    return input_monitor.is_user_active()
 
 def load_json_file(file_path):
     logger.debug(f"load_json_file{file_path}")
@@ -56,8 +34,12 @@ def load_json_file(file_path):
 
 def save_json_file(file_path, json_data):
     logger.debug(f"save_json_file{file_path}")
-    with open(file_path, 'w') as f:
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w') as f:
         json.dump(json_data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
 
 def center_dialog_on_window(parent, dlg_width=300, dlg_height=150):
     window_width = parent.winfo_width()
@@ -96,43 +78,242 @@ def ask_selection(root, options, title="Select", prompt="Please choose:"):
         application_error_handler(f"Error in ask_selection: {e}")
         return None
 
-def grab_region(x, y, w, h):
-    return ImageGrab.grab(bbox=(x, y, x + w, y + h), all_screens=True)
+def grab_view(x, y, w, h):
+    with run_history.stage("capture"), metrics.timed("capture_seconds"):
+        return frame_cache.view(x, y, w, h)
 
-def get_text_from_view(root, save_screenshot=False):
-    x, y = root.winfo_x(), root.winfo_y()
-    w, h = root.winfo_width(), root.winfo_height()
-    img = grab_region(x, y, w, h)
-    proc = preprocess(img)
+ocr_passes = ("", "--oem 3 --psm 6")
+
+class OcrCache:
+    def __init__(self, max_entries=256, max_age=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, img, config=""):
+        digest = hashlib.blake2b(img.tobytes(), digest_size=16)
+        digest.update(f"{img.mode}|{img.size}|{config}".encode())
+        return digest.digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] <= self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self.clock() - entry[0] <= self.max_age
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+ocr_cache = OcrCache()
+
+# Batched OCR: preprocessed regions are stacked into one mosaic image and
+# read with a single image_to_data call, then the word boxes are split back
+# out by the rows each region occupies. With pytesseract every call is a
+# tesseract process, so 20 numeric fields cost one round-trip instead of 20.
+batch_ocr = True
+batch_max_tiles = 20
+mosaic_gap = 24
+
+OcrRequest = namedtuple("OcrRequest", "region pipeline min_height",
+                        defaults=(main_preprocess.default_pipeline, main_preprocess.default_min_height))
+
+class OcrBatch:
+    """Text regions of the running tasks, read together whenever one misses the OCR cache."""
+
+    def __init__(self):
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def register(self, requests):
+        with self._lock:
+            for request in requests:
+                self._requests[request] = self._requests.get(request, 0) + 1
+
+    def unregister(self, requests):
+        with self._lock:
+            for request in requests:
+                left = self._requests.get(request, 0) - 1
+                if left > 0:
+                    self._requests[request] = left
+                else:
+                    self._requests.pop(request, None)
+
+    def peers(self, request):
+        with self._lock:
+            return [r for r in self._requests if r != request][:batch_max_tiles - 1]
+
+ocr_batch = OcrBatch()
+
+def build_mosaic(images, gap=mosaic_gap):
+    """Stack `images` top to bottom on white, `gap` pixels apart.
+
+    Returns the mosaic and the (top, bottom) rows of each tile.
+    """
+    width = max(img.width for img in images) + 2 * gap
+    height = sum(img.height for img in images) + gap * (len(images) + 1)
+    mosaic = Image.new("L", (width, height), 255)
+    spans = []
+    top = gap
+    for img in images:
+        mosaic.paste(img.convert("L"), (gap, top))
+        spans.append((top, top + img.height))
+        top += img.height + gap
+    return mosaic, spans
+
+def split_words(words, spans):
+    """Assign each word box to the tile its vertical centre falls in."""
+    tops = [top for top, _ in spans]
+    parts = [[] for _ in spans]
+    for word in words:
+        center = word.top + word.height / 2
+        i = bisect.bisect_right(tops, center) - 1
+        if i >= 0 and center < spans[i][1]:
+            parts[i].append(word.text)
+    return [" ".join(words) for words in parts]
+
+def get_text_from_region(x, y, w, h, save_screenshot=False, use_cache=True, pipeline=main_preprocess.default_pipeline, min_height=main_preprocess.default_min_height):
+    view = grab_view(x, y, w, h)
+    with metrics.timed("preprocess_seconds"):
+        proc = preprocess(view, pipeline, min_height)
     if save_screenshot:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         proc.save(f"dbg_{ts}.png")
-        logger.debug(f"Saved debug image: dbg_{ts}.png at X:{x} Y:{y} W:{w} H:{h}")
-    raw = pytesseract.image_to_string(proc)
+        ocr_logger.debug(f"Saved debug image: dbg_{ts}.png at X:{x} Y:{y} W:{w} H:{h}")
+    if not use_cache:
+        text = ocr_image(proc)
+    else:
+        key = ocr_cache.key(proc, "|".join(ocr_passes))
+        text = ocr_cache.get(key)
+        metrics.count("ocr_cache_total", result="miss" if text is None else "hit")
+        if text is None:
+            peers = ocr_batch.peers(OcrRequest((x, y, w, h), pipeline, min_height)) if batch_ocr else []
+            text = _ocr_with_peers(proc, key, peers) if peers else ocr_image(proc)
+            ocr_cache.put(key, text)
+        else:
+            ocr_logger.debug(f"OCR cached TXT='{text}'")
+    run_history.observe(text)
+    return text
+
+def _ocr_with_peers(proc, key, peers):
+    # Read the other registered regions in the same call so their events
+    # find the text already cached while the screen is unchanged.
+    procs, keys = [proc], [key]
+    for request in peers:
+        peer = preprocess(grab_view(*request.region), request.pipeline, request.min_height)
+        peer_key = ocr_cache.key(peer, "|".join(ocr_passes))
+        if peer_key not in keys and peer_key not in ocr_cache:
+            procs.append(peer)
+            keys.append(peer_key)
+    texts = ocr_images(procs)
+    for peer_key, text in zip(keys[1:], texts[1:]):
+        ocr_cache.put(peer_key, text)
+    return texts[0]
+
+def get_texts_from_regions(requests, use_cache=True):
+    """Text for each OcrRequest, reading every uncached region in one batch."""
+    procs, keys, texts = [], [], []
+    for request in requests:
+        with metrics.timed("preprocess_seconds"):
+            proc = preprocess(grab_view(*request.region), request.pipeline, request.min_height)
+        key = ocr_cache.key(proc, "|".join(ocr_passes)) if use_cache else None
+        text = ocr_cache.get(key) if use_cache else None
+        if use_cache:
+            metrics.count("ocr_cache_total", result="miss" if text is None else "hit")
+        procs.append(proc)
+        keys.append(key)
+        texts.append(text)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    for i, text in zip(missing, ocr_images([procs[i] for i in missing])):
+        texts[i] = text
+        if use_cache:
+            ocr_cache.put(keys[i], text)
+    return texts
+
+def ocr_images(procs):
+    """OCR preprocessed images, batching up to batch_max_tiles per call.
+
+    A tile that comes back without words gets the same second pass that
+    ocr_image would give it, so batched and single results agree.
+    """
+    texts = []
+    for start in range(0, len(procs), batch_max_tiles):
+        chunk = procs[start:start + batch_max_tiles]
+        if len(chunk) == 1:
+            texts.append(ocr_image(chunk[0]))
+            continue
+        mosaic, spans = build_mosaic(chunk)
+        with run_history.stage("ocr"), metrics.timed("ocr_batch_seconds"):
+            words = main_ocr.image_to_data(mosaic, config=ocr_passes[0])
+        metrics.count("ocr_batch_total")
+        metrics.count("ocr_batch_tiles_total", len(chunk))
+        ocr_logger.debug(f"OCR batch of {len(chunk)} regions, {len(words)} words")
+        for proc, raw in zip(chunk, split_words(words, spans)):
+            metrics.count("ocr_pass_total", result="first" if raw.strip() else "fallback")
+            if raw.strip():
+                text = clean_text(raw)
+                ocr_logger.debug(f"OCR batch RAW='{raw}' TXT='{text}'")
+            else:
+                with run_history.stage("ocr"), metrics.timed("ocr_seconds"):
+                    text = _second_pass(proc)
+            texts.append(text)
+    return texts
+
+def ocr_image(proc):
+    with run_history.stage("ocr"), metrics.timed("ocr_seconds"):
+        return _ocr_image(proc)
+
+def _ocr_image(proc):
+    raw = main_ocr.image_to_string(proc, config=ocr_passes[0])
+    metrics.count("ocr_pass_total", result="first" if raw and raw.strip() else "fallback")
     if raw is not None:
         raw = raw.replace("\n", " ").replace("\r", "")
-        text = re.sub(r"[^A-Za-z0-9. ]", '', raw).strip()
-        logger.debug(f"OCR RAW='{raw}'")
-        logger.debug(f"OCR TXT='{text}'")
+        text = clean_text(raw)
+        ocr_logger.debug(f"OCR RAW='{raw}'")
+        ocr_logger.debug(f"OCR TXT='{text}'")
     if not raw:
-        raw = pytesseract.image_to_string(proc, config="--oem 3 --psm 6")
-        text = re.sub(r"[^A-Za-z0-9. ]", '', raw).strip()
-        logger.debug(f"OCR pass2 raw='{raw}' -> cleaned='{text}'")
+        text = _second_pass(proc)
+    return text
+
+def _second_pass(proc):
+    raw = main_ocr.image_to_string(proc, config=ocr_passes[1])
+    text = clean_text(raw)
+    ocr_logger.debug(f"OCR pass2 raw='{raw}' -> cleaned='{text}'")
     return text
 
-def get_color_from_view(root):
-    x, y = root.winfo_x(), root.winfo_y()
-    w, h = root.winfo_width(), root.winfo_height()
-    img = ImageGrab.grab(bbox=(x, y, x + w, y + h), all_screens=True)
-    cx, cy = w // 2, h // 2
-    return img.getpixel((cx, cy))
-
-def preprocess(img, min_h=30, upscale=2, contrast_thresh=30):
-    gray = ImageOps.grayscale(img)
-    w, h = gray.size
-    hist = gray.histogram()
-    contrast = max(hist) - min(hist)
-    if contrast < contrast_thresh:
-        bw = gray.point(lambda px: 0 if px < 128 else 255, mode='1')
-        return bw
-    return gray
+def clean_text(raw):
+    return re.sub(r"[^A-Za-z0-9. ]", '', raw).strip()
+
+def preprocess(img, pipeline=main_preprocess.default_pipeline, min_height=main_preprocess.default_min_height):
+    return Image.fromarray(main_preprocess.run_pipeline(img, pipeline, min_height), mode="L")
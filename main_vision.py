@@ -0,0 +1,216 @@
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from main_logger import get_logger
+
+logger = get_logger("capture")
+
+COLOR_MODES = ["pixel", "mean", "median", "coverage", "dominant"]
+
+def parse_hex_color(value):
+    hexv = str(value).strip().lstrip("#")
+    if len(hexv) == 3:
+        hexv = "".join(c * 2 for c in hexv)
+    if len(hexv) != 6:
+        raise ValueError(f"Invalid hex color '{value}'")
+    return tuple(int(hexv[i:i + 2], 16) for i in (0, 2, 4))
+
+def _rgb(view):
+    view = np.asarray(view)
+    if view.ndim == 2:
+        return np.repeat(view[..., None], 3, axis=2)
+    return view[..., :3]
+
+def squared_distance(colors, target):
+    diff = colors.astype(np.int32) - np.asarray(target, dtype=np.int32)
+    return (diff * diff).sum(axis=-1)
+
+def center_color(view):
+    rgb = _rgb(view)
+    h, w = rgb.shape[:2]
+    return rgb[h // 2, w // 2]
+
+def mean_color(view):
+    return _rgb(view).reshape(-1, 3).mean(axis=0)
+
+def median_color(view):
+    return np.median(_rgb(view).reshape(-1, 3), axis=0)
+
+def coverage(view, target, tolerance=0.0):
+    dist = squared_distance(_rgb(view), target)
+    return float((dist <= tolerance * tolerance).mean() * 100.0)
+
+def dominant_color(view, bits=4):
+    pixels = _rgb(view).reshape(-1, 3)
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int32)
+    bins = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    winner = np.bincount(bins, minlength=1 << (3 * bits)).argmax()
+    return pixels[bins == winner].mean(axis=0)
+
+def observed_color(view, mode):
+    if mode == "mean":
+        return mean_color(view)
+    if mode == "median":
+        return median_color(view)
+    if mode == "dominant":
+        return dominant_color(view)
+    return center_color(view)
+
+def measure_color(view, mode, target, tolerance=0.0):
+    if mode == "coverage":
+        return coverage(view, target, tolerance)
+    return tuple(int(c) for c in np.rint(observed_color(view, mode)))
+
+def measured_matches(measured, mode, target, tolerance=0.0, min_coverage=50.0):
+    if mode == "coverage":
+        return measured >= min_coverage
+    return bool(squared_distance(np.asarray(measured), target) <= tolerance * tolerance)
+
+# Region-change signatures for watch events. "diff" keeps a grid of block
+# means and scores the share of cells whose brightness moved by more than
+# watch_cell_delta; "hash" is a 64-bit difference hash scored by the share
+# of flipped bits, which ignores global brightness shifts.
+WATCH_METHODS = ["diff", "hash"]
+watch_grid = 16
+watch_cell_delta = 12.0
+watch_sample_step = 4
+
+def block_means(view, rows, cols):
+    # Sample every few pixels first: a signature only needs the coarse layout.
+    view = np.asarray(view)
+    step = max(1, min(view.shape[0] // (rows * watch_sample_step), view.shape[1] // (cols * watch_sample_step)))
+    gray = to_gray(view[::step, ::step])
+    rows, cols = min(rows, gray.shape[0]), min(cols, gray.shape[1])
+    ys = np.linspace(0, gray.shape[0], rows + 1).astype(int)
+    xs = np.linspace(0, gray.shape[1], cols + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(gray, ys[:-1], axis=0), xs[:-1], axis=1)
+    return sums / np.outer(np.diff(ys), np.diff(xs))
+
+def region_signature(view, method="diff"):
+    if method == "hash":
+        means = block_means(view, 8, 9)
+        return means[:, 1:] > means[:, :-1]
+    return block_means(view, watch_grid, watch_grid)
+
+def change_score(before, after, method="diff"):
+    """Percent of the region that changed between two signatures."""
+    if before is None or after is None or before.shape != after.shape:
+        return 100.0
+    if method == "hash":
+        return float((before != after).mean() * 100)
+    return float((np.abs(after - before) > watch_cell_delta).mean() * 100)
+
+pyramid_min_pixels = 40000
+min_template_side = 8
+
+def to_gray(view):
+    rgb = _rgb(view).astype(np.float64)
+    return rgb @ np.array([0.299, 0.587, 0.114])
+
+def downsample(image):
+    h, w = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    return image[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+def window_sum(image, h, w):
+    c = np.pad(image, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return c[h:, w:] - c[:-h, w:] - c[h:, :-w] + c[:-h, :-w]
+
+def ncc_map(image, tz, tnorm):
+    h, w = tz.shape
+    H, W = image.shape
+    shape = (H + h - 1, W + w - 1)
+    spectrum = np.fft.rfft2(image, shape) * np.fft.rfft2(tz[::-1, ::-1], shape)
+    num = np.fft.irfft2(spectrum, shape)[h - 1:H, w - 1:W]
+    s1 = window_sum(image, h, w)
+    s2 = window_sum(image * image, h, w)
+    denom = np.sqrt(np.maximum(s2 - s1 * s1 / (h * w), 0.0)) * tnorm
+    scores = np.zeros_like(num)
+    np.divide(num, denom, out=scores, where=denom > 1e-6)
+    return scores
+
+class Template:
+    def __init__(self, gray, levels=2):
+        self.shape = gray.shape
+        self.levels = []
+        for _ in range(levels):
+            if min(gray.shape) < min_template_side:
+                break
+            tz = gray - gray.mean()
+            self.levels.append((tz, float(np.sqrt((tz * tz).sum()))))
+            gray = downsample(gray)
+
+    @classmethod
+    def from_file(cls, path):
+        with Image.open(path) as img:
+            return cls(np.asarray(img.convert("L"), dtype=np.float64))
+
+def _best(scores):
+    y, x = np.unravel_index(int(scores.argmax()), scores.shape)
+    return float(scores[y, x]), (int(x), int(y))
+
+def match_template(view, template):
+    image = to_gray(view)
+    h, w = template.shape
+    H, W = image.shape
+    if H < h or W < w or not template.levels:
+        return 0.0, None
+    if len(template.levels) > 1 and H * W >= pyramid_min_pixels:
+        tz, tnorm = template.levels[1]
+        coarse = downsample(image)
+        if coarse.shape[0] >= tz.shape[0] and coarse.shape[1] >= tz.shape[1]:
+            _, (cx, cy) = _best(ncc_map(coarse, tz, tnorm))
+            x0, y0 = max(0, 2 * cx - 2), max(0, 2 * cy - 2)
+            x1, y1 = min(W, 2 * cx + w + 2), min(H, 2 * cy + h + 2)
+            score, (fx, fy) = _best(ncc_map(image[y0:y1, x0:x1], *template.levels[0]))
+            return score, (x0 + fx, y0 + fy)
+    return _best(ncc_map(image, *template.levels[0]))
+
+class TemplateCache:
+    def __init__(self, search_dirs=None):
+        self.search_dirs = search_dirs or [os.path.join(os.getcwd(), "data")]
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        if os.path.isabs(path) or os.path.exists(path):
+            return os.path.abspath(path)
+        for folder in self.search_dirs:
+            candidate = os.path.join(folder, path)
+            if os.path.exists(candidate):
+                return candidate
+        return os.path.abspath(path)
+
+    def get(self, path):
+        template = self._templates.get(path)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(path)
+                if template is None:
+                    template = Template.from_file(self.resolve(path))
+                    self._templates[path] = template
+        return template
+
+    def preload(self, paths):
+        for path in paths:
+            try:
+                self.get(path)
+            except OSError as e:
+                logger.error(f"Could not load template '{path}': {e}")
+
+    def reload(self, paths):
+        """Re-read these templates from disk; other runs' templates stay cached."""
+        paths = list(paths)
+        with self._lock:
+            for path in paths:
+                self._templates.pop(path, None)
+        self.preload(paths)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+template_cache = TemplateCache()
@@ -0,0 +1,156 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+ERROR = "error"
+WARNING = "warning"
+
+Edge = namedtuple("Edge", "target delay")
+Issue = namedtuple("Issue", "severity kind message")
+
+class TaskGraphError(ValueError):
+    def __init__(self, issues):
+        self.issues = list(issues)
+        super().__init__("; ".join(issue.message for issue in self.issues))
+
+class Node:
+    __slots__ = ("index", "name", "event", "on_success", "on_fail", "repeat_delay", "repeat_mode", "repeat_jitter", "repeat_overrun", "resources", "priority")
+
+    def __init__(self, index, event):
+        self.index = index
+        self.name = event.event_name
+        self.event = event
+        self.on_success = None
+        self.on_fail = None
+        self.repeat_delay = max(0.0, float(event.repeat_delay)) if event.repeat else None
+        self.repeat_mode = event.repeat_mode
+        self.repeat_jitter = max(0.0, float(event.repeat_jitter))
+        self.repeat_overrun = event.repeat_overrun
+        self.resources = event.resources()
+        self.priority = event.priority
+
+    def next(self, result):
+        return self.on_success if result else self.on_fail
+
+    def __repr__(self):
+        return f"Node({self.name!r})"
+
+class TaskGraph:
+    def __init__(self, nodes, index, issues):
+        self.nodes = tuple(nodes)
+        self.index = MappingProxyType(index)
+        self.issues = tuple(issues)
+        self.roots = tuple(node for node in self.nodes if node.event.run_at_start)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, name):
+        return self.index[name]
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue.severity == WARNING]
+
+def _is_target(name):
+    return bool(name) and name != "None"
+
+def compile_task(events):
+    issues = []
+    nodes = []
+    index = {}
+    for event in events:
+        if event.event_name in index:
+            issues.append(Issue(ERROR, "duplicate", f"Duplicate event name '{event.event_name}'"))
+            continue
+        node = Node(len(nodes), event)
+        nodes.append(node)
+        index[node.name] = node
+    for node in nodes:
+        missing = set()
+        for attr, result in (("on_success", True), ("on_fail", False)):
+            name, delay = node.event.next_for(result)
+            if not _is_target(name):
+                continue
+            target = index.get(name)
+            if target is None:
+                if name not in missing:
+                    missing.add(name)
+                    issues.append(Issue(ERROR, "missing", f"'{node.name}' points to missing event '{name}'"))
+                continue
+            setattr(node, attr, Edge(target, max(0.0, float(delay))))
+    graph = TaskGraph(nodes, index, ())
+    issues.extend(_check_reachable(graph))
+    issues.extend(_check_zero_delay_cycles(graph))
+    return TaskGraph(nodes, index, issues)
+
+def successors(node):
+    edges = [node.on_success]
+    if node.on_fail is not None and node.on_fail != node.on_success:
+        edges.append(node.on_fail)
+    return [edge for edge in edges if edge is not None]
+
+def _check_reachable(graph):
+    if not graph.nodes:
+        return []
+    if not graph.roots:
+        return [Issue(WARNING, "no_start", "No event is marked RunAtStart, nothing will run")]
+    seen = set()
+    stack = list(graph.roots)
+    while stack:
+        node = stack.pop()
+        if node.index in seen:
+            continue
+        seen.add(node.index)
+        stack.extend(edge.target for edge in successors(node))
+    return [Issue(WARNING, "unreachable", f"'{node.name}' can never run (not reachable from a RunAtStart event)")
+            for node in graph.nodes if node.index not in seen]
+
+def _check_zero_delay_cycles(graph):
+    # Tarjan's SCC over the edges that fire with no delay; any component with
+    # more than one node (or a zero-delay self loop) spins without pausing.
+    adjacency = {}
+    for node in graph.nodes:
+        targets = [edge.target.index for edge in successors(node) if edge.delay <= 0]
+        if node.repeat_delay is not None and node.repeat_delay <= 0:
+            targets.append(node.index)
+        adjacency[node.index] = targets
+    low, order, on_stack, stack, issues = {}, {}, set(), [], []
+    for root in adjacency:
+        if root in order:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                order[v] = low[v] = len(order)
+                stack.append(v)
+                on_stack.add(v)
+            targets = adjacency[v]
+            if i < len(targets):
+                work.append((v, i + 1))
+                w = targets[i]
+                if w not in order:
+                    work.append((w, 0))
+                elif w in on_stack:
+                    low[v] = min(low[v], order[w])
+                continue
+            if low[v] == order[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                if len(component) > 1 or v in targets:
+                    names = [graph.nodes[n].name for n in sorted(component)]
+                    names = ", ".join(names[:8]) + (f" and {len(names) - 8} more" if len(names) > 8 else "")
+                    issues.append(Issue(WARNING, "zero_delay_cycle", f"Events loop with no delay: {names}"))
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+    return issues
@@ -1,14 +1,25 @@
 import os
 import tkinter as tk
-from tkinter import simpledialog, messagebox, ttk
+from tkinter import filedialog, simpledialog, messagebox, ttk
 from typing import Optional
 
 import main_globals as mag
-import main_utils as mau
+import main_metrics as metrics
 
-from event_window import EventButton, EventLogic, EVENT_LOGIC, EVENT_BUTTON
+from event_list import EventListView
+from event_model import OVERRUN_POLICIES, REPEAT_MODES
+from event_names import NO_EVENT, REMOVED, RENAMED, EventNameRegistry
+from event_window import EventButton, EventLogic, EventWatch, EVENT_LOGIC, EVENT_BUTTON, EVENT_WATCH
+from main_preprocess import PIPELINE_NAMES
+from main_store import open_store
+from main_vision import COLOR_MODES, WATCH_METHODS
 from main_logger import logger, application_error_handler
+from task_graph import compile_task
+from task_runner import TaskRunner
+from task_runs import run_registry
 
+runner_poll_ms = 200
+latency_refresh_ms = 1000
 
 class TaskManager:
     def __init__(self, root):
@@ -17,7 +28,17 @@ class TaskManager:
         self.root.geometry("400x600")
         self.task_name = ""
         self.overlays_visible = True
-        self.tasks = mau.load_json_file(mag.taskmanager_file)
+        # Set while overlays are hidden because a run reads or clicks the
+        # screen; they come back once no such run is active.
+        self.overlays_held = False
+        self.event_windows = []
+        self.metrics_exporter = None
+        self.latency_panel = None
+        self.runs_panel = None
+        self.polling_runs = False
+        self.tasks = open_store()
+        self.event_names = EventNameRegistry()
+        self.event_names.subscribe(self.on_event_names_changed)
         if self.task_name == '':
             self.label = tk.Label(root, text=f"Create or Load Task", font=("Arial", 14, "bold"), anchor="center")
         else:
@@ -45,24 +66,32 @@ class TaskManager:
         self.create_event_button.pack(pady=5)
         self.create_event_logic = tk.Button(root, text="Add Event Logic", command=lambda: self.create_new_event(EVENT_LOGIC), width=15)
         self.create_event_logic.pack(pady=5)
+        self.create_event_watch = tk.Button(root, text="Add Event Watch", command=lambda: self.create_new_event(EVENT_WATCH), width=15)
+        self.create_event_watch.pack(pady=5)
         self.toggle_overlays_button = tk.Button(root, text="Toggle Overlays", command=self.toggle_overlays, width=15)
         self.toggle_overlays_button.pack(pady=5)
+        self.latency_button = tk.Button(root, text="Event Latency", command=self.open_latency_panel, width=15)
+        self.latency_button.pack(pady=5)
+        self.runs_button = tk.Button(root, text="Runs", command=self.open_runs_panel, width=15)
+        self.runs_button.pack(pady=5)
         self.box_container = tk.Frame(self.root)
         self.box_container.pack(fill="both", expand=True, pady=10)
         self.box_canvas = tk.Canvas(self.box_container, highlightthickness=0)
         self.box_scrollbar = tk.Scrollbar(self.box_container,orient="vertical",command=self.box_canvas.yview)
-        self.box_canvas.configure(yscrollcommand=self.box_scrollbar.set)
         self.box_scrollbar.pack(side="right", fill="y")
         self.box_canvas.pack(side="left", fill="both", expand=True)
-        self.box_label_frame = tk.Frame(self.box_canvas)
-        self.box_canvas.create_window((0, 0), window=self.box_label_frame, anchor="nw")
-        self.box_label_frame.bind("<Configure>",lambda e: self.box_canvas.configure(scrollregion=self.box_canvas.bbox("all")))
+        self.event_list = EventListView(self.box_canvas, self.build_event_header, self.build_event_settings)
+        self.event_list.attach_scrollbar(self.box_scrollbar)
         self.box_canvas.bind_all("<MouseWheel>",lambda e: self.box_canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
         self._vcmd = (self.root.register(self._only_digits), '%P')
+        self._fcmd = (self.root.register(self._only_number), '%P')
 
     def _only_digits(self, proposed: str) -> bool:
         return proposed.isdigit() or proposed == ''
 
+    def _only_number(self, proposed: str) -> bool:
+        return proposed == '' or (proposed.count('.') <= 1 and proposed.replace('.', '', 1).isdigit())
+
     def toggle_overlays(self, force_visible=False, force_hide=False):
         if not hasattr(self, 'overlays_visible'):
             self.overlays_visible = True
@@ -71,7 +100,13 @@ class TaskManager:
             self.overlays_visible = True
         if force_hide:
             self.overlays_visible = False
-        for window in mag.event_windows:
+        if self.overlays_visible and run_registry.holding_overlays():
+            # Overlays are topmost and translucent: a running check would
+            # read them and a click would land on them wherever they cover
+            # its region, so even force_visible is refused.
+            self.overlays_visible = False
+            self.overlays_held = True
+        for window in self.event_windows:
             if self.overlays_visible:
                 window.deiconify()
             else:
@@ -81,243 +116,233 @@ class TaskManager:
         task_name = simpledialog.askstring("New Task", "Enter the name of the new task:", parent=self.root)
         if task_name:
             self.tasks[task_name] = []
-            mau.save_json_file(mag.taskmanager_file, self.tasks)
             self.task_name = task_name
             self.clear_events()
             self.label.config(text=f"Loaded: {self.task_name}")
+            self.refresh_run_state()
 
     def get_task_events(self):
         task_events = self.tasks[self.task_name]
         return task_events
 
-    def get_task_event_names(self):
-        event_names = [e["event_name"] for e in self.get_task_events()]
-        available_events = ["None"] if len(event_names) < 1 else ["None"] + event_names
-        return available_events
-
-    def update_task_ui(self):
-        current = []
-        for ev in mag.event_windows:
-            d = {
-                "event_type": ev.event_type,
-                "event_name": ev.event_name,
-                "geometry": ev.geometry(),
-                "run_at_start": ev.event_data["run_at_start"].get(),
-                "repeat": ev.event_data["repeat"].get(),
-                "repeat_delay": ev.event_data["repeat_delay"].get(),
-            }
-            if isinstance(ev, EventButton):
-                d.update({
-                    "next_event": ev.event_data["next_event"].get(),
-                    "next_event_delay": ev.event_data["next_event_delay"].get(),
-                    "type_text": ev.event_data["type_text"].get(),
-                    "entered_text": ev.event_data["entered_text"].get(),
-                    "input_random_int": ev.event_data["input_random_int"].get(),
-                    "press_enter": ev.event_data["press_enter"].get(),
-                    "press_backspace": ev.event_data["press_backspace"].get(),
-                    "random_position": ev.event_data["random_position"].get(),
-                    "move_mouse_back": ev.event_data["move_mouse_back"].get(),
-                    "double_click": ev.event_data["double_click"].get(),
-                })
-            elif isinstance(ev, EventLogic):
-                d.update({
-                    "next_event_success": ev.event_data["next_event_success"].get(),
-                    "next_event_success_delay": ev.event_data["next_event_success_delay"].get(),
-                    "logic_type": ev.event_data["logic_type"].get(),
-                    "next_event_fail": ev.event_data["next_event_fail"].get(),
-                    "next_event_fail_delay": ev.event_data["next_event_fail_delay"].get(),
-                    "logic_action": ev.event_data["logic_action"].get(),
-                    "logic_value": ev.event_data["logic_value"].get(),
-                })
-            current.append(d)
-        names = [e["event_name"] for e in current]
-        return ["None"] + names if names else ["None"]
+    def on_event_names_changed(self, kind, name, new_name):
+        if kind not in (RENAMED, REMOVED):
+            return
+        target = new_name if kind == RENAMED else NO_EVENT
+        for ev in self.event_windows:
+            for field in ev.event.link_fields:
+                if getattr(ev.event, field) == name:
+                    logger.debug(f"UpdateLink: ({ev.event_name}) {field} '{name}' -> '{target}'")
+                    ev.update_event(field, target)
+
+    def next_event_combobox(self, parent, variable, **kwargs):
+        combobox = ttk.Combobox(parent, textvariable=variable, values=self.event_names.choices(), state="readonly", **kwargs)
+        combobox.names_version = self.event_names.version
+        combobox.configure(postcommand=lambda cb=combobox: self.refresh_event_choices(cb))
+        return combobox
+
+    def refresh_event_choices(self, combobox):
+        if combobox.names_version != self.event_names.version:
+            combobox.configure(values=self.event_names.choices())
+            combobox.names_version = self.event_names.version
 
     def create_new_event(self, event_type):
         event_name = simpledialog.askstring("New Item", "Enter the name of the new item:", parent=self.root)
+        if event_name in self.event_names or event_name == NO_EVENT:
+            messagebox.showerror("Error", f"An event named '{event_name}' already exists.")
+            return
         if event_name:
             if event_type == EVENT_BUTTON:
                 self.place_event_button(event_name, reload_view=True)
             if event_type == EVENT_LOGIC:
                 self.place_event_logic(event_name, reload_view=True)
+            if event_type == EVENT_WATCH:
+                self.place_event_watch(event_name, reload_view=True)
 
     def place_event_logic(self, event_name, event_data=None, event_params=None, reload_view=False):
         event_params = {} if event_params is None else event_params
         logic_event = EventLogic(self.root,event_name,event_data=event_data,delete_callback=self.delete_event,**event_params)
-        logic_event.lift()
-        # Create Main Frame
-        event_container = tk.Frame(self.box_label_frame, bd=2, relief="solid")
-        event_container.pack(fill="x", padx=5, pady=5)
-        header = tk.Frame(event_container)
+        self.place_event(logic_event, reload_view)
+
+    def place_event_button(self, event_name, event_data=None, event_params=None, reload_view=False):
+        event_params = {} if event_params is None else event_params
+        event_button = EventButton(self.root,event_name,event_data=event_data,delete_callback=self.delete_event,**event_params)
+        self.place_event(event_button, reload_view)
+
+    def place_event_watch(self, event_name, event_data=None, event_params=None, reload_view=False):
+        event_params = {} if event_params is None else event_params
+        watch_event = EventWatch(self.root,event_name,event_data=event_data,delete_callback=self.delete_event,**event_params)
+        self.place_event(watch_event, reload_view)
+
+    def place_event(self, event_obj, reload_view=False):
+        if not self.overlays_visible:
+            event_obj.withdraw()
+        event_obj.lift()
+        self.event_boiler_plate(event_obj)
+        self.event_windows.append(event_obj)
+        if event_obj.event_name not in self.event_names:
+            self.event_names.add(event_obj.event_name)
+        self.event_list.add(event_obj, expanded=reload_view)
+        if reload_view:
+            self.event_list.see(event_obj)
+
+    def build_event_header(self, event_obj, frame, expanded):
+        header = tk.Frame(frame)
         header.pack(fill="x", pady=2)
-        logic_event.ui_frame = header
-        logic_event.event_container = event_container
-        tk.Label(header, text=event_name, anchor="w", padx=10, font=("Helvetica", 10, "bold")).pack(side="left")
-        tk.Button(header, text="X", bg="red", fg="white", bd=0, command=lambda eb=logic_event: self.delete_event(eb)).pack(side="right", padx=(5, 0))
-        tk.Button(header, text="−", bg="gray", fg="white", bd=0, command=lambda eb=logic_event: self.toggle_event_view(eb)).pack(side="right", padx=(5, 0))
-        logic_event.minimize_btn = header.winfo_children()[-1]
-        # Body (settings)
-        body = tk.Frame(event_container)
-        body.pack(fill="x", padx=5, pady=5)
-        logic_event.settings_frame = body
+        name_label = tk.Label(header, text=event_obj.event_name, anchor="w", padx=10, font=("Helvetica", 10, "bold"))
+        name_label.pack(side="left")
+        name_label.bind("<Double-Button-1>", lambda e, eb=event_obj: self.rename_event(eb))
+        tk.Button(header, text="X", bg="red", fg="white", bd=0, highlightthickness=0, command=lambda eb=event_obj: self.delete_event(eb)).pack(side="right", padx=(5, 0))
+        tk.Button(header, text="−" if expanded else "+", bg="gray", fg="white", bd=0, highlightthickness=0, command=lambda eb=event_obj: self.toggle_event_view(eb)).pack(side="right", padx=(5, 0))
+
+    def build_event_settings(self, event_obj, body):
+        if isinstance(event_obj, EventWatch):
+            self.build_watch_settings(event_obj, body)
+        elif isinstance(event_obj, EventLogic):
+            self.build_logic_settings(event_obj, body)
+        elif isinstance(event_obj, EventButton):
+            self.build_button_settings(event_obj, body)
+
+    def build_schedule_settings(self, event_obj, frame):
+        ttk.Combobox(frame,textvariable=event_obj.vars["repeat_mode"],values=REPEAT_MODES,state="readonly",width=6).pack(side="left", padx=(0, 5))
+        tk.Label(frame, text="Jitter:").pack(side="left", padx=(0, 2))
+        tk.Entry(frame, textvariable=event_obj.vars["repeat_jitter"], width=4, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 5))
+        tk.Label(frame, text="Overrun:").pack(side="left", padx=(0, 2))
+        ttk.Combobox(frame,textvariable=event_obj.vars["repeat_overrun"],values=OVERRUN_POLICIES,state="readonly",width=8).pack(side="left", padx=(0, 5))
+        tk.Label(frame, text="Priority:").pack(side="left", padx=(0, 2))
+        tk.Entry(frame, textvariable=event_obj.vars["priority"], width=3, validate="key", validatecommand=self._vcmd).pack(side="left")
+
+    def build_logic_settings(self, logic_event, body):
         # ── Group 1: Event Settings ──
         es = tk.LabelFrame(body, text="Event Settings", padx=5, pady=5)
         es.pack(fill="x", pady=3)
-        tk.Checkbutton(es, text="RunAtStart",variable=logic_event.event_data["run_at_start"], command=lambda eb=logic_event: eb.update_event("run_at_start",eb.event_data["run_at_start"].get())).pack(side="left", padx=5)
-        tk.Checkbutton(es, text="Repeat",variable=logic_event.event_data["repeat"], command=lambda eb=logic_event: eb.update_event("repeat",eb.event_data["repeat"].get())).pack(side="left", padx=5)
-        rd = tk.Entry(es, textvariable=logic_event.event_data["repeat_delay"],width=5, validate="key", validatecommand=self._vcmd)
-        rd.pack(side="left", padx=5)
-        rd.bind("<FocusOut>", lambda e, eb=logic_event: eb.update_event("repeat_delay", eb.event_data["repeat_delay"].get()))
+        tk.Checkbutton(es, text="RunAtStart",variable=logic_event.vars["run_at_start"]).pack(side="left", padx=5)
+        tk.Checkbutton(es, text="Repeat",variable=logic_event.vars["repeat"]).pack(side="left", padx=5)
+        tk.Entry(es, textvariable=logic_event.vars["repeat_delay"],width=5, validate="key", validatecommand=self._fcmd).pack(side="left", padx=5)
+        self.build_schedule_settings(logic_event, es)
         # ── Group 2: Next Event Settings ──
         ne = tk.LabelFrame(body, text="Next Event Settings", padx=5, pady=5)
         ne.pack(fill="x", pady=3)
-        names = self.get_task_event_names()
         # Success path
         tk.Label(ne, text="Success:", fg="green").pack(side="left", padx=(0, 2))
-        logic_event.next_event_success_menu = ttk.Combobox(ne,textvariable=logic_event.event_data["next_event_success"],values=names,state="readonly",width=10)
+        logic_event.next_event_success_menu = self.next_event_combobox(ne, logic_event.vars["next_event_success"], width=10)
         logic_event.next_event_success_menu.pack(side="left", padx=(0, 5))
-        logic_event.next_event_success_menu.current(names.index(logic_event.event_data["next_event_success"].get()))
-        sd = tk.Entry(ne, textvariable=logic_event.event_data["next_event_success_delay"],width=4, validate="key", validatecommand=self._vcmd)
-        sd.pack(side="left", padx=(0, 10))
-        sd.bind("<FocusOut>", lambda e, eb=logic_event: eb.update_event("next_event_success_delay", eb.event_data["next_event_success_delay"].get()))
+        tk.Entry(ne, textvariable=logic_event.vars["next_event_success_delay"],width=4, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 10))
         # Failure path
         tk.Label(ne, text="Fail:", fg="red").pack(side="left", padx=(0, 2))
-        logic_event.next_event_fail_menu = ttk.Combobox(ne,textvariable=logic_event.event_data["next_event_fail"],values=names,state="readonly",width=10)
+        logic_event.next_event_fail_menu = self.next_event_combobox(ne, logic_event.vars["next_event_fail"], width=10)
         logic_event.next_event_fail_menu.pack(side="left", padx=(0,5))
-        logic_event.next_event_fail_menu.current(names.index(logic_event.event_data["next_event_fail"].get()))
-        fd = tk.Entry(ne, textvariable=logic_event.event_data["next_event_fail_delay"],width=4,validate="key",validatecommand=self._vcmd)
-        fd.pack(side="left")
-        fd.bind("<FocusOut>", lambda e, eb=logic_event: eb.update_event("next_event_fail_delay", eb.event_data["next_event_fail_delay"].get()))
+        tk.Entry(ne, textvariable=logic_event.vars["next_event_fail_delay"],width=4,validate="key",validatecommand=self._fcmd).pack(side="left")
         # ── Group 3: Actions ──
         af = tk.LabelFrame(body, text="Actions", padx=5, pady=5)
         af.pack(fill="x", pady=3)
         # Action type (text_logic / color_logic)
-        action_menu = ttk.Combobox(af,textvariable=logic_event.event_data["logic_action"],values=["text_logic", "color_logic"],state="readonly",width=12)
-        action_menu.pack(side="left", padx=(0, 8))
+        ttk.Combobox(af,textvariable=logic_event.vars["logic_action"],values=["text_logic", "color_logic", "image_match"],state="readonly",width=12).pack(side="left", padx=(0, 8))
         # Logic operator
         tk.Label(af, text="Operator:").pack(side="left", padx=(0, 2))
-        op_menu = ttk.Combobox(af,textvariable=logic_event.event_data["logic_type"],values=["=", ">", ">=", "<", "<=", "!=", "contains", "like"],state="readonly",width=8)
-        op_menu.pack(side="left", padx=(0, 8))
-        val_entry = tk.Entry(af, textvariable=logic_event.event_data["logic_value"], width=15)
-        val_entry.pack(side="left", padx=5)
-        self.event_boiler_plate(logic_event)
-        mag.event_windows.append(logic_event)
-        if reload_view:
-            self.update_task_events()
+        ttk.Combobox(af,textvariable=logic_event.vars["logic_type"],values=["=", ">", ">=", "<", "<=", "!=", "contains", "like"],state="readonly",width=8).pack(side="left", padx=(0, 8))
+        tk.Entry(af, textvariable=logic_event.vars["logic_value"], width=15).pack(side="left", padx=5)
+        tk.Checkbutton(af, text="Cache OCR", variable=logic_event.vars["ocr_cache"]).pack(side="left", padx=5)
+        # ── Group 4: OCR Preprocessing ──
+        op = tk.LabelFrame(body, text="OCR Preprocessing", padx=5, pady=5)
+        op.pack(fill="x", pady=3)
+        ttk.Combobox(op,textvariable=logic_event.vars["ocr_preprocess"],values=PIPELINE_NAMES,state="readonly",width=10).pack(side="left", padx=(0, 8))
+        tk.Label(op, text="Min glyph px:").pack(side="left", padx=(0, 2))
+        tk.Entry(op, textvariable=logic_event.vars["ocr_min_height"], width=4, validate="key", validatecommand=self._vcmd).pack(side="left")
+        # ── Group 5: Color Match ──
+        cm = tk.LabelFrame(body, text="Color Match", padx=5, pady=5)
+        cm.pack(fill="x", pady=3)
+        ttk.Combobox(cm,textvariable=logic_event.vars["color_mode"],values=COLOR_MODES,state="readonly",width=10).pack(side="left", padx=(0, 8))
+        tk.Label(cm, text="Tolerance:").pack(side="left", padx=(0, 2))
+        tk.Entry(cm, textvariable=logic_event.vars["color_tolerance"], width=5, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 8))
+        tk.Label(cm, text="Coverage %:").pack(side="left", padx=(0, 2))
+        tk.Entry(cm, textvariable=logic_event.vars["color_coverage"], width=5, validate="key", validatecommand=self._fcmd).pack(side="left")
+        # ── Group 6: Image Match ──
+        im = tk.LabelFrame(body, text="Image Match", padx=5, pady=5)
+        im.pack(fill="x", pady=3)
+        tk.Button(im, text="Template...", command=lambda eb=logic_event: self.choose_template(eb)).pack(side="left", padx=(0, 8))
+        tk.Label(im, text="Threshold:").pack(side="left", padx=(0, 2))
+        tk.Entry(im, textvariable=logic_event.vars["match_threshold"], width=5, validate="key", validatecommand=self._fcmd).pack(side="left")
 
-    def place_event_button(self, event_name, event_data=None, event_params=None, reload_view=False):
-        event_params = {} if event_params is None else event_params
-        event_button = EventButton(self.root,event_name,event_data=event_data,delete_callback=self.delete_event,**event_params)
-        # event_button = EventWindow(self.root, event_type=EVENT_BUTTON, event_name=event_name, event_data=event_data, delete_callback=self.delete_event, **event_params)
-        event_button.lift()
-        # Create Main Frame
-        event_container = tk.Frame(self.box_label_frame, bd=2, relief="solid")
-        event_container.pack(fill="x", padx=5, pady=5)
-        # Create Header Frame
-        label_frame = tk.Frame(event_container)
-        event_button.ui_frame = label_frame
-        event_button.event_container = event_container
-        label_frame.pack(fill="x", pady=2)
-        # Event Name
-        label_text = tk.Label(label_frame, text=event_name, anchor="w", padx=10, font=("Helvetica", 10, "bold"))
-        label_text.pack(side="left")
-        # Delete and Minimize Buttons
-        delete_btn = tk.Button(label_frame,text="X",command=lambda eb=event_button: self.delete_event(eb),anchor="e",bg="red",fg="white",bd=0,highlightthickness=0)
-        delete_btn.pack(side="right", padx=(5, 0))
-        minimize_btn = tk.Button(label_frame,text="−",command=lambda eb=event_button: self.toggle_event_view(eb),anchor="e",bg="gray",fg="white",bd=0,highlightthickness=0)
-        minimize_btn.pack(side="right", padx=(5, 0))
-        event_button.minimize_btn = minimize_btn
-        # Create Body Frame
-        settings_frame = tk.Frame(event_container)
-        event_button.settings_frame = settings_frame
-        settings_frame.pack(fill="x", padx=5, pady=5)
+    def build_watch_settings(self, watch_event, body):
+        # Success fires on a change (or a passing logic check), Fail on timeout.
+        self.build_logic_settings(watch_event, body)
+        # ── Group 7: Watch ──
+        wf = tk.LabelFrame(body, text="Watch", padx=5, pady=5)
+        wf.pack(fill="x", pady=3)
+        ttk.Combobox(wf,textvariable=watch_event.vars["watch_method"],values=WATCH_METHODS,state="readonly",width=6).pack(side="left", padx=(0, 8))
+        tk.Label(wf, text="Change %:").pack(side="left", padx=(0, 2))
+        tk.Entry(wf, textvariable=watch_event.vars["watch_threshold"], width=4, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 8))
+        tk.Label(wf, text="Poll s:").pack(side="left", padx=(0, 2))
+        tk.Entry(wf, textvariable=watch_event.vars["watch_interval"], width=4, validate="key", validatecommand=self._fcmd).pack(side="left")
+        tk.Label(wf, text="-").pack(side="left")
+        tk.Entry(wf, textvariable=watch_event.vars["watch_max_interval"], width=4, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 8))
+        tk.Label(wf, text="Timeout s:").pack(side="left", padx=(0, 2))
+        tk.Entry(wf, textvariable=watch_event.vars["watch_timeout"], width=4, validate="key", validatecommand=self._fcmd).pack(side="left", padx=(0, 8))
+        tk.Checkbutton(wf, text="Then check logic", variable=watch_event.vars["watch_check_logic"]).pack(side="left", padx=5)
+
+    def build_button_settings(self, event_button, settings_frame):
         # Group 1: Event Settings (RunAtStart, Repeat, Repeat Delay)
         event_settings_frame = tk.LabelFrame(settings_frame, text="Event Settings", padx=5, pady=5)
         event_settings_frame.pack(fill="x", padx=5, pady=3)
-        run_at_start_checkbox = tk.Checkbutton(event_settings_frame,text="RunAtStart",variable=event_button.event_data["run_at_start"],command=lambda eb=event_button: eb.update_event('run_at_start', eb.event_data["run_at_start"].get()))
-        run_at_start_checkbox.pack(side="left", padx=5)
-        repeat_checkbox = tk.Checkbutton(event_settings_frame,text="Repeat",variable=event_button.event_data["repeat"],command=lambda eb=event_button: eb.update_event('repeat', eb.event_data["repeat"].get()))
-        repeat_checkbox.pack(side="left", padx=5)
-        repeat_delay = tk.Entry(event_settings_frame,textvariable=event_button.event_data["repeat_delay"],width=5,validate='key',validatecommand=self._vcmd)
-        repeat_delay.pack(side="left", padx=5)
-        repeat_delay.bind("<FocusOut>", lambda e, eb=event_button: eb.update_event('repeat_delay', eb.event_data["repeat_delay"].get()))
+        tk.Checkbutton(event_settings_frame,text="RunAtStart",variable=event_button.vars["run_at_start"]).pack(side="left", padx=5)
+        tk.Checkbutton(event_settings_frame,text="Repeat",variable=event_button.vars["repeat"]).pack(side="left", padx=5)
+        tk.Entry(event_settings_frame,textvariable=event_button.vars["repeat_delay"],width=5,validate='key',validatecommand=self._fcmd).pack(side="left", padx=5)
+        self.build_schedule_settings(event_button, event_settings_frame)
         # Group 2: Next Event Settings (Next Event and Delay)
         next_event_frame = tk.LabelFrame(settings_frame, text="Next Event Settings", padx=5, pady=5)
         next_event_frame.pack(fill="x", padx=5, pady=3)
-        task_event_names = self.get_task_event_names()
-        next_event_menu = ttk.Combobox(next_event_frame,textvariable=event_button.event_data["next_event"],values=task_event_names,state="readonly")
-        next_event_menu.pack(side="left", padx=5)
-        next_event_menu.current(task_event_names.index(event_button.event_data["next_event"].get()))
-        event_button.next_event_menu = next_event_menu
-        next_event_delay = tk.Entry(next_event_frame,textvariable=event_button.event_data["next_event_delay"],width=5,validate='key',validatecommand=self._vcmd)
-        next_event_delay.pack(side="left", padx=5)
-        next_event_delay.bind("<FocusOut>", lambda e, eb=event_button: eb.update_event('next_event_delay', eb.event_data["next_event_delay"].get()))
+        event_button.next_event_menu = self.next_event_combobox(next_event_frame, event_button.vars["next_event"])
+        event_button.next_event_menu.pack(side="left", padx=5)
+        tk.Entry(next_event_frame,textvariable=event_button.vars["next_event_delay"],width=5,validate='key',validatecommand=self._fcmd).pack(side="left", padx=5)
         # Group 3: Actions (Text and Mouse Actions)
         actions_frame = tk.LabelFrame(settings_frame, text="Actions", padx=5, pady=5)
         actions_frame.pack(fill="x", padx=5, pady=3)
         text_actions_frame = tk.Frame(actions_frame)
         text_actions_frame.pack(side="top", fill="x", pady=3)
-        type_text_checkbox = tk.Checkbutton(text_actions_frame,text="Type Text",variable=event_button.event_data["type_text"],command=lambda eb=event_button: eb.update_event('type_text', eb.event_data["type_text"].get()))
-        type_text_checkbox.pack(side="left", padx=5)
-        text_entry = tk.Entry(text_actions_frame,textvariable=event_button.event_data["entered_text"],width=10)
-        text_entry.pack(side="left", padx=5)
-        input_random_int_checkbox = tk.Checkbutton(text_actions_frame, text="Random Int", variable=event_button.event_data["input_random_int"],command=lambda eb=event_button: eb.update_event('input_random_int', eb.event_data["input_random_int"].get()))
-        input_random_int_checkbox.pack(side="left", padx=5)
-        press_enter_checkbox = tk.Checkbutton(text_actions_frame,text="Press Enter",variable=event_button.event_data["press_enter"],command=lambda eb=event_button: eb.update_event('press_enter', eb.event_data["press_enter"].get()))
-        press_enter_checkbox.pack(side="left", padx=5)
-        press_backspace_checkbox = tk.Checkbutton(text_actions_frame,text="Press Backspace",variable=event_button.event_data["press_backspace"],command=lambda eb=event_button: eb.update_event('press_backspace', eb.event_data["press_backspace"].get()))
-        press_backspace_checkbox.pack(side="left", padx=5)
+        tk.Checkbutton(text_actions_frame,text="Type Text",variable=event_button.vars["type_text"]).pack(side="left", padx=5)
+        tk.Entry(text_actions_frame,textvariable=event_button.vars["entered_text"],width=10).pack(side="left", padx=5)
+        tk.Checkbutton(text_actions_frame, text="Random Int", variable=event_button.vars["input_random_int"]).pack(side="left", padx=5)
+        tk.Checkbutton(text_actions_frame,text="Press Enter",variable=event_button.vars["press_enter"]).pack(side="left", padx=5)
+        tk.Checkbutton(text_actions_frame,text="Press Backspace",variable=event_button.vars["press_backspace"]).pack(side="left", padx=5)
         mouse_actions_frame = tk.Frame(actions_frame)
         mouse_actions_frame.pack(side="top", fill="x", pady=3)
-        random_position_checkbox = tk.Checkbutton(mouse_actions_frame,text="Random Position",variable=event_button.event_data["random_position"],command=lambda eb=event_button: eb.update_event('random_position', eb.event_data["random_position"].get()))
-        random_position_checkbox.pack(side="left", padx=5)
-        move_mouse_back_checkbox = tk.Checkbutton(mouse_actions_frame,text="Move Mouse Back",variable=event_button.event_data["move_mouse_back"],command=lambda eb=event_button: eb.update_event('move_mouse_back', eb.event_data["move_mouse_back"].get()))
-        move_mouse_back_checkbox.pack(side="left", padx=5)
-        double_click_checkbox = tk.Checkbutton(mouse_actions_frame,text="Double Click",variable=event_button.event_data["double_click"],command=lambda eb=event_button: eb.update_event('double_click', eb.event_data["double_click"].get()))
-        double_click_checkbox.pack(side="left", padx=5)
-        self.event_boiler_plate(event_button)
-        mag.event_windows.append(event_button)
-        if reload_view:
-            self.update_task_events()
-
-    def toggle_event_view(self, event_button):
-        settings_frame = event_button.settings_frame
-        minimize_btn = event_button.minimize_btn
-        event_container = event_button.event_container
-        self.box_label_frame.update_idletasks()
-        if settings_frame.winfo_ismapped():
-            settings_frame.pack_forget()
-            minimize_btn.config(text="+")
-            event_container.pack(anchor="n", fill="x", pady=5)
-        else:
-            settings_frame.pack(fill="x", pady=5)
-            minimize_btn.config(text="−")
-            event_container.pack(anchor="n", fill="x", pady=5)
+        tk.Checkbutton(mouse_actions_frame,text="Random Position",variable=event_button.vars["random_position"]).pack(side="left", padx=5)
+        tk.Checkbutton(mouse_actions_frame,text="Move Mouse Back",variable=event_button.vars["move_mouse_back"]).pack(side="left", padx=5)
+        tk.Checkbutton(mouse_actions_frame,text="Double Click",variable=event_button.vars["double_click"]).pack(side="left", padx=5)
+
+    def choose_template(self, logic_event):
+        path = filedialog.askopenfilename(parent=self.root, title="Choose Template", filetypes=[("PNG images", "*.png"), ("All files", "*.*")])
+        if path:
+            logic_event.update_event("logic_action", "image_match")
+            logic_event.update_event("logic_value", path)
+
+    def toggle_event_view(self, event_obj):
+        self.event_list.toggle(event_obj)
 
     def delete_event(self, event_object):
-        if mag.task_running:
+        if self.current_run() is not None:
             return
-        if event_object in mag.event_windows:
-            mag.event_windows.remove(event_object)
+        if event_object in self.event_windows:
+            self.event_windows.remove(event_object)
+        self.event_list.remove(event_object)
         event_object.destroy()
-        if hasattr(event_object, "event_container") and event_object.event_container:
-            event_object.event_container.destroy()
-        if hasattr(event_object, "event_name"):
-            self.tasks[self.task_name] = [ev for ev in self.tasks[self.task_name]if ev.get("event_name") != event_object.event_name]
-
-    def update_task_events(self):
-        names = self.update_task_ui()
-        for ev in mag.event_windows:
-            if isinstance(ev, EventButton):
-                ev.next_event_menu["values"] = names
-                ev.next_event_menu.current(names.index(ev.event_data["next_event"].get()))
-            elif isinstance(ev, EventLogic):
-                ev.next_event_success_menu["values"] = names
-                ev.next_event_success_menu.current(names.index(ev.event_data["next_event_success"].get()))
-                ev.next_event_fail_menu["values"] = names
-                ev.next_event_fail_menu.current(names.index(ev.event_data["next_event_fail"].get()))
-            else:
-                logger.error(f"Unknown event type in update_task_events: {ev}")
+        if not any(ev.event_name == event_object.event_name for ev in self.event_windows):
+            self.event_names.remove(event_object.event_name)
+
+    def rename_event(self, event_obj):
+        if self.current_run() is not None:
+            return
+        old_name = event_obj.event_name
+        new_name = simpledialog.askstring("Rename Event", "Enter the new name:", initialvalue=old_name, parent=self.root)
+        if not new_name or new_name == old_name:
+            return
+        if new_name in self.event_names or new_name == NO_EVENT:
+            messagebox.showerror("Error", f"An event named '{new_name}' already exists.")
+            return
+        event_obj.rename(new_name)
+        self.event_names.rename(old_name, new_name)
+        self.event_list.rebuild(event_obj)
 
     def event_boiler_plate(self, event_obj):
         event_obj.bind("<Button-1>", event_obj.start_move)
@@ -329,36 +354,7 @@ class TaskManager:
         if not self.task_name:
             messagebox.showwarning("No Task Selected", "Please create or load a task before saving.")
             return
-        events_to_save = []
-        for ev in mag.event_windows:
-            data = {"event_type": ev.event_type,"event_name": ev.event_name,"geometry": ev.geometry(),"run_at_start": ev.event_data["run_at_start"].get(),"repeat": ev.event_data["repeat"].get(),"repeat_delay": ev.event_data["repeat_delay"].get(),}
-            if isinstance(ev, EventButton):
-                data.update({
-                    "next_event": ev.event_data["next_event"].get(),
-                    "next_event_delay": ev.event_data["next_event_delay"].get(),
-                    "type_text": ev.event_data["type_text"].get(),
-                    "entered_text": ev.event_data["entered_text"].get(),
-                    "input_random_int": ev.event_data["input_random_int"].get(),
-                    "press_enter": ev.event_data["press_enter"].get(),
-                    "press_backspace": ev.event_data["press_backspace"].get(),
-                    "random_position": ev.event_data["random_position"].get(),
-                    "move_mouse_back": ev.event_data["move_mouse_back"].get(),
-                    "double_click": ev.event_data["double_click"].get(),
-                })
-            elif isinstance(ev, EventLogic):
-                data.update({
-                    "next_event_success": ev.event_data["next_event_success"].get(),
-                    "next_event_success_delay": ev.event_data["next_event_success_delay"].get(),
-                    "logic_type": ev.event_data["logic_type"].get(),
-                    "next_event_fail": ev.event_data["next_event_fail"].get(),
-                    "next_event_fail_delay": ev.event_data["next_event_fail_delay"].get(),
-                    "logic_action": ev.event_data["logic_action"].get(),
-                    "logic_value": ev.event_data["logic_value"].get(),
-                })
-            events_to_save.append(data)
-
-        self.tasks[self.task_name] = events_to_save
-        mau.save_json_file(mag.taskmanager_file, self.tasks)
+        self.tasks[self.task_name] = [ev.to_dict() for ev in self.event_windows]
         logger.debug(f"Task '{self.task_name}' saved.")
 
     def load_task(self):
@@ -375,67 +371,172 @@ class TaskManager:
         self.label.config(text=f"Loaded: {self.task_name}")
         for event_item in self.get_task_events():
             geom = {"geometry": event_item.get("geometry", "200x200")}
-            base_data = {"run_at_start": event_item["run_at_start"],"repeat": event_item["repeat"],"repeat_delay": event_item["repeat_delay"],}
             if event_item["event_type"] == EVENT_BUTTON:
-                btn_data = {
-                    **base_data,
-                    "next_event": event_item["next_event"],
-                    "next_event_delay": event_item["next_event_delay"],
-                    "type_text": event_item["type_text"],
-                    "entered_text": event_item["entered_text"],
-                    "input_random_int": event_item["input_random_int"],
-                    "press_enter": event_item["press_enter"],
-                    "press_backspace": event_item["press_backspace"],
-                    "random_position": event_item["random_position"],
-                    "move_mouse_back": event_item["move_mouse_back"],
-                    "double_click": event_item["double_click"],
-                }
-                self.place_event_button(event_name=event_item["event_name"],event_data=btn_data,event_params=geom)
+                self.place_event_button(event_name=event_item["event_name"],event_data=event_item,event_params=geom)
             elif event_item["event_type"] == EVENT_LOGIC:
-                logic_data = {
-                    **base_data,
-                    "next_event_success": event_item["next_event_success"],
-                    "next_event_success_delay": event_item["next_event_success_delay"],
-                    "logic_type": event_item["logic_type"],
-                    "next_event_fail": event_item["next_event_fail"],
-                    "next_event_fail_delay": event_item["next_event_fail_delay"],
-                    "logic_action": event_item["logic_action"],
-                    "logic_value": event_item["logic_value"],
-                }
-                self.place_event_logic(event_name=event_item["event_name"],event_data=logic_data,event_params=geom)
+                self.place_event_logic(event_name=event_item["event_name"],event_data=event_item,event_params=geom)
+            elif event_item["event_type"] == EVENT_WATCH:
+                self.place_event_watch(event_name=event_item["event_name"],event_data=event_item,event_params=geom)
             else:
                 logger.debug(f"Unknown event type: {event_item['event_type']}")
+        self.refresh_run_state()
         logger.debug(f"Task '{self.task_name}' loaded.")
-        self.update_task_events()
 
     def clear_events(self):
-        for ev in mag.event_windows:
+        self.event_list.clear()
+        for ev in self.event_windows:
             ev.destroy()
-        mag.event_windows.clear()
-        for child in self.box_label_frame.winfo_children():
-            child.destroy()
+        self.event_windows.clear()
+        self.event_names.reset()
+
+    def current_run(self):
+        return run_registry.for_task(self.task_name) if self.task_name else None
+
+    def lock_event_windows(self, locked):
+        for window in self.event_windows:
+            window.locked = locked
 
     def start_task(self):
-        if not mag.task_running:
-            mag.task_running = True
-            self.toggle_overlays(force_hide=True)
-            self.start_button.config(state="disabled")
-            self.stop_button.config(state="normal")
-            self.status_label.config(text="Status: Running")
-            for window in mag.event_windows:
-                run_at_start = window.event_data["run_at_start"].get()
-                if run_at_start:
-                    window.start_event()
+        if self.current_run() is not None:
+            return
+        events = [window.snapshot() for window in self.event_windows]
+        graph = compile_task(events)
+        if graph.errors:
+            messagebox.showerror("Task Errors", "\n".join(issue.message for issue in graph.errors))
+            return
+        if graph.warnings and not messagebox.askyesno("Task Warnings", "\n".join(issue.message for issue in graph.warnings) + "\n\nStart anyway?"):
+            return
+        conflicts = run_registry.conflicts(events)
+        if conflicts:
+            lines = [f"'{other.task_name}' also uses the {', '.join(sorted(shared))}" for other, shared in conflicts]
+            if not messagebox.askyesno("Input Overlap", "\n".join(lines) + "\n\nInput events of both tasks will take turns. Start anyway?"):
+                return
+        runner = TaskRunner(self.task_name, events)
+        try:
+            runner.start_background()
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.toggle_overlays(force_hide=True)
+        self.lock_event_windows(True)
+        if metrics.enabled and self.metrics_exporter is None:
+            self.metrics_exporter = metrics.MetricsExporter(mag.metrics_file).start()
+        self.refresh_run_state()
+        if not self.polling_runs:
+            self.polling_runs = True
+            self.root.after(runner_poll_ms, self.poll_runs)
 
-    def stop_task(self):
-        if mag.task_running:
+    def poll_runs(self):
+        self.refresh_run_state()
+        if run_registry.active():
+            self.root.after(runner_poll_ms, self.poll_runs)
+            return
+        self.polling_runs = False
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+
+    def refresh_run_state(self):
+        current = self.current_run()
+        others = len([context for context in run_registry.active() if context is not current])
+        if current is None and any(window.locked for window in self.event_windows):
+            self.lock_event_windows(False)
+            self.overlays_held = True
+        if current is not None:
+            self.lock_event_windows(True)
+        if run_registry.holding_overlays():
+            if self.overlays_visible:
+                self.toggle_overlays(force_hide=True)
+                self.overlays_held = True
+        elif self.overlays_held:
+            self.overlays_held = False
             self.toggle_overlays(force_visible=True)
-            mag.task_running = False
-            self.start_button.config(state="normal")
-            self.stop_button.config(state="disabled")
-            self.status_label.config(text="Status: Idle")
-            for window in mag.event_windows:
-                window.stop_event()
+        self.start_button.config(state="disabled" if current is not None else "normal")
+        self.stop_button.config(state="normal" if current is not None else "disabled")
+        text = f"Status: Running ({current.status()['pending']} pending)" if current is not None else "Status: Idle"
+        if others:
+            text += f" + {others} other run{'s' if others > 1 else ''}"
+        self.status_label.config(text=text)
+
+    def stop_task(self):
+        current = self.current_run()
+        if current is not None:
+            current.stop()
+        self.refresh_run_state()
+
+    def open_runs_panel(self):
+        if self.runs_panel is not None and self.runs_panel.winfo_exists():
+            self.runs_panel.lift()
+            return
+        panel = tk.Toplevel(self.root)
+        panel.title("Runs")
+        panel.geometry("460x260")
+        columns = ("state", "events", "pending", "elapsed")
+        tree = ttk.Treeview(panel, columns=columns, show="tree headings", selectmode="browse")
+        tree.heading("#0", text="Run")
+        tree.column("#0", width=140)
+        for column, title in zip(columns, ("State", "Events", "Pending", "Elapsed s")):
+            tree.heading(column, text=title)
+            tree.column(column, width=70, anchor="e")
+        tree.pack(fill="both", expand=True)
+        buttons = tk.Frame(panel)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Stop Run", width=12, command=lambda: self.stop_selected_run(tree)).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Clear Finished", width=12, command=lambda: self.clear_finished_runs(tree)).pack(side=tk.LEFT, padx=5)
+        self.runs_panel = panel
+        self.refresh_runs_panel(tree)
+
+    def stop_selected_run(self, tree):
+        for run_id in tree.selection():
+            run_registry.stop(run_id)
+        self.refresh_run_state()
+
+    def clear_finished_runs(self, tree):
+        run_registry.prune()
+        tree.delete(*tree.get_children())
+
+    def refresh_runs_panel(self, tree):
+        if self.runs_panel is None or not self.runs_panel.winfo_exists():
+            self.runs_panel = None
+            return
+        for status in run_registry.statuses():
+            values = (status["state"], status["events"], status["pending"], f"{status['elapsed']:.1f}")
+            if tree.exists(status["run_id"]):
+                tree.item(status["run_id"], values=values)
+            else:
+                tree.insert("", "end", iid=status["run_id"], text=status["run_id"], values=values)
+        self.root.after(latency_refresh_ms, self.refresh_runs_panel, tree)
+
+    def open_latency_panel(self):
+        if self.latency_panel is not None and self.latency_panel.winfo_exists():
+            self.latency_panel.lift()
+            return
+        metrics.enable()
+        panel = tk.Toplevel(self.root)
+        panel.title("Event Latency")
+        panel.geometry("420x300")
+        columns = ("runs", "p50", "p95", "max")
+        tree = ttk.Treeview(panel, columns=columns, show="tree headings")
+        tree.heading("#0", text="Event")
+        tree.column("#0", width=140)
+        for column, title in zip(columns, ("Runs", "p50 ms", "p95 ms", "max ms")):
+            tree.heading(column, text=title)
+            tree.column(column, width=60, anchor="e")
+        tree.pack(fill="both", expand=True)
+        self.latency_panel = panel
+        self.refresh_latency_panel(tree)
+
+    def refresh_latency_panel(self, tree):
+        if self.latency_panel is None or not self.latency_panel.winfo_exists():
+            self.latency_panel = None
+            return
+        for event_name, summary in metrics.event_latencies(self.task_name or None):
+            values = (summary["count"], f"{summary['p50'] * 1000:.1f}", f"{summary['p95'] * 1000:.1f}", f"{summary['max'] * 1000:.1f}")
+            if tree.exists(event_name):
+                tree.item(event_name, values=values)
+            else:
+                tree.insert("", "end", iid=event_name, text=event_name, values=values)
+        self.root.after(latency_refresh_ms, self.refresh_latency_panel, tree)
 
     def ask_selection(self, options, title="Select", prompt="Please choose:") -> Optional[str]:
         from main_utils import ask_selection
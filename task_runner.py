@@ -0,0 +1,385 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import main_globals as mag
+import main_input
+import main_metrics as metrics
+import main_utils as mau
+import event_actions
+from event_model import EVENT_WATCH, LOGIC_TYPES, OVERRUN_CATCH_UP, REPEAT_RATE, SHARED_RESOURCES, event_from_dict
+from main_capture import frame_cache
+from main_history import run_history
+from main_input import input_monitor
+from main_logger import application_error_handler, get_logger
+from main_scheduler import Cancelled, DeadlineScheduler, EventExecutor, ResourceScheduler
+from main_store import open_store
+from main_vision import template_cache
+from task_graph import TaskGraphError, compile_task
+from task_runs import IDLE, RUNNING, STOPPING, RunContext, run_registry
+
+logger = get_logger("scheduler")
+
+stop_timeout = 2.0
+# Capture-only checks run side by side on these workers; events that need
+# the pointer or keyboard take turns through the shared resource scheduler.
+default_workers = 4
+# Fixed-rate repeats that fall further behind than this skip ahead even
+# under the catch-up policy, so a stall does not turn into a burst.
+max_catch_up = 5
+# Invocations of one event that may wait at the same time. Extra requests
+# collapse into the earliest pending run, so an edge that loops back into
+# a repeating event cannot add another repeat loop on every pass.
+max_pending_per_event = 1
+# Cap on invocations waiting across the whole task (0 means no cap).
+max_pending_chains = 0
+
+# One per process: the pointer and keyboard are shared by every running task.
+resource_scheduler = ResourceScheduler(shared=SHARED_RESOURCES)
+
+class _Pending:
+    # due is the deadline a fixed-rate repeat anchors its next tick on;
+    # wake is when the run is released, which differs from due by jitter.
+    __slots__ = ("node", "due", "wake", "cancelled")
+
+    def __init__(self, node, due, wake=None):
+        self.node = node
+        self.due = due
+        self.wake = due if wake is None else wake
+        self.cancelled = False
+
+def load_task_events(task_name, file_path=None):
+    tasks = open_store(file_path)
+    if task_name not in tasks:
+        raise KeyError(f"Task '{task_name}' not found in {tasks.path if file_path is None else file_path}")
+    return [event_from_dict(event_item) for event_item in tasks[task_name]]
+
+class TaskRunner:
+    def __init__(self, task_name, events, scheduler=None, check_user_activity=True, workers=None, max_pending=None, max_chains=None, context=None):
+        self.task_name = task_name
+        self.events = list(events)
+        self.graph = compile_task(self.events)
+        if self.graph.errors:
+            raise TaskGraphError(self.graph.errors)
+        for issue in self.graph.warnings:
+            logger.debug(f"TaskGraph: ({task_name}) {issue.message}")
+        self.scheduler = scheduler or DeadlineScheduler()
+        self.executor = EventExecutor(default_workers if workers is None else workers, name=f"tm-{task_name}")
+        self.resources = resource_scheduler
+        self.context = context or RunContext(task_name, self.events)
+        self.context.runner = self
+        self.cancel = self.context.cancel
+        self.check_user_activity = check_user_activity
+        self.running = False
+        self.thread = None
+        self.ocr_requests = [mau.OcrRequest(ev.region, ev.ocr_preprocess, ev.ocr_min_height) for ev in self.events
+                             if ev.event_type in LOGIC_TYPES and ev.logic_action == "text_logic" and ev.ocr_cache]
+        self.max_pending = max_pending_per_event if max_pending is None else max_pending
+        self.max_chains = max_pending_chains if max_chains is None else max_chains
+        self.collapsed = 0
+        self.dropped = 0
+        self._pending = {}
+        self._depth = 0
+        self._warned = set()
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Register the run; raises RuntimeError if the task is already running."""
+        if self.context.state == IDLE:
+            run_registry.register(self.context)
+            self.context.started()
+        return self.context
+
+    def start(self):
+        self.claim()
+        logger.debug(f"StartTask: ({self.context.run_id}) with {len(self.events)} events")
+        self.running = True
+        if self.check_user_activity:
+            input_monitor.start()
+        frame_cache.register(ev.region for ev in self.events if ev.event_type in LOGIC_TYPES)
+        mau.ocr_batch.register(self.ocr_requests)
+        template_cache.reload(ev.logic_value for ev in self.events if ev.event_type in LOGIC_TYPES and ev.logic_action == "image_match")
+        self.executor.start()
+        for node in self.graph.roots:
+            self.schedule(0, node)
+        if not self._outstanding:
+            self.scheduler.stop()
+
+    def run(self):
+        self.start()
+        try:
+            self.scheduler.run(idle_exit=False)
+        finally:
+            self.running = False
+            self.executor.shutdown(stop_timeout)
+            mau.ocr_batch.unregister(self.ocr_requests)
+            run_history.flush()
+            self.context.finished()
+        logger.debug(f"TaskFinished: ({self.task_name}) capture={frame_cache.stats()} ocr_cache={mau.ocr_cache.stats()} collapsed={self.collapsed} dropped={self.dropped}")
+
+    def start_background(self):
+        self.claim()
+        self.thread = threading.Thread(target=self.run, name=f"tm-run-{self.task_name}", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self, timeout=stop_timeout):
+        logger.debug(f"StopTask: ({self.context.run_id})")
+        if self.context.state == RUNNING:
+            self.context.state = STOPPING
+        self.running = False
+        self.cancel.cancel()
+        self.scheduler.stop()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.debug(f"StopTask: ({self.task_name}) still finishing an action after {timeout}s")
+
+    def schedule(self, delay, node, rearm=False):
+        self.schedule_at(self.scheduler.clock() + max(0.0, float(delay)), node, rearm=rearm)
+
+    def schedule_at(self, due, node, wake=None, rearm=False):
+        """Queue a run of node at due.
+
+        rearm marks an event putting itself back in the queue from its own
+        run (a repeat, a watch poll, a deferral while the user is active).
+        Those replace the run that is finishing, so the chain cap does not
+        apply to them: dropping one would end that loop for the whole run.
+        """
+        wake = due if wake is None else wake
+        with self._lock:
+            queued = self._pending.setdefault(node.index, [])
+            if self.max_pending and len(queued) >= self.max_pending:
+                latest = max(queued, key=lambda p: p.wake)
+                self._collapse(node)
+                if wake >= latest.wake:
+                    return
+                # The new request is sooner: it replaces the latest one.
+                latest.cancelled = True
+                queued.remove(latest)
+                self._depth -= 1
+                self._outstanding -= 1
+            elif self.max_chains and self._depth >= self.max_chains and not rearm:
+                self.dropped += 1
+                metrics.count("events_dropped_total", task=self.task_name)
+                if "chains" not in self._warned:
+                    self._warned.add("chains")
+                    logger.warning(f"Task '{self.task_name}' has {self._depth} pending events (limit {self.max_chains}); dropping new runs of '{node.name}' and others")
+                return
+            pending = _Pending(node, due, wake)
+            queued.append(pending)
+            self._depth += 1
+            self._outstanding += 1
+            depth = self._depth
+        metrics.gauge("pending_events", depth, task=self.task_name)
+        self.scheduler.call_at(wake, self._submit, pending)
+
+    def _submit(self, pending):
+        self.executor.submit(self._invoke, pending, priority=pending.node.priority)
+
+    def _collapse(self, node):
+        # Called with the lock held.
+        self.collapsed += 1
+        metrics.count("events_collapsed_total", task=self.task_name)
+        if node.index not in self._warned:
+            self._warned.add(node.index)
+            logger.warning(f"'{node.name}' in '{self.task_name}' is scheduled faster than it runs; collapsing to {self.max_pending} pending run(s)")
+
+    def pending_depth(self):
+        with self._lock:
+            return self._depth
+
+    def pending_events(self):
+        with self._lock:
+            return {self.graph.nodes[index].name: len(queued) for index, queued in self._pending.items() if queued}
+
+    def _invoke(self, pending):
+        with self._lock:
+            if pending.cancelled:
+                return
+            self._pending[pending.node.index].remove(pending)
+            self._depth -= 1
+            depth = self._depth
+        metrics.gauge("pending_events", depth, task=self.task_name)
+        # Lateness against the deadline covers both the scheduler wake-up
+        # and the wait for a free worker.
+        metrics.observe("event_lag_seconds", max(0.0, self.scheduler.clock() - pending.wake))
+        try:
+            self.start_event(pending.node, pending.due)
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                done = self._outstanding == 0
+            if done:
+                self.scheduler.stop()
+
+    def start_event(self, node, due=None):
+        if not self.running:
+            return
+        watch = None
+        if node.event.event_type == EVENT_WATCH:
+            # Watches poll through the scheduler instead of holding a worker;
+            # only the poll that sees the change goes on to run the event.
+            watch = self.context.watch_state(node.name)
+            try:
+                wait = event_actions.poll_watch(node.event, watch)
+            except Exception as e:
+                application_error_handler(f"Error watching {node.name}: {e}")
+                wait = node.event.watch_max_interval
+            if wait is not None:
+                self.schedule(wait, node, rearm=True)
+                return
+        logger.debug(f"StartEvent: ({node.name})")
+        with metrics.timed("activity_check_seconds"):
+            user_active = self.check_user_activity and mau.is_user_active()
+        if user_active:
+            metrics.count("events_deferred_total")
+            wait = input_monitor.idle_in()
+            logger.debug(f"User active retrying in {wait:.2f}s")
+            self.schedule(wait, node, rearm=True)
+            return
+        branch = None
+        with run_history.record(self.task_name, node.name) as record:
+            try:
+                with self.hold_resources(node), metrics.timed("event_seconds", task=self.task_name, event=node.name):
+                    result = event_actions.execute(node.event, self.cancel, watch)
+                branch = ("success" if result else "fail") if node.event.event_type in LOGIC_TYPES else "done"
+                with metrics.timed("schedule_seconds"):
+                    self.handle_next(node, result)
+                    if node.repeat_delay is not None:
+                        self.schedule_repeat_event(node, due)
+            except Cancelled:
+                branch = "cancelled"
+                logger.debug(f"CancelledEvent: ({node.name})")
+            except Exception as e:
+                branch = "error"
+                application_error_handler(f"Error executing {node.name}: {e}")
+            finally:
+                if record is not None:
+                    record.branch = branch
+                metrics.count("events_total", branch=branch)
+                self.context.record(node.name, branch)
+
+    @contextmanager
+    def hold_resources(self, node):
+        start = time.perf_counter()
+        with self.resources.acquire(node.resources, node.priority, self.cancel, owner=self.context.run_id):
+            metrics.observe("resource_wait_seconds", time.perf_counter() - start, resource="+".join(sorted(node.resources)) or "none")
+            yield
+
+    def schedule_repeat_event(self, node, due=None):
+        period = node.repeat_delay
+        now = self.scheduler.clock()
+        if node.repeat_mode == REPEAT_RATE and period > 0 and due is not None:
+            # Anchor on the previous deadline rather than on "now" so the
+            # time spent executing does not accumulate as drift.
+            target = due + period
+            if target < now:
+                missed = int((now - target) // period) + 1
+                if node.repeat_overrun != OVERRUN_CATCH_UP or missed > max_catch_up:
+                    target += missed * period
+                    metrics.count("repeat_skipped_total", missed)
+                    logger.debug(f"RepeatEvent: ({node.name}) overran, skipping {missed} tick(s)")
+        else:
+            target = now + period
+        # Jitter moves only the wake-up; the next tick is still computed
+        # from the un-jittered deadline, so it cannot accumulate.
+        wake = target
+        if node.repeat_jitter:
+            wake = max(now, target + random.uniform(-node.repeat_jitter, node.repeat_jitter))
+        logger.debug(f"RepeatEvent: ({node.name}) in {wake - now:.3f} seconds")
+        self.schedule_at(target, node, wake, rearm=True)
+
+    def handle_next(self, node, result):
+        edge = node.next(result)
+        if edge is not None:
+            logger.debug(f"NextEvent: ({edge.target.name}) in ({edge.delay}) seconds")
+            self.schedule(edge.delay, edge.target)
+
+def format_status(status):
+    branches = " ".join(f"{name}={count}" for name, count in sorted(status["branches"].items(), key=lambda kv: str(kv[0])))
+    return (f"{status['run_id']}: {status['state']} events={status['events']} pending={status['pending']} "
+            f"elapsed={status['elapsed']:.1f}s {branches}").rstrip()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="task_runner", description="Run saved tasks without the Task Manager GUI.")
+    parser.add_argument("task", nargs="*", help="names of the tasks to run; several run side by side")
+    parser.add_argument("--file", default=mag.taskstore_file, help="task store to load, or a tm.json file (default: %(default)s)")
+    parser.add_argument("--list", action="store_true", help="list the available tasks and exit")
+    parser.add_argument("--check", action="store_true", help="validate the task graphs and exit")
+    parser.add_argument("--no-activity-check", action="store_true", help="do not wait for the user to be idle")
+    parser.add_argument("--idle-threshold", type=float, default=input_monitor.idle_threshold, help="seconds without user input before events may run (default: %(default)s)")
+    parser.add_argument("--input-backend", default=main_input.backend_name, choices=["auto", "windows", "evdev", "x11", "none"], help="how user input is detected (default: %(default)s)")
+    parser.add_argument("--metrics", metavar="FILE", help="collect metrics and write them to FILE every few seconds (.json for JSON, otherwise Prometheus text)")
+    parser.add_argument("--capture-ttl", type=float, default=frame_cache.ttl, help="seconds a captured frame is shared between events (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=default_workers, help="events per task that may execute at once; input events still take turns (default: %(default)s)")
+    parser.add_argument("--max-pending", type=int, default=max_pending_per_event, help="waiting runs allowed per event before requests collapse, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--max-chains", type=int, default=max_pending_chains, help="waiting runs allowed across a task, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--no-ocr-batch", action="store_true", help="OCR each text region on its own instead of batching them into one call")
+    parser.add_argument("--status", type=float, metavar="SECONDS", help="print the status of every run this often")
+    args = parser.parse_args(argv)
+    if args.list or not args.task:
+        for name in open_store(args.file):
+            print(name)
+        return 0
+    tasks = {}
+    failed = False
+    for task_name in dict.fromkeys(args.task):
+        try:
+            events = load_task_events(task_name, args.file)
+        except KeyError as e:
+            print(e.args[0], file=sys.stderr)
+            return 1
+        graph = compile_task(events)
+        prefix = f"{task_name}: " if len(args.task) > 1 else ""
+        for issue in graph.issues:
+            print(f"{prefix}{issue.severity}: {issue.message}", file=sys.stderr)
+        failed = failed or bool(graph.errors)
+        tasks[task_name] = events
+    if failed:
+        return 1
+    if args.check:
+        return 0
+    frame_cache.ttl = args.capture_ttl
+    mau.batch_ocr = not args.no_ocr_batch
+    main_input.backend_name = args.input_backend
+    input_monitor.idle_threshold = args.idle_threshold
+    exporter = metrics.MetricsExporter(args.metrics).start() if args.metrics else None
+    runners = []
+    try:
+        for task_name, events in tasks.items():
+            runner = TaskRunner(task_name, events, check_user_activity=not args.no_activity_check, workers=args.workers,
+                                max_pending=args.max_pending, max_chains=args.max_chains)
+            runner.start_background()
+            for other, shared in runner.context.conflicts:
+                print(f"warning: '{task_name}' and '{other.task_name}' both use {', '.join(sorted(shared))}; their input events will take turns", file=sys.stderr)
+            runners.append(runner)
+        next_status = time.monotonic() + (args.status or 0.0)
+        while True:
+            alive = [runner for runner in runners if runner.is_alive()]
+            if not alive:
+                break
+            alive[0].thread.join(min(0.5, args.status or 0.5))
+            if args.status and time.monotonic() >= next_status:
+                next_status += args.status
+                for status in run_registry.statuses():
+                    print(format_status(status), file=sys.stderr)
+    except KeyboardInterrupt:
+        run_registry.stop_all()
+    finally:
+        if exporter is not None:
+            exporter.stop()
+    if len(runners) > 1 or args.status:
+        for runner in runners:
+            print(format_status(runner.context.status()), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
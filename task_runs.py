@@ -0,0 +1,183 @@
+import itertools
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from event_model import CAPTURE, POINTER, SHARED_RESOURCES, WatchState
+from main_logger import get_logger
+from main_scheduler import CancelToken
+
+logger = get_logger("scheduler")
+
+IDLE = "idle"
+RUNNING = "running"
+STOPPING = "stopping"
+FINISHED = "finished"
+
+@dataclass
+class RunStats:
+    started: float = 0.0
+    finished: float = 0.0
+    events: int = 0
+    last_event: str = ""
+    branches: Counter = field(default_factory=Counter)
+
+@dataclass
+class RunContext:
+    """State of one task run: what replaced the old process-wide globals.
+
+    Everything a run needs to be started, stopped or inspected on its own
+    lives here, so several tasks can run side by side in one process.
+    """
+    task_name: str
+    events: tuple
+    run_id: str = ""
+    cancel: CancelToken = field(default_factory=CancelToken)
+    stats: RunStats = field(default_factory=RunStats)
+    state: str = IDLE
+    conflicts: list = field(default_factory=list)
+    runner: object = field(default=None, repr=False)
+    watches: dict = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.events = tuple(self.events)
+        self.run_id = self.run_id or self.task_name
+
+    @property
+    def active(self):
+        return self.state in (RUNNING, STOPPING)
+
+    @property
+    def input_resources(self):
+        return frozenset(name for event in self.events for name in event.resources() if name not in SHARED_RESOURCES)
+
+    @property
+    def needs_screen(self):
+        return any(event.resources() & {CAPTURE, POINTER} for event in self.events)
+
+    def started(self):
+        self.state = RUNNING
+        self.stats.started = time.time()
+
+    def finished(self):
+        self.state = FINISHED
+        self.stats.finished = time.time()
+
+    def watch_state(self, event_name):
+        with self._lock:
+            state = self.watches.get(event_name)
+            if state is None:
+                state = self.watches[event_name] = WatchState()
+            return state
+
+    def record(self, event_name, branch):
+        with self._lock:
+            self.stats.events += 1
+            self.stats.last_event = event_name
+            self.stats.branches[branch] += 1
+
+    def stop(self, timeout=None):
+        if self.runner is None:
+            self.cancel.cancel()
+            return
+        if timeout is None:
+            self.runner.stop()
+        else:
+            self.runner.stop(timeout)
+
+    def status(self):
+        with self._lock:
+            branches = dict(self.stats.branches)
+            events = self.stats.events
+        end = self.stats.finished or time.time()
+        return {
+            "run_id": self.run_id,
+            "task": self.task_name,
+            "state": self.state,
+            "events": events,
+            "branches": branches,
+            "last_event": self.stats.last_event,
+            "pending": self.runner.pending_depth() if self.runner is not None and self.active else 0,
+            "elapsed": end - self.stats.started if self.stats.started else 0.0,
+        }
+
+class RunRegistry:
+    """The runs in this process, keyed by run id.
+
+    A task can have one active run at a time. Registering a run whose
+    events use the pointer or keyboard while another active run does is
+    allowed (the resource scheduler makes them take turns) but is reported
+    as a conflict, since the two tasks will be fighting over the same
+    input devices.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def conflicts(self, events, exclude=None):
+        wanted = frozenset(name for event in events for name in event.resources() if name not in SHARED_RESOURCES)
+        found = []
+        for context in self.active():
+            shared = wanted & context.input_resources
+            if shared and context is not exclude:
+                found.append((context, shared))
+        return found
+
+    def register(self, context):
+        with self._lock:
+            for run_id, other in list(self._runs.items()):
+                if other.task_name != context.task_name:
+                    continue
+                if other.active:
+                    raise RuntimeError(f"Task '{context.task_name}' is already running")
+                del self._runs[run_id]
+            context.run_id = f"{context.task_name}#{next(self._seq)}"
+            self._runs[context.run_id] = context
+        context.conflicts = self.conflicts(context.events, exclude=context)
+        for other, shared in context.conflicts:
+            logger.warning(f"Run '{context.run_id}' shares {', '.join(sorted(shared))} with running '{other.run_id}'; input events will take turns")
+        return context
+
+    def get(self, run_id):
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def for_task(self, task_name):
+        with self._lock:
+            return next((c for c in self._runs.values() if c.task_name == task_name and c.active), None)
+
+    def runs(self):
+        with self._lock:
+            return list(self._runs.values())
+
+    def active(self):
+        return [context for context in self.runs() if context.active]
+
+    def holding_overlays(self):
+        """Active runs that read or click the screen, and so must not meet our overlays."""
+        return [context for context in self.active() if context.needs_screen]
+
+    def stop(self, run_id, timeout=None):
+        context = self.get(run_id)
+        if context is not None:
+            context.stop(timeout)
+        return context
+
+    def stop_all(self, timeout=None):
+        for context in self.active():
+            context.stop(timeout)
+
+    def prune(self):
+        with self._lock:
+            for run_id, context in list(self._runs.items()):
+                if context.state == FINISHED:
+                    del self._runs[run_id]
+
+    def statuses(self):
+        return [context.status() for context in self.runs()]
+
+run_registry = RunRegistry()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main_history  # noqa: E402
+
+class FakeClock:
+    def __init__(self, t=100.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+    def advance(self, seconds):
+        self.t += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture(autouse=True)
+def no_history(monkeypatch):
+    # Runs in tests must not append to data/history.sqlite3.
+    monkeypatch.setattr(main_history, "enabled", False)
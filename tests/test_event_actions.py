@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import event_actions
+from event_actions import poll_watch, watch_region
+from event_model import WatchEvent, WatchState
+from main_capture import frame_cache
+
+class Screen:
+    """Synthetic screen the watch polls read from."""
+
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self, x0, y0, x1, y1):
+        return np.full((y1 - y0, x1 - x0, 3), self.value, dtype=np.uint8)
+
+@pytest.fixture
+def screen(monkeypatch):
+    screen = Screen()
+    monkeypatch.setattr(frame_cache, "grabber", screen)
+    return screen
+
+def watch(**kwargs):
+    return WatchEvent(event_name="w", region=(0, 0, 64, 64), **kwargs)
+
+def test_backs_off_while_static_up_to_the_cap(screen):
+    event, state = watch(watch_interval=0.05, watch_max_interval=0.1), WatchState()
+    waits = [poll_watch(event, state, now=t) for t in range(5)]
+    assert waits[0] == 0.05
+    assert waits[1] == pytest.approx(0.05 * event_actions.watch_backoff)
+    assert waits[2:] == [0.1, 0.1, 0.1]
+
+def test_fires_on_change_and_stays_fired(screen):
+    event, state = watch(), WatchState()
+    poll_watch(event, state, now=0.0)
+    poll_watch(event, state, now=1.0)
+    screen.value = 200
+    assert poll_watch(event, state, now=2.0) is None
+    assert state.fired == "change"
+    assert poll_watch(event, state, now=3.0) is None
+
+def test_times_out_without_change(screen):
+    event, state = watch(watch_timeout=1.0), WatchState()
+    assert poll_watch(event, state, now=0.0) is not None
+    assert poll_watch(event, state, now=0.5) is not None
+    assert poll_watch(event, state, now=1.0) is None
+    assert state.fired == "timeout"
+    assert watch_region(event, state=state) is False
+    assert state.fired is None and state.started is None
+
+def test_each_run_keeps_its_own_baseline(screen):
+    event = watch()
+    first, second = WatchState(), WatchState()
+    poll_watch(event, first, now=0.0)
+    poll_watch(event, second, now=0.0)
+    screen.value = 200
+    assert poll_watch(event, first, now=1.0) is None
+    # The first run's new baseline does not hide the change from the second.
+    assert poll_watch(event, second, now=1.0) is None
+    assert watch_region(event, state=first) is True
+    assert watch_region(event, state=second) is True
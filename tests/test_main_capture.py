@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import main_capture
+from main_capture import FrameCache, union_bbox
+
+class Screen:
+    """Grabber over a synthetic screen whose pixels encode their own position."""
+
+    def __init__(self, width=1000, height=800):
+        ys, xs = np.mgrid[0:height, 0:width]
+        self.pixels = np.dstack([xs % 256, ys % 256, (xs // 256) * 16 + ys // 256]).astype(np.uint8)
+        self.bboxes = []
+
+    def __call__(self, x0, y0, x1, y1):
+        self.bboxes.append((x0, y0, x1, y1))
+        return self.pixels[y0:y1, x0:x1].copy()
+
+@pytest.fixture
+def screen():
+    return Screen()
+
+def test_union_bbox():
+    assert union_bbox([(10, 20, 30, 40), (50, 5, 10, 10)]) == (10, 5, 60, 60)
+
+def test_registered_regions_share_one_grab(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    cache.register([(10, 10, 20, 20), (40, 15, 20, 20)])
+    first = cache.view(10, 10, 20, 20)
+    second = cache.view(40, 15, 20, 20)
+    assert screen.bboxes == [(10, 10, 60, 35)]
+    assert np.array_equal(first, screen.pixels[10:30, 10:30])
+    assert np.array_equal(second, screen.pixels[15:35, 40:60])
+    assert cache.stats()["hits"] == 1
+
+def test_frame_expires_after_ttl(screen, clock):
+    cache = FrameCache(ttl=0.1, grabber=screen, clock=clock)
+    cache.view(0, 0, 10, 10)
+    clock.advance(0.05)
+    cache.view(0, 0, 10, 10)
+    clock.advance(0.1)
+    cache.view(0, 0, 10, 10)
+    assert len(screen.bboxes) == 2
+
+def test_invalidate_forces_a_new_grab(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    cache.view(0, 0, 10, 10)
+    cache.invalidate()
+    cache.view(0, 0, 10, 10)
+    assert len(screen.bboxes) == 2
+
+def test_region_outside_frame_regrabs(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    cache.view(0, 0, 10, 10)
+    view = cache.view(12, 0, 10, 10)
+    assert np.array_equal(view, screen.pixels[0:10, 12:22])
+    assert screen.bboxes == [(0, 0, 10, 10), (0, 0, 22, 10)]
+
+def test_far_apart_regions_are_grabbed_alone(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    cache.register([(0, 0, 10, 10), (900, 700, 10, 10)])
+    cache.view(900, 700, 10, 10)
+    assert screen.bboxes == [(900, 700, 910, 710)]
+
+def test_idle_regions_drop_out_of_the_union(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    cache.register([(0, 0, 10, 10)])
+    clock.advance(main_capture.region_idle_timeout + 1)
+    cache.view(20, 20, 10, 10)
+    assert screen.bboxes == [(20, 20, 30, 30)]
+
+def test_frames_are_read_only(screen, clock):
+    cache = FrameCache(grabber=screen, clock=clock)
+    view = cache.view(0, 0, 10, 10)
+    with pytest.raises(ValueError):
+        view[0, 0] = 0
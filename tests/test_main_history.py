@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+import main_history
+from main_history import Record, RunHistory, aggregate, percentile
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(str(tmp_path / "history.sqlite3"))
+    yield history
+    history.close()
+
+def record(task="t", event="e", branch="success", duration=0.01):
+    rec = Record(task, event)
+    rec.branch = branch
+    rec.duration = duration
+    return rec
+
+def count(history):
+    with history._db_lock:
+        return history._connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+def test_append_does_not_write_until_flushed(history):
+    history.append(record())
+    assert history._buffer
+    assert history.flush() == 1
+    assert count(history) == 1
+
+def test_full_batch_is_written_in_the_background(history, monkeypatch):
+    monkeypatch.setattr(main_history, "flush_every", 4)
+    for _ in range(4):
+        history.append(record())
+    deadline = time.monotonic() + 2.0
+    while count(history) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert count(history) == 4
+    assert history._buffer == []
+
+def test_compaction_keeps_newest_and_tracks_count(history, monkeypatch):
+    monkeypatch.setattr(main_history, "max_records", 10)
+    monkeypatch.setattr(main_history, "compact_ratio", 0.5)
+    for i in range(11):
+        history.append(record(event=f"e{i}"))
+    history.flush()
+    events = [event for _, event, *_ in history.query()]
+    assert events == [f"e{i}" for i in range(6, 11)]
+    assert history._count == 5
+
+def test_row_count_survives_reopen(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    first = RunHistory(path)
+    for _ in range(3):
+        first.append(record())
+    first.close()
+    second = RunHistory(path)
+    second._connect()
+    assert second._count == 3
+    second.close()
+
+def test_query_filters(history):
+    history.append(record(task="a", event="x"))
+    history.append(record(task="b", event="x"))
+    history.append(record(task="a", event="y"))
+    assert len(history.query(task="a")) == 2
+    assert len(history.query(task="a", event="y")) == 1
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5, 1, 3], 100) == 5
+
+def test_aggregate_groups_by_task_and_event():
+    rows = [
+        ("t", "e", "success", 0.1, 0.01, 0.0, 0.0),
+        ("t", "e", "fail", 0.3, 0.03, 0.0, 0.0),
+        ("t", "f", "done", 0.2, 0.0, 0.0, 0.05),
+    ]
+    stats = {(s["task"], s["event"]): s for s in aggregate(rows)}
+    e = stats[("t", "e")]
+    assert e["count"] == 2
+    assert e["branches"] == {"success": 1, "fail": 1}
+    assert e["duration"]["mean"] == pytest.approx(0.2)
+    assert e["duration"]["p50"] == pytest.approx(0.2)
+    # Stages an event never used do not drag its numbers to zero.
+    assert stats[("t", "f")]["input"]["p95"] == pytest.approx(0.05)
+    assert stats[("t", "f")]["capture"]["mean"] == 0.0
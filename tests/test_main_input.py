@@ -0,0 +1,51 @@
+import pytest
+
+import main_input
+from main_input import FakeBackend, InputMonitor
+
+@pytest.fixture
+def monitor(clock):
+    monitor = InputMonitor(backend=FakeBackend(), idle_threshold=1.0, clock=clock)
+    monitor.start()
+    yield monitor
+    monitor.stop()
+
+def test_idle_until_input(monitor, clock):
+    assert not monitor.is_user_active()
+    monitor.backend.feed()
+    assert monitor.is_user_active()
+    assert monitor.idle_in() == pytest.approx(1.0)
+    clock.advance(0.4)
+    assert monitor.idle_in() == pytest.approx(0.6)
+    clock.advance(0.6)
+    assert not monitor.is_user_active()
+
+def test_out_of_order_reports_keep_latest(monitor, clock):
+    monitor.backend.feed(clock.t)
+    monitor.backend.feed(clock.t - 5)
+    assert monitor.last_input == clock.t
+
+def test_synthetic_input_is_ignored_with_grace(monitor, clock):
+    with monitor.synthetic():
+        monitor.backend.feed()
+    assert not monitor.is_user_active()
+    clock.advance(main_input.synthetic_grace / 2)
+    monitor.backend.feed()
+    assert not monitor.is_user_active()
+    clock.advance(main_input.synthetic_grace)
+    monitor.backend.feed()
+    assert monitor.is_user_active()
+
+def test_stop_detaches_backend(monitor):
+    backend = monitor.backend
+    monitor.stop()
+    backend.feed()
+    assert not monitor.is_user_active()
+
+def test_use_backend_resets_last_input(monitor):
+    monitor.backend.feed()
+    replacement = FakeBackend()
+    monitor.use_backend(replacement)
+    assert not monitor.is_user_active()
+    replacement.feed()
+    assert monitor.is_user_active()
@@ -0,0 +1,118 @@
+import logging
+
+import pytest
+
+import main_logger
+from main_logger import SamplingFilter, _parse_levels
+
+def debug_record(created, lineno=10, level=logging.DEBUG):
+    record = logging.LogRecord("tm.test", level, "site.py", lineno, "msg", None, None)
+    record.created = created
+    return record
+
+def passed(sampler, records):
+    return [record for record in records if sampler.filter(record)]
+
+def test_parse_levels():
+    assert _parse_levels("ocr=info, capture = WARNING,bad,=x") == {"ocr": "INFO", "capture": "WARNING"}
+    assert _parse_levels(None) == {}
+
+def test_sampling_lets_a_burst_through_then_one_in_n(monkeypatch):
+    monkeypatch.setattr(main_logger, "sample_burst", 3)
+    monkeypatch.setattr(main_logger, "sample_every", 5)
+    sampler = SamplingFilter()
+    kept = passed(sampler, [debug_record(100.0) for _ in range(13)])
+    # 3 from the burst, then the 5th and 10th after it.
+    assert len(kept) == 5
+    assert kept[3].sampled == 4
+    assert kept[4].sampled == 4
+
+def test_sampling_resets_each_window(monkeypatch):
+    monkeypatch.setattr(main_logger, "sample_burst", 2)
+    sampler = SamplingFilter()
+    assert len(passed(sampler, [debug_record(100.0) for _ in range(5)])) == 2
+    later = 100.0 + main_logger.sample_window
+    assert len(passed(sampler, [debug_record(later) for _ in range(5)])) == 2
+
+def test_sampling_is_per_call_site_and_skips_higher_levels(monkeypatch):
+    monkeypatch.setattr(main_logger, "sample_burst", 1)
+    sampler = SamplingFilter()
+    assert len(passed(sampler, [debug_record(100.0, lineno=1), debug_record(100.0, lineno=2)])) == 2
+    assert len(passed(sampler, [debug_record(100.0, level=logging.WARNING) for _ in range(5)])) == 5
+
+@pytest.fixture
+def errors(monkeypatch):
+    """Fresh error fingerprints, with reports collected as plain strings."""
+    from collections import OrderedDict
+    import threading
+    monkeypatch.setattr(main_logger, "_errors", OrderedDict())
+    monkeypatch.setattr(main_logger, "_flush_thread", None)
+    monkeypatch.setattr(main_logger, "_flush_stop", threading.Event())
+    messages = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            messages.append(record.getMessage())
+    handler = Collect(logging.ERROR)
+    main_logger.logger.addHandler(handler)
+    yield messages
+    main_logger._flush_stop.set()
+    main_logger.logger.removeHandler(handler)
+
+def fail_a():
+    raise ValueError("a")
+
+def fail_b():
+    raise ValueError("b")
+
+def handle(fn):
+    try:
+        fn()
+    except Exception as e:
+        main_logger.application_error_handler(f"Error executing: {e}")
+
+def reports(messages):
+    return [m for m in messages if "Detailed Error Report" in m]
+
+def test_errors_are_fingerprinted_by_raise_site(errors):
+    handle(fail_a)
+    handle(fail_b)
+    handle(fail_a)
+    assert len(reports(errors)) == 2
+    assert "Function Name: fail_a" in reports(errors)[0]
+    assert "Function Name: fail_b" in reports(errors)[1]
+
+def test_error_without_traceback_uses_the_caller(errors):
+    for _ in range(2):
+        main_logger.application_error_handler("plain message")
+    assert len(reports(errors)) == 1
+    assert "Function Name: test_error_without_traceback_uses_the_caller" in reports(errors)[0]
+
+def test_repeats_are_summarised_after_the_interval(errors, monkeypatch):
+    handle(fail_a)
+    handle(fail_a)
+    handle(fail_a)
+    assert not [m for m in errors if "repeated" in m]
+    monkeypatch.setattr(main_logger, "error_repeat_interval", 0.0)
+    handle(fail_a)
+    summary = [m for m in errors if "repeated" in m]
+    assert len(summary) == 1
+    assert "3 more times" in summary[0] and "(4 total)" in summary[0]
+
+def test_pending_repeats_are_flushed_without_another_error(errors, monkeypatch):
+    monkeypatch.setattr(main_logger, "error_repeat_interval", 0.05)
+    handle(fail_a)
+    handle(fail_a)
+    assert main_logger._flush_thread is not None
+    main_logger._flush_stop.wait(0.3)
+    summary = [m for m in errors if "repeated" in m]
+    assert summary == [summary[0]]
+    assert "1 more times (2 total)" in summary[0]
+
+def test_flush_error_counts_respects_min_age(errors):
+    handle(fail_a)
+    handle(fail_a)
+    main_logger.flush_error_counts(min_age=60.0)
+    assert not [m for m in errors if "repeated" in m]
+    main_logger.flush_error_counts()
+    assert len([m for m in errors if "repeated" in m]) == 1
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import main_preprocess
+from main_preprocess import glyph_height, otsu_level, run_pipeline, stage_denoise
+
+def label(fg, bg, glyph=10, size=(30, 60)):
+    """A bar of glyph-height 'text' on a plain background."""
+    view = np.full(size + (3,), bg, dtype=np.uint8)
+    top = (size[0] - glyph) // 2
+    view[top:top + glyph, 10:50] = fg
+    return view
+
+def test_otsu_splits_two_levels():
+    gray = np.array([[20] * 10 + [220] * 10], dtype=np.uint8)
+    assert 20 <= otsu_level(gray) < 220
+
+def test_glyph_height():
+    assert glyph_height(label(0, 255)[..., 0]) == 10
+    assert glyph_height(np.full((5, 5), 255, dtype=np.uint8)) == 0
+
+@pytest.mark.parametrize("fg, bg", [(0, 255), (255, 0), (60, 200)])
+def test_auto_gives_dark_glyphs_on_white_at_min_height(fg, bg):
+    out = run_pipeline(label(fg, bg), "auto", min_height=32)
+    assert out.dtype == np.uint8
+    assert set(np.unique(out)) <= {0, 255}
+    pad = main_preprocess.pad_pixels
+    assert (out[:pad] == 255).all() and (out[:, :pad] == 255).all()
+    assert glyph_height(out) >= 30
+
+def test_upscale_is_capped():
+    out = run_pipeline(label(0, 255, glyph=2, size=(20, 40)), "gray", min_height=64)
+    pad = 2 * main_preprocess.pad_pixels
+    assert out.shape[0] - pad == 20 * main_preprocess.max_upscale
+
+def test_tall_glyphs_are_not_upscaled():
+    view = label(0, 255, glyph=40, size=(60, 60))
+    out = run_pipeline(view, "auto", min_height=32)
+    assert out.shape == (60 + 2 * main_preprocess.pad_pixels,) * 2
+
+def test_adaptive_handles_a_gradient_background():
+    view = label(0, 255).astype(np.float64)
+    view[..., :] *= np.linspace(0.6, 1.0, view.shape[1])[None, :, None]
+    out = run_pipeline(view.astype(np.uint8), "adaptive", min_height=10)
+    assert glyph_height(out) >= 10
+
+def test_none_only_converts_to_gray():
+    view = label(0, 255)
+    out = run_pipeline(view, "none")
+    assert out.shape == view.shape[:2]
+    assert np.array_equal(out, view[..., 0])
+
+def test_unknown_pipeline_falls_back_to_default():
+    view = label(0, 255)
+    assert np.array_equal(run_pipeline(view, "missing"), run_pipeline(view, main_preprocess.default_pipeline))
+
+def test_denoise_drops_isolated_pixels_only():
+    gray = np.full((10, 10), 255, dtype=np.uint8)
+    gray[1, 1] = 0
+    gray[5:8, 5:8] = 0
+    out = stage_denoise(gray, {})
+    assert out[1, 1] == 255
+    assert (out[5:8, 5:8] == 0).all()
+
+def test_tiny_views_pass_through():
+    assert run_pipeline(np.zeros((1, 5, 3), dtype=np.uint8)).shape == (1, 5)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from event_model import CAPTURE, KEYBOARD, POINTER, SHARED_RESOURCES
+from main_scheduler import Cancelled, CancelToken, ResourceScheduler
+
+@pytest.fixture
+def scheduler():
+    return ResourceScheduler(shared=SHARED_RESOURCES)
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def waiter(scheduler, resources, priority, order, cancel=None):
+    def run():
+        try:
+            with scheduler.acquire(resources, priority, cancel, poll=0.01):
+                order.append(priority)
+        except Cancelled:
+            order.append("cancelled")
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def test_exclusive_waiters_enter_highest_priority_first(scheduler):
+    order = []
+    with scheduler.acquire({POINTER}):
+        threads = [waiter(scheduler, {POINTER}, priority, order) for priority in (1, 5, 3)]
+        wait_for(lambda: len(scheduler._waiting) == 3)
+    for thread in threads:
+        thread.join(2.0)
+    assert order == [5, 3, 1]
+    assert scheduler.held() == {}
+
+def test_shared_capture_is_held_side_by_side(scheduler):
+    with scheduler.acquire({CAPTURE}), scheduler.acquire({CAPTURE}):
+        assert scheduler.held() == {CAPTURE: 2}
+
+def test_waiter_holds_back_lower_priority_on_a_free_device(scheduler):
+    order = []
+    with scheduler.acquire({KEYBOARD}):
+        high = waiter(scheduler, {POINTER, KEYBOARD}, 5, order)
+        wait_for(lambda: len(scheduler._waiting) == 1)
+        # The pointer is free, but taking it would keep the waiting
+        # high-priority event from ever getting both devices.
+        low = waiter(scheduler, {POINTER}, 1, order)
+        wait_for(lambda: len(scheduler._waiting) == 2)
+        other = waiter(scheduler, {CAPTURE}, 0, order)
+        other.join(2.0)
+        assert order == [0]
+    high.join(2.0)
+    low.join(2.0)
+    assert order == [0, 5, 1]
+
+def test_cancelled_waiter_leaves_the_queue(scheduler):
+    order = []
+    cancel = CancelToken()
+    with scheduler.acquire({POINTER}):
+        high = waiter(scheduler, {POINTER}, 5, order, cancel)
+        low = waiter(scheduler, {POINTER}, 1, order)
+        wait_for(lambda: len(scheduler._waiting) == 2)
+        cancel.cancel()
+        high.join(2.0)
+        assert order == ["cancelled"]
+        assert len(scheduler._waiting) == 1
+    low.join(2.0)
+    assert order == ["cancelled", 1]
+    assert scheduler.held() == {}
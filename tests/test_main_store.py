@@ -0,0 +1,63 @@
+import json
+
+from event_model import ButtonEvent, LogicEvent, event_to_dict
+from main_store import TaskStore
+
+def events(*names):
+    return [event_to_dict(ButtonEvent(event_name=name)) for name in names]
+
+def test_tasks_persist_and_load_lazily(tmp_path):
+    path = str(tmp_path / "tm.sqlite3")
+    store = TaskStore(path)
+    store["one"] = events("a", "b")
+    store["two"] = events("c")
+    store.close()
+    store = TaskStore(path)
+    assert list(store) == ["one", "two"]
+    assert store.loaded() == []
+    assert [ev["event_name"] for ev in store["one"]] == ["a", "b"]
+    assert store.loaded() == ["one"]
+
+def test_save_writes_only_changed_rows(tmp_path):
+    store = TaskStore(str(tmp_path / "tm.sqlite3"))
+    saved = events("a", "b", "c")
+    store["task"] = saved
+    edited = [dict(ev) for ev in saved]
+    edited[1]["double_click"] = True
+    before = store._conn.total_changes
+    store["task"] = edited
+    assert store._conn.total_changes - before == 1
+    before = store._conn.total_changes
+    store["task"] = edited
+    assert store._conn.total_changes == before
+
+def test_shorter_save_deletes_trailing_rows(tmp_path):
+    path = str(tmp_path / "tm.sqlite3")
+    store = TaskStore(path)
+    store["task"] = events("a", "b", "c")
+    store["task"] = events("a")
+    store.close()
+    assert [ev["event_name"] for ev in TaskStore(path)["task"]] == ["a"]
+
+def test_delete_task(tmp_path):
+    path = str(tmp_path / "tm.sqlite3")
+    store = TaskStore(path)
+    store["task"] = events("a")
+    del store["task"]
+    store.close()
+    assert "task" not in TaskStore(path)
+
+def test_export_import_round_trip(tmp_path):
+    tasks = {
+        "one": events("a", "b"),
+        "two": [event_to_dict(LogicEvent(event_name="check", logic_action="color_logic", logic_value="#ff0000"))],
+    }
+    source = TaskStore(":memory:")
+    source.update_all(tasks)
+    file_path = str(tmp_path / "tm.json")
+    assert source.export_json(file_path) == 2
+    with open(file_path) as f:
+        assert json.load(f)["version"] >= 1
+    target = TaskStore(":memory:")
+    assert target.import_json(file_path) == 2
+    assert {name: target[name] for name in target} == tasks
@@ -0,0 +1,63 @@
+import numpy as np
+
+from main_ocr import Word
+from main_utils import OcrCache, build_mosaic, split_words
+
+def test_get_returns_fresh_entries(clock):
+    cache = OcrCache(clock=clock)
+    cache.put(b"k", "text")
+    assert cache.get(b"k") == "text"
+    assert b"k" in cache
+    assert cache.stats()["hits"] == 1
+
+def test_entries_expire_after_max_age(clock):
+    cache = OcrCache(max_age=10.0, clock=clock)
+    cache.put(b"k", "text")
+    clock.advance(10.5)
+    assert b"k" not in cache
+    assert cache.get(b"k") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "hit_rate": 0.0, "entries": 0}
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = OcrCache(max_entries=2, clock=clock)
+    cache.put(b"a", "1")
+    cache.put(b"b", "2")
+    cache.get(b"a")
+    cache.put(b"c", "3")
+    assert b"a" in cache
+    assert b"b" not in cache
+    assert b"c" in cache
+
+def test_key_depends_on_pixels_and_config():
+    from PIL import Image
+    cache = OcrCache()
+    black = Image.new("L", (4, 4), 0)
+    white = Image.new("L", (4, 4), 255)
+    assert cache.key(black) == cache.key(Image.new("L", (4, 4), 0))
+    assert cache.key(black) != cache.key(white)
+    assert cache.key(black) != cache.key(black, "--psm 7")
+
+def test_build_mosaic_stacks_tiles_with_gaps():
+    from PIL import Image
+    tiles = [Image.new("L", (30, 10), 0), Image.new("L", (50, 20), 0)]
+    mosaic, spans = build_mosaic(tiles, gap=5)
+    assert mosaic.size == (50 + 10, 10 + 20 + 15)
+    assert spans == [(5, 15), (20, 40)]
+    pixels = np.asarray(mosaic)
+    assert (pixels[5:15, 5:35] == 0).all()
+    assert (pixels[15:20] == 255).all()
+    assert (pixels[20:40, 5:55] == 0).all()
+
+def test_split_words_by_vertical_centre():
+    spans = [(5, 15), (20, 40)]
+    words = [
+        Word("top", 5, 6, 10, 8, 90.0),
+        Word("bottom", 5, 22, 10, 8, 90.0),
+        Word("second", 20, 25, 10, 10, 90.0),
+        Word("gap", 5, 14, 10, 6, 90.0),
+        Word("above", 5, 0, 10, 4, 90.0),
+    ]
+    assert split_words(words, spans) == ["top", "bottom second"]
+
+def test_split_words_leaves_empty_tiles_blank():
+    assert split_words([], [(5, 15), (20, 40)]) == ["", ""]
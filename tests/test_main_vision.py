@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import main_vision
+from event_model import LogicEvent
+from main_vision import Template, match_template, measure_color, measured_matches, parse_hex_color
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+def patch(color, size=10):
+    return np.full((size, size, 3), color, dtype=np.uint8)
+
+@pytest.fixture
+def mostly_red():
+    # 70% red, 30% blue, with the center pixel blue.
+    view = patch(RED)
+    view[7:, :] = BLUE
+    view[5, 5] = BLUE
+    return view
+
+def test_parse_hex_color():
+    assert parse_hex_color("#ff0000") == RED
+    assert parse_hex_color("00f") == BLUE
+    with pytest.raises(ValueError):
+        parse_hex_color("#12")
+
+def test_pixel_mode_reads_the_center(mostly_red):
+    assert measure_color(mostly_red, "pixel", RED) == BLUE
+
+def test_mean_and_median(mostly_red):
+    mean = measure_color(mostly_red, "mean", RED)
+    assert mean == (round(255 * 0.69), 0, round(255 * 0.31))
+    assert measure_color(mostly_red, "median", RED) == RED
+
+def test_dominant_ignores_minority_colors(mostly_red):
+    assert measure_color(mostly_red, "dominant", RED) == RED
+
+def test_coverage_with_tolerance():
+    view = patch(RED)
+    view[:5] = (250, 5, 0)
+    assert measure_color(view, "coverage", RED, tolerance=0) == 50.0
+    assert measure_color(view, "coverage", RED, tolerance=10) == 100.0
+
+def test_measured_matches():
+    assert measured_matches((250, 5, 0), "mean", RED, tolerance=10)
+    assert not measured_matches((250, 5, 0), "mean", RED, tolerance=5)
+    assert measured_matches(60.0, "coverage", RED, min_coverage=50.0)
+    assert not measured_matches(40.0, "coverage", RED, min_coverage=50.0)
+
+def test_grayscale_views_are_accepted():
+    assert measure_color(np.full((4, 4), 128, dtype=np.uint8), "mean", RED) == (128, 128, 128)
+
+def textured(h, w, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w), dtype=np.uint8)
+
+def test_match_template_finds_exact_location():
+    image = textured(60, 80)
+    template = Template(image[20:36, 30:46].astype(np.float64))
+    score, loc = match_template(image, template)
+    assert loc == (30, 20)
+    assert score == pytest.approx(1.0, abs=1e-6)
+
+def test_match_template_uses_pyramid_on_large_views():
+    image = np.kron(textured(120, 120, seed=1), np.ones((2, 2), dtype=np.uint8))
+    assert image.size >= main_vision.pyramid_min_pixels
+    template = Template(image[100:140, 60:100].astype(np.float64))
+    score, loc = match_template(image, template)
+    assert loc == (60, 100)
+    assert score > 0.99
+
+def test_match_template_absent_scores_low():
+    template = Template(textured(16, 16, seed=2).astype(np.float64))
+    score, _ = match_template(textured(60, 80, seed=3), template)
+    assert score < 0.5
+
+def test_template_larger_than_view():
+    template = Template(textured(40, 40).astype(np.float64))
+    assert match_template(textured(20, 20), template) == (0.0, None)
+
+def test_last_match_maps_to_screen_coordinates():
+    event = LogicEvent(event_name="img", region=(100, 200, 80, 60), logic_action="image_match")
+    assert event.last_match() is None
+    event.match_result = (0.9, (30, 20))
+    assert event.last_match() == (130, 220, 0.9)
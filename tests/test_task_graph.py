@@ -0,0 +1,68 @@
+from event_model import ButtonEvent, LogicEvent
+from task_graph import ERROR, WARNING, compile_task
+
+def kinds(graph, severity):
+    return sorted(issue.kind for issue in graph.issues if issue.severity == severity)
+
+def test_valid_chain_links_edges():
+    graph = compile_task([
+        LogicEvent(event_name="check", run_at_start=True, next_event_success="click", next_event_success_delay=0.5, next_event_fail="check", next_event_fail_delay=1),
+        ButtonEvent(event_name="click"),
+    ])
+    assert graph.issues == ()
+    check = graph["check"]
+    assert check.on_success.target is graph["click"]
+    assert check.on_success.delay == 0.5
+    assert check.on_fail.target is check
+    assert graph.roots == (check,)
+
+def test_duplicate_name_is_an_error_and_first_wins():
+    first = ButtonEvent(event_name="a", run_at_start=True)
+    graph = compile_task([first, ButtonEvent(event_name="a")])
+    assert kinds(graph, ERROR) == ["duplicate"]
+    assert len(graph) == 1
+    assert graph["a"].event is first
+
+def test_missing_target_reported_once_per_name():
+    graph = compile_task([
+        LogicEvent(event_name="a", run_at_start=True, next_event_success="gone", next_event_fail="gone"),
+    ])
+    assert kinds(graph, ERROR) == ["missing"]
+    assert graph["a"].on_success is None
+
+def test_none_target_is_not_an_edge():
+    graph = compile_task([ButtonEvent(event_name="a", run_at_start=True, next_event="None")])
+    assert graph.issues == ()
+    assert graph["a"].on_success is None
+
+def test_unreachable_event_is_a_warning():
+    graph = compile_task([
+        ButtonEvent(event_name="a", run_at_start=True),
+        ButtonEvent(event_name="orphan"),
+    ])
+    assert graph.errors == []
+    assert kinds(graph, WARNING) == ["unreachable"]
+    assert "orphan" in graph.warnings[0].message
+
+def test_no_start_event_is_a_warning():
+    graph = compile_task([ButtonEvent(event_name="a")])
+    assert kinds(graph, WARNING) == ["no_start"]
+
+def test_zero_delay_cycle_detected():
+    graph = compile_task([
+        ButtonEvent(event_name="a", run_at_start=True, next_event="b"),
+        ButtonEvent(event_name="b", next_event="a"),
+    ])
+    assert kinds(graph, WARNING) == ["zero_delay_cycle"]
+    assert "a, b" in graph.warnings[0].message
+
+def test_delayed_cycle_is_fine():
+    graph = compile_task([
+        ButtonEvent(event_name="a", run_at_start=True, next_event="b"),
+        ButtonEvent(event_name="b", next_event="a", next_event_delay=0.1),
+    ])
+    assert graph.issues == ()
+
+def test_zero_delay_repeat_is_a_self_loop():
+    graph = compile_task([ButtonEvent(event_name="a", run_at_start=True, repeat=True, repeat_delay=0)])
+    assert kinds(graph, WARNING) == ["zero_delay_cycle"]
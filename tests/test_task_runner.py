@@ -0,0 +1,168 @@
+import itertools
+import threading
+
+import pytest
+
+import event_actions
+import main_metrics as metrics
+import task_runner
+from event_model import OVERRUN_CATCH_UP, REPEAT_RATE, LogicEvent
+from main_scheduler import DeadlineScheduler
+from task_runner import TaskRunner
+
+_names = itertools.count()
+
+def make_runner(events, clock=None, **kwargs):
+    # Each runner registers under its task name; keep them distinct.
+    scheduler = DeadlineScheduler(clock=clock) if clock is not None else None
+    kwargs.setdefault("check_user_activity", False)
+    return TaskRunner(f"test-{next(_names)}", events, scheduler=scheduler, **kwargs)
+
+@pytest.fixture
+def executed(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def execute(event, cancel=None, watch=None):
+        with lock:
+            calls.append(event.event_name)
+        return True
+    monkeypatch.setattr(event_actions, "execute", execute)
+    return calls
+
+@pytest.fixture
+def rearms(monkeypatch):
+    """Capture what schedule_repeat_event hands to schedule_at."""
+    calls = []
+
+    def capture(runner):
+        monkeypatch.setattr(runner, "schedule_at", lambda due, node, wake=None, rearm=False: calls.append((due, wake, rearm)))
+        return calls
+    return capture
+
+def repeating(**kwargs):
+    return LogicEvent(event_name="a", run_at_start=True, repeat=True, repeat_delay=0.2, **kwargs)
+
+# -- pending accounting -------------------------------------------------------
+
+def test_second_request_collapses_into_pending_run(clock):
+    runner = make_runner([LogicEvent(event_name="a", run_at_start=True)], clock)
+    node = runner.graph["a"]
+    runner.schedule(1.0, node)
+    runner.schedule(2.0, node)
+    assert runner.pending_depth() == 1
+    assert runner.collapsed == 1
+    assert runner.pending_events() == {"a": 1}
+    assert runner._pending[node.index][0].due == clock.t + 1.0
+
+def test_sooner_request_replaces_pending_run(clock):
+    runner = make_runner([LogicEvent(event_name="a", run_at_start=True)], clock)
+    node = runner.graph["a"]
+    runner.schedule(2.0, node)
+    first = runner._pending[node.index][0]
+    runner.schedule(0.5, node)
+    assert first.cancelled
+    assert runner.pending_depth() == 1
+    assert runner._outstanding == 1
+    assert runner._pending[node.index][0].due == clock.t + 0.5
+
+def test_no_collapse_without_limit(clock):
+    runner = make_runner([LogicEvent(event_name="a", run_at_start=True)], clock, max_pending=0)
+    node = runner.graph["a"]
+    for _ in range(3):
+        runner.schedule(1.0, node)
+    assert runner.pending_depth() == 3
+    assert runner.collapsed == 0
+
+def test_chain_cap_drops_new_runs_but_not_rearms(clock):
+    events = [LogicEvent(event_name=name, run_at_start=True) for name in "abc"]
+    runner = make_runner(events, clock, max_chains=2)
+    runner.schedule(1.0, runner.graph["a"])
+    runner.schedule(1.0, runner.graph["b"])
+    runner.schedule(1.0, runner.graph["c"])
+    assert runner.dropped == 1
+    assert runner.pending_depth() == 2
+    runner.schedule(1.0, runner.graph["c"], rearm=True)
+    assert runner.dropped == 1
+    assert runner.pending_depth() == 3
+
+def test_chain_runs_to_completion_and_stops(executed):
+    events = [
+        LogicEvent(event_name="a", run_at_start=True, next_event_success="b"),
+        LogicEvent(event_name="b"),
+    ]
+    runner = make_runner(events)
+    thread = runner.start_background()
+    thread.join(5.0)
+    assert not thread.is_alive()
+    assert executed == ["a", "b"]
+    assert runner.context.status()["branches"] == {"success": 2}
+    assert runner.pending_depth() == 0
+    assert runner._outstanding == 0
+
+def test_edge_back_into_repeating_event_stays_bounded(executed):
+    # 'a' repeats and its success edge points back at itself: without
+    # collapsing every pass would add another loop.
+    event = LogicEvent(event_name="a", run_at_start=True, repeat=True, repeat_delay=0.01,
+                       next_event_success="a", next_event_success_delay=0.01)
+    runner = make_runner([event])
+    runner.start_background()
+    depths = []
+    for _ in range(20):
+        threading.Event().wait(0.01)
+        depths.append(runner.pending_depth())
+    runner.stop()
+    assert max(depths) <= 1
+    assert runner.collapsed > 0
+    assert len(executed) > 5
+
+# -- repeat arithmetic --------------------------------------------------------
+
+def test_delay_mode_waits_after_finish(clock, rearms):
+    runner = make_runner([repeating()], clock)
+    calls = rearms(runner)
+    clock.t = 100.15
+    runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    assert calls == [(pytest.approx(100.35), pytest.approx(100.35), True)]
+
+def test_rate_mode_anchors_on_previous_deadline(clock, rearms):
+    runner = make_runner([repeating(repeat_mode=REPEAT_RATE)], clock)
+    calls = rearms(runner)
+    clock.t = 100.15
+    runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    assert calls[0][0] == pytest.approx(100.2)
+
+def test_rate_mode_skip_moves_to_next_tick_ahead(clock, rearms, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.registry.reset()
+    runner = make_runner([repeating(repeat_mode=REPEAT_RATE)], clock)
+    calls = rearms(runner)
+    clock.t = 100.65
+    runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    # Ticks at 100.2, 100.4 and 100.6 were missed.
+    assert calls[0][0] == pytest.approx(100.8)
+    assert metrics.registry.counter("repeat_skipped_total").value == 3
+
+def test_rate_mode_catch_up_runs_missed_tick(clock, rearms):
+    runner = make_runner([repeating(repeat_mode=REPEAT_RATE, repeat_overrun=OVERRUN_CATCH_UP)], clock)
+    calls = rearms(runner)
+    clock.t = 100.65
+    runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    assert calls[0][0] == pytest.approx(100.2)
+
+def test_catch_up_skips_once_too_far_behind(clock, rearms):
+    runner = make_runner([repeating(repeat_mode=REPEAT_RATE, repeat_overrun=OVERRUN_CATCH_UP)], clock)
+    calls = rearms(runner)
+    clock.t = 100.0 + 0.2 * (task_runner.max_catch_up + 2) + 0.05
+    runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    assert calls[0][0] > clock.t
+
+def test_jitter_moves_wake_but_not_anchor(clock, rearms):
+    runner = make_runner([repeating(repeat_mode=REPEAT_RATE, repeat_jitter=0.05)], clock)
+    calls = rearms(runner)
+    clock.t = 100.01
+    for _ in range(50):
+        runner.schedule_repeat_event(runner.graph["a"], due=100.0)
+    assert all(due == pytest.approx(100.2) for due, _, _ in calls)
+    assert all(clock.t <= wake <= 100.25 + 1e-9 for _, wake, _ in calls)
+    assert len({wake for _, wake, _ in calls}) > 1
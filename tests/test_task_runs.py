@@ -0,0 +1,47 @@
+import pytest
+
+from event_model import ButtonEvent, LogicEvent
+from task_runs import FINISHED, RunContext, RunRegistry
+
+def run(registry, task_name, *events):
+    context = registry.register(RunContext(task_name, events))
+    context.started()
+    return context
+
+def click(name="click", **kwargs):
+    return ButtonEvent(event_name=name, **kwargs)
+
+def check(name="check"):
+    return LogicEvent(event_name=name)
+
+def test_register_rejects_second_active_run_of_a_task():
+    registry = RunRegistry()
+    first = run(registry, "task", check())
+    with pytest.raises(RuntimeError, match="already running"):
+        registry.register(RunContext("task", [check()]))
+    first.finished()
+    second = run(registry, "task", check())
+    assert second.run_id != first.run_id
+    assert registry.runs() == [second]
+
+def test_conflicts_report_shared_input_devices_only():
+    registry = RunRegistry()
+    clicker = run(registry, "clicker", click())
+    typist = run(registry, "typist", click(entered_text="hi"))
+    run(registry, "reader", check())
+    found = {context.task_name: shared for context, shared in registry.conflicts([click(press_enter=True)])}
+    assert found == {"clicker": {"pointer"}, "typist": {"pointer", "keyboard"}}
+    assert registry.conflicts([check()]) == []
+    assert [context for context, _ in registry.conflicts([click()], exclude=clicker)] == [typist]
+    assert [context for context, _ in typist.conflicts] == [clicker]
+
+def test_runs_that_read_or_click_the_screen_hold_overlays():
+    registry = RunRegistry()
+    assert registry.holding_overlays() == []
+    clicker = run(registry, "clicker", click())
+    reader = run(registry, "reader", check())
+    assert registry.holding_overlays() == [clicker, reader]
+    reader.state = FINISHED
+    assert registry.holding_overlays() == [clicker]
+    clicker.state = FINISHED
+    assert registry.holding_overlays() == []